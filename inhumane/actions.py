@@ -0,0 +1,52 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Player actions, for applying in batches.
+
+Each action is a ``namedtuple``, and is applied with
+:py:meth:`~inhumane.game.Game.apply_actions`. Cards may be given as card
+objects or deck rows, as for the corresponding :py:class:`~inhumane.game.Game`
+methods.
+"""
+
+
+from collections import namedtuple
+
+
+Play = namedtuple("Play", "player cards")
+Play.__doc__ = "Play cards for the black card (see ``player_play``)."
+
+Pass = namedtuple("Pass", "player")
+Pass.__doc__ = "Skip a player's turn (see ``player_pass``)."
+
+Gamble = namedtuple("Gamble", "player card")
+Gamble.__doc__ = "Gamble an AP on another card (see ``player_gamble``)."
+
+Vote = namedtuple("Vote", "player target")
+Vote.__doc__ = "Vote for a player (see ``player_vote``)."
+
+Trade = namedtuple("Trade", "player cards")
+Trade.__doc__ = "Trade AP for new cards (see ``player_trade_ap``)."
+
+
+class ActionResult(namedtuple("ActionResult", "action value error")):
+
+    """The result of an action.
+
+    :ivar action:
+        The action.
+
+    :ivar value:
+        What the corresponding ``Game`` method would have returned.
+
+    :ivar error:
+        The exception the corresponding ``Game`` method would have raised,
+        or None.
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """Whether the action was applied."""
+        return self.error is None
@@ -0,0 +1,188 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Audience voting.
+
+An :py:class:`AudienceVote` collects votes from voters who aren't players
+(viewers of a stream, say), which may be many thousands, from many threads
+or coroutines at once.
+
+Voters are spread over a number of shards by the hash of their ID. Each shard
+has its own lock, set of voters who have voted (so each voter only counts
+once), and counts per candidate, so votes to different shards don't contend.
+Tallying merges the shards' counts, so it takes time proportional to the
+number of candidates, not voters.
+
+With a quorum, every vote also takes a ticket from a counter under one
+(briefly held) lock, so exactly the quorum's worth of votes are counted.
+"""
+
+
+import time
+
+from collections import Counter
+from threading import Lock
+
+from .scoreboard import Scoreboard
+
+
+class _Shard(object):
+
+    __slots__ = ("lock", "voters", "counts")
+
+    def __init__(self):
+        self.lock = Lock()
+        self.voters = set()
+        self.counts = Counter()
+
+
+class AudienceVote(object):
+
+    """A vote by an audience on a fixed set of candidates.
+
+    The vote closes when :py:meth:`close` is called, when the quorum is
+    reached, or when the deadline passes, whichever is first.
+    """
+
+    def __init__(self, candidates, quorum=None, deadline=None, shards=16,
+                 clock=time.monotonic):
+        """Open a vote.
+
+        :param candidates:
+            The candidates that can be voted for.
+
+        :param quorum:
+            Close the vote once this many voters have voted, or None.
+
+        :param deadline:
+            Close the vote this many seconds from now, or None.
+
+        :param shards:
+            The number of shards to spread voters over.
+
+        :param clock:
+            The function giving the time in seconds, for the deadline.
+        """
+        self.candidates = frozenset(candidates)
+        self.quorum = quorum
+        self.clock = clock
+        self.closes = clock() + deadline if deadline is not None else None
+
+        self._shards = [_Shard() for i in range(shards)]
+        self._closed = False
+
+        # Votes counted towards the quorum
+        self._lock = Lock()
+        self._tickets = 0
+
+    def vote(self, voter, candidate):
+        """Vote for a candidate.
+
+        :param voter:
+            A hashable ID for the voter.
+
+        :param candidate:
+            The candidate voted for.
+
+        :returns:
+            True if the vote was counted, False if the voter has already
+            voted, or the vote is closed.
+
+        :raises KeyError:
+            The candidate isn't in the vote.
+        """
+        if candidate not in self.candidates:
+            raise KeyError(candidate)
+
+        if self.closed:
+            return False
+
+        shard = self._shards[hash(voter) % len(self._shards)]
+        with shard.lock:
+            if voter in shard.voters:
+                return False
+
+            if self.quorum is not None:
+                with self._lock:
+                    if self._closed:
+                        return False
+
+                    self._tickets += 1
+                    if self._tickets >= self.quorum:
+                        self._closed = True
+
+            shard.voters.add(voter)
+            shard.counts[candidate] += 1
+
+        return True
+
+    def has_voted(self, voter):
+        """Check if a voter has voted."""
+        return voter in self._shards[hash(voter) % len(self._shards)].voters
+
+    @property
+    def turnout(self):
+        """The number of voters who have voted."""
+        return sum(len(shard.voters) for shard in self._shards)
+
+    @property
+    def closed(self):
+        """Whether the vote is closed."""
+        if not self._closed and self.closes is not None:
+            if self.clock() >= self.closes:
+                self._closed = True
+
+        return self._closed
+
+    def close(self):
+        """Close the vote."""
+        self._closed = True
+
+    def tally(self):
+        """Count the votes.
+
+        :returns:
+            A :py:class:`~inhumane.scoreboard.Scoreboard` of candidates to
+            votes. Candidates without votes aren't listed.
+        """
+        total = Counter()
+        for shard in self._shards:
+            with shard.lock:
+                total.update(shard.counts)
+
+        return Scoreboard(total)
+
+    def __getstate__(self):
+        # Locks can't be pickled, and voters must be resharded on the other
+        # side (string hashes differ between processes). The deadline is
+        # kept as the time remaining, since clocks differ too.
+        voters = set()
+        for shard in self._shards:
+            with shard.lock:
+                voters.update(shard.voters)
+
+        remaining = None
+        if self.closes is not None:
+            remaining = max(self.closes - self.clock(), 0)
+
+        return {
+            "candidates": list(self.candidates),
+            "quorum": self.quorum,
+            "remaining": remaining,
+            "shards": len(self._shards),
+            "closed": self._closed,
+            "voters": list(voters),
+            "counts": dict(self.tally()),
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state["candidates"], state["quorum"],
+                      state["remaining"], state["shards"])
+
+        for voter in state["voters"]:
+            self._shards[hash(voter) % len(self._shards)].voters.add(voter)
+
+        # Only the total per candidate matters, so one shard holds them all
+        self._shards[0].counts.update(state["counts"])
+        self._tickets = len(state["voters"])
+        self._closed = state["closed"]
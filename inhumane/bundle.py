@@ -0,0 +1,302 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Compiled pack bundles.
+
+A bundle is a single binary file holding all the cards of a pack, already
+split into records, so loading the pack doesn't have to parse its text files.
+
+.. note::
+    A bundle is only mapped while the pack's cards are built from it, and the
+    cards are ordinary objects in each process. Bundles save parsing time, not
+    memory: nothing stays shared between processes through the mapping.
+
+The layout (all integers little-endian) is:
+
+- A header: magic, format version, the fingerprint of the source files, the
+  black and white card counts, and the offset and length of the string table.
+- The black card records, followed by the white card records. Each record is
+  fixed-width: text offset and length, watermark offset and length, draw count
+  and play count. Offsets and lengths are in characters of the decoded string
+  table, so the table only has to be decoded once.
+- The string table: every distinct string in the pack, UTF-8 encoded.
+
+Bundles are rebuilt whenever the fingerprint of the source files changes.
+Packs with malformed records aren't bundled at all.
+"""
+
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+
+
+BUNDLE_MAGIC = b"INHB"
+BUNDLE_VERSION = 1
+
+_HEADER = struct.Struct("<4sHxx20sIIII")
+_RECORD = struct.Struct("<IIIIBBxx")
+
+# Files a pack is compiled from
+SOURCES = ("/info.txt", "/black.txt", "/white.txt")
+
+
+class BundleError(Exception):
+    """Error raised when a bundle is invalid."""
+
+
+def fingerprint(pack, check="mtime"):
+    """Compute the fingerprint of a pack's source files.
+
+    :param pack:
+        The :py:class:`~inhumane.deck.BasePack` to fingerprint.
+
+    :param check:
+        ``"mtime"`` to use the size and modification time of each file, or
+        ``"hash"`` to hash their contents.
+
+    :returns:
+        A 20-byte digest, or None if the pack has no source files.
+    """
+    h = hashlib.sha1()
+    found = False
+
+    for filename in SOURCES:
+        if check == "hash":
+            if not pack._exists(filename):
+                h.update(b"-")
+                continue
+
+            with pack._open(filename) as f:
+                data = f.read()
+
+            h.update(struct.pack("<Q", len(data)))
+            h.update(data)
+        else:
+            stat = pack._stat(filename)
+            if stat is None:
+                h.update(b"-")
+                continue
+
+            h.update(struct.pack("<QQ", *stat))
+
+        if filename != "/info.txt":
+            found = True
+
+    return h.digest() if found else None
+
+
+def bundle_path(directory, key):
+    """Return the path of the bundle for the given pack key."""
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(directory, "{0}.bundle".format(name))
+
+
+def write_bundle(path, digest, black, white):
+    """Write a bundle atomically.
+
+    :param path:
+        Path of the bundle file.
+
+    :param digest:
+        Fingerprint of the source files.
+
+    :param black:
+        A sequence of ``(text, drawcount, playcount, watermark)`` tuples.
+
+    :param white:
+        A sequence of ``(text, watermark)`` tuples.
+    """
+    strings = list()
+    offsets = dict()
+    size = 0
+
+    def intern(s):
+        nonlocal size
+        if s not in offsets:
+            offsets[s] = (size, len(s))
+            strings.append(s)
+            size += len(s)
+
+        return offsets[s]
+
+    records = bytearray()
+    for text, drawcount, playcount, watermark in black:
+        records += _RECORD.pack(*(intern(text) + intern(watermark) +
+                                  (drawcount, playcount)))
+
+    for text, watermark in white:
+        records += _RECORD.pack(*(intern(text) + intern(watermark) + (0, 0)))
+
+    strings = "".join(strings).encode("utf-8")
+    header = _HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, digest, len(black),
+                          len(white), _HEADER.size + len(records),
+                          len(strings))
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(records)
+            f.write(strings)
+
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class PackBundle(object):
+
+    """A memory-mapped pack bundle."""
+
+    def __init__(self, path):
+        """Open a bundle.
+
+        :param path:
+            Path of the bundle file.
+        """
+        self.path = path
+        self._table = None
+
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._parse_header()
+        except BaseException:
+            self.close()
+            raise
+
+    def _parse_header(self):
+        if len(self._map) < _HEADER.size:
+            raise BundleError("Truncated bundle")
+
+        (magic, version, self.fingerprint, self.blackcount, self.whitecount,
+         self._stroff, strlen) = _HEADER.unpack_from(self._map)
+
+        if magic != BUNDLE_MAGIC:
+            raise BundleError("Not a pack bundle")
+
+        if version != BUNDLE_VERSION:
+            raise BundleError("Unsupported bundle version")
+
+        reclen = (self.blackcount + self.whitecount) * _RECORD.size
+        if (self._stroff != _HEADER.size + reclen or
+                len(self._map) != self._stroff + strlen):
+            raise BundleError("Truncated bundle")
+
+    def _strings(self):
+        if self._table is None:
+            self._table = str(self._map[self._stroff:], "utf-8")
+
+        return self._table
+
+    def _records(self, start, count):
+        table = self._strings()
+        begin = _HEADER.size + start * _RECORD.size
+        end = begin + count * _RECORD.size
+        for (textoff, textlen, wmoff, wmlen, drawcount,
+             playcount) in _RECORD.iter_unpack(self._map[begin:end]):
+            yield (table[textoff:textoff + textlen],
+                   table[wmoff:wmoff + wmlen], drawcount, playcount)
+
+    def black(self):
+        """Yield ``(text, drawcount, playcount, watermark)`` for each black
+        card."""
+        for text, watermark, drawcount, playcount in self._records(
+                0, self.blackcount):
+            yield (text, drawcount, playcount, watermark)
+
+    def white(self):
+        """Yield ``(text, watermark)`` for each white card."""
+        for text, watermark, drawcount, playcount in self._records(
+                self.blackcount, self.whitecount):
+            yield (text, watermark)
+
+    def close(self):
+        self._map.close()
+        self._table = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_bundle(path, digest):
+    """Open a bundle if it exists and matches the given fingerprint.
+
+    :returns:
+        A :py:class:`PackBundle`, or None if the bundle is missing, invalid or
+        stale.
+    """
+    try:
+        bundle = PackBundle(path)
+    except (OSError, ValueError, BundleError):
+        return None
+
+    if bundle.fingerprint != digest:
+        bundle.close()
+        return None
+
+    return bundle
+
+
+def load_pack(pack, directory, check="mtime"):
+    """Load a pack's cards through its bundle, (re)building it if needed.
+
+    :param pack:
+        The :py:class:`~inhumane.deck.BasePack` to load.
+
+    :param directory:
+        Directory the bundles are kept in.
+
+    :param check:
+        How to check the bundle is up to date; see :py:func:`fingerprint`.
+
+    :returns:
+        False if the pack has no card files to compile, True otherwise.
+
+    A pack with malformed records (skipped, when it isn't strict) isn't
+    bundled, so they are reported again (or raised, if the pack is strict)
+    every time it is loaded.
+    """
+    digest = fingerprint(pack, check)
+    if digest is None:
+        return False
+
+    path = bundle_path(directory, pack.ident)
+
+    bundle = open_bundle(path, digest)
+    if bundle is not None:
+        with bundle:
+            pack._add_black(bundle.black())
+            pack._add_white(bundle.white())
+
+        return True
+
+    black = white = ()
+    if pack._exists("/black.txt"):
+        black = list(pack._black_records())
+
+    if pack._exists("/white.txt"):
+        white = list(pack._white_records())
+
+    if not pack.errors:
+        try:
+            write_bundle(path, digest, black, white)
+        except OSError:
+            # Not fatal, we have the cards anyway.
+            pass
+
+    pack._add_black(black)
+    pack._add_white(white)
+
+    return True
@@ -2,14 +2,64 @@
 # Licensed according to the terms specified in LICENSE.
 
 
+import re
+
+from hashlib import blake2b
+from itertools import count
+from operator import attrgetter
 from uuid import uuid1
 
+from .watermark import registry
+
+
+# Card ID's are unique within the process
+_cids = count()
+
+# Blanks and line breaks
+_markup = re.compile(r"_+|\\")
+
+
+def card_key(*fields):
+    """Compute a stable 64-bit key from the given fields.
+
+    The key is the same in every process (unlike :py:func:`hash`).
+    """
+    data = "\0".join(map(str, fields)).encode("utf-8")
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), "little")
+
+
+def collation_key(text):
+    """Return the key card text is sorted by.
+
+    Case, blanks (``_____``), line breaks (``\\``) and runs of whitespace
+    are ignored.
+    """
+    return " ".join(_markup.sub(" ", text).split()).casefold()
+
+
+def sort_cards(cards):
+    """Return a list of cards sorted for display."""
+    return sorted(cards, key=attrgetter("sortkey"))
+
 
 class Card(object):
 
     """The base object for cards.
 
-    Stores the watermark(s) and card text."""
+    Stores the watermark(s) and card text.
+
+    Cards are hashed by :py:attr:`key`, which is derived from their type and
+    content (but not their watermark). Equal keys are checked against the
+    content itself, so a key collision can't make two different cards equal.
+
+    Watermarks are stored as a mask in :py:attr:`wmask`; see
+    :py:mod:`inhumane.watermark`.
+
+    Cards are ordered by :py:attr:`sortkey` (see :py:func:`collation_key`);
+    sort with ``key=attrgetter("sortkey")`` (or :py:func:`sort_cards`) to
+    avoid comparing card objects."""
+
+    __slots__ = ("text", "wmask", "cid", "key", "sortkey", "_uuid")
 
     def __init__(self, text, watermark=()):
         """Create a card.
@@ -18,33 +68,69 @@ class Card(object):
             Text for the card.
 
         :param watermark:
-            Watermark for the card.
+            Watermark for the card: a single watermark name, an iterable of
+            names, or a watermark mask.
         """
         self.text = text
-        self.watermark = frozenset(watermark)
+        self.wmask = registry.mask(watermark)
 
-        self.cid = uuid1()
+        self.cid = next(_cids)
+        self.key = card_key(*self._content())
+        self.sortkey = collation_key(text)
+        self._uuid = None
+
+    def _content(self):
+        # Everything that makes up the card's identity, type first
+        return ("card", self.text)
+
+    @property
+    def watermark(self):
+        """The ``frozenset`` of the card's watermark names."""
+        return registry.names(self.wmask)
+
+    def has_watermark(self, name):
+        """Check if the card has the given watermark."""
+        return bool(self.wmask & registry.lookup(name))
+
+    def __reduce__(self):
+        # Watermark masks only mean something within a process
+        return (self.__class__, (self.text, tuple(self.watermark)))
+
+    @property
+    def uuid(self):
+        """A UUID for the card, generated on first use."""
+        if self._uuid is None:
+            self._uuid = uuid1()
+
+        return self._uuid
 
     def __eq__(self, other):
-        return self.text == other.text
+        if not isinstance(other, Card):
+            return NotImplemented
+
+        return (self.key == other.key and
+                self._content() == other._content())
 
     def __gt__(self, other):
-        return self.text > other.text
+        return self.sortkey > other.sortkey
 
     def __lt__(self, other):
-        return self.text < other.text
+        return self.sortkey < other.sortkey
 
     def __ge__(self, other):
-        return self.text >= other.text
+        return self.sortkey >= other.sortkey
 
     def __le__(self, other):
-        return self.text <= other.text
+        return self.sortkey <= other.sortkey
 
     def __ne__(self, other):
-        return self.text != other.text
+        if not isinstance(other, Card):
+            return NotImplemented
+
+        return not self == other
 
     def __hash__(self):
-        return hash((self.text, self.cid, self.watermark)) + 1
+        return self.key
 
     def __str__(self):
         return self.text
@@ -61,6 +147,8 @@ class BlackCard(Card):
     Stores the text, watermark(s), draw count, and play count.
     """
 
+    __slots__ = ("drawcount", "playcount")
+
     def __init__(self, text, watermark=(), drawcount=0, playcount=1):
         """A black card.
         
@@ -76,26 +164,33 @@ class BlackCard(Card):
         :param playcount:
             Number of cards to play when in play.
         """
-        super().__init__(text, watermark)
-
         self.drawcount = drawcount
         self.playcount = playcount
 
+        super().__init__(text, watermark)
+
+    def _content(self):
+        return ("black", self.text, self.drawcount, self.playcount)
+
+    def __reduce__(self):
+        return (self.__class__, (self.text, tuple(self.watermark),
+                                 self.drawcount, self.playcount))
+
     def __repr__(self):
         return ("BlackCard(text={0}, watermark={1}, drawcount={2}, "
                 "playcount={3})").format(self.text, self.watermark,
                                          self.drawcount, self.playcount)
 
-    def __hash__(self):
-        obj = (self.text, self.cid, self.watermark, self.drawcount,
-               self.playcount)
-        return hash(obj) + 1
-
 
 class WhiteCard(Card):
 
     """A white card."""
 
+    __slots__ = ()
+
+    def _content(self):
+        return ("white", self.text)
+
     def __repr__(self):
         return "WhiteCard(text={0}, watermark={1})".format(self.text,
                                                            self.watermark)
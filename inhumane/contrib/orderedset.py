@@ -1,19 +1,37 @@
 # Originally derived from http://code.activestate.com/recipes/576694/
 # Some major additions were made, namely __*item__ methods and
 # difference_update and update.
+# The linked list was since replaced by a dict and an array of keys, so
+# positional access doesn't have to walk the set.
 # Licensed under the MIT license.
 
-import collections
+from bisect import bisect_left, insort
+from collections.abc import MutableSet
 
 
-class OrderedSet(collections.MutableSet):
+# Marks a removed key in the array of keys
+_REMOVED = object()
+
+
+class OrderedSet(MutableSet):
+
+    """A set that remembers insertion order, and can be indexed.
+
+    Keys are kept in a dict (for order and membership) mapping each key to its
+    position in an array of keys. Removing a key leaves a hole in the array,
+    and the (sorted) positions of the holes are kept so positions can be
+    mapped across them. The array is only compacted once the holes make up
+    more than a quarter of it, so removal is amortised O(1), and indexing and
+    :py:meth:`index` are O(log h) for h holes (O(1) with none); slicing
+    ``k`` keys is O(k) plus the holes skipped.
+    """
 
     def __init__(self, iterable=None):
-        self.end = end = []
-        end += [None, end, end]         # sentinel node for doubly linked list
-        self.map = {}                   # key --> [key, prev, next]
+        self.map = {}                   # key --> position in keylist
+        self.keylist = []
+        self.holes = []                 # sorted positions of removed keys
         if iterable is not None:
-            self |= iterable
+            self.update(iterable)
 
     def __len__(self):
         return len(self.map)
@@ -21,58 +39,134 @@ class OrderedSet(collections.MutableSet):
     def __contains__(self, key):
         return key in self.map
 
+    def _compact(self):
+        holes = self.holes
+        if holes:
+            start = holes[0]
+            keys = self.keylist
+            keys[start:] = [k for k in keys[start:] if k is not _REMOVED]
+
+            # Only keys after the first hole moved. Update in place, so
+            # iterators over the set stay valid.
+            map = self.map
+            for i in range(start, len(keys)):
+                map[keys[i]] = i
+
+            del holes[:]
+
+        return self.keylist
+
+    def _position(self, index):
+        """Return the position in keylist of the key at index."""
+        size = len(self.map)
+        if index < 0:
+            index += size
+
+        if not 0 <= index < size:
+            raise IndexError("Index out of range")
+
+        holes = self.holes
+        if not holes:
+            return index
+
+        # The key comes after every hole with at most index keys before it
+        lo, hi = 0, len(holes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if holes[mid] - mid <= index:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return index + lo
+
     def __getitem__(self, index):
-        if isinstance(index, slice):
-            retval = list()
-            iter = index.indices(len(self))
+        keys = self.keylist
+        if not self.holes:
+            if isinstance(index, slice):
+                return keys[index]
 
-            # XXX - blah, ugly, but I'm lazy
-            in_map = set()
-            for k in range(*iter):
-                in_map.add(k)
+            try:
+                return keys[index]
+            except IndexError:
+                raise IndexError("Index out of range")
 
-            for i, k in enumerate(self):
-                if i in in_map:
-                    retval.append(k)
+        if not isinstance(index, slice):
+            return keys[self._position(index)]
 
-            return retval
-        else:
-            for i, k in enumerate(self):
-                if index == i:
-                    return k
+        start, stop, step = index.indices(len(self.map))
+        if step != 1:
+            return [keys[self._position(i)] for i in range(start, stop, step)]
 
-        raise IndexError("Index out of range")
+        # Walk the array from the first key, skipping holes
+        found = []
+        if start < stop:
+            pos = self._position(start)
+            while len(found) < stop - start:
+                key = keys[pos]
+                if key is not _REMOVED:
+                    found.append(key)
+
+                pos += 1
+
+        return found
 
     def __setitem__(self, index, key):
-        node = self.map.pop(self[index])
-        node[0] = key
-        self.map[key] = node
+        keys = self._compact()
+        old = keys[index]
+        if key == old:
+            return
+        elif key in self.map:
+            raise ValueError("key already in set")
+
+        keys[index] = key
+        self.map.clear()
+        self.map.update(zip(keys, range(len(keys))))
 
     def __delitem__(self, index):
-        self.remove(self[index])
+        if isinstance(index, slice):
+            self.difference_update(self[index])
+        else:
+            self.remove(self[index])
 
     def index(self, key):
-        for i, k in enumerate(self):
-            if k == key:
-                return i
+        try:
+            pos = self.map[key]
+        except KeyError:
+            raise KeyError("key not in set")
 
-        raise KeyError("key not in set")
+        return pos - bisect_left(self.holes, pos)
 
     def add(self, key):
         if key not in self.map:
-            end = self.end
-            curr = end[1]
-            curr[2] = end[1] = self.map[key] = [key, curr, end]
+            self.map[key] = len(self.keylist)
+            self.keylist.append(key)
 
     def update(self, keys):
+        map = self.map
+        append = self.keylist.append
         for key in keys:
-            self.add(key)
+            if key not in map:
+                map[key] = len(self.keylist)
+                append(key)
 
     def discard(self, key):
-        if key in self.map:
-            key, prev, next = self.map.pop(key)
-            prev[2] = next
-            next[1] = prev
+        pos = self.map.pop(key, None)
+        if pos is None:
+            return
+
+        keys = self.keylist
+        holes = self.holes
+        if pos == len(keys) - 1:
+            keys.pop()
+            while keys and keys[-1] is _REMOVED:
+                keys.pop()
+                holes.pop()
+        else:
+            keys[pos] = _REMOVED
+            insort(holes, pos)
+            if len(holes) * 4 > len(keys):
+                self._compact()
 
     def remove(self, key):
         if key not in self.map:
@@ -84,27 +178,29 @@ class OrderedSet(collections.MutableSet):
         for key in keys:
             self.discard(key)
 
+    def clear(self):
+        self.map.clear()
+        self.keylist = []
+        self.holes = []
+
     def __iter__(self):
-        end = self.end
-        curr = end[2]
-        while curr is not end:
-            yield curr[0]
-            curr = curr[2]
+        return iter(self.map)
 
     def __reversed__(self):
-        end = self.end
-        curr = end[1]
-        while curr is not end:
-            yield curr[0]
-            curr = curr[1]
+        for key in reversed(self.keylist):
+            if key is not _REMOVED:
+                yield key
 
     def pop(self, last=True):
         if not self:
             raise KeyError("set is empty")
-        key = self.end[1][0] if last else self.end[2][0]
+        key = self.keylist[-1] if last else next(iter(self.map))
         self.discard(key)
         return key
 
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
     def __repr__(self):
         if not self:
             return "%s()" % (self.__class__.__name__,)
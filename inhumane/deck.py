@@ -2,22 +2,115 @@
 # Licensed according to the terms specified in LICENSE.
 
 
+import io
 import json
 import os
+import time
+import zipfile
 
+from array import array
+from collections import OrderedDict, defaultdict, namedtuple
+from collections.abc import Sequence
 from contextlib import contextmanager
 from threading import RLock
-from pkg_resources import (resource_listdir, resource_isdir, resource_exists,
-                           resource_stream)
 
+from . import bundle
 from .card import BlackCard, WhiteCard
 from .contrib.orderedset import OrderedSet
+from .table import BLACK, WHITE, CardTable, CardView
+from .watermark import registry
 
 
 class PackLoadError(Exception):
     """Error raised when a pack cannot be loaded."""
 
 
+class PackFormatError(PackLoadError):
+
+    """Error raised when a pack file contains a malformed card record."""
+
+    def __init__(self, pack, filename, lineno, reason):
+        """Create the error.
+
+        :param pack:
+            Name (or path, if the name is unknown) of the pack.
+
+        :param filename:
+            The file containing the record.
+
+        :param lineno:
+            The line number of the record.
+
+        :param reason:
+            What's wrong with the record.
+        """
+        super().__init__("{0}: {1}, line {2}: {3}".format(pack, filename,
+                                                          lineno, reason))
+        self.pack = pack
+        self.filename = filename
+        self.lineno = lineno
+        self.reason = reason
+
+
+def _executor(workers, processes):
+    # Imported here, since most callers never discover in parallel
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    if processes:
+        return ProcessPoolExecutor(max_workers=workers)
+
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def _parse_count(field, name):
+    try:
+        count = int(field)
+    except ValueError:
+        raise ValueError("invalid {0} count {1!r}".format(name, field)) \
+            from None
+
+    # Stored in a byte in bundles
+    if not 0 <= count <= 255:
+        raise ValueError("{0} count {1} out of range".format(name, count))
+
+    return count
+
+
+def _parse_black(fields):
+    if len(fields) < 3:
+        raise ValueError("expected text, draw count and play count")
+
+    text = fields[0]
+    if not text:
+        raise ValueError("empty card text")
+
+    drawcount = _parse_count(fields[1], "draw")
+    playcount = _parse_count(fields[2], "play")
+    if playcount < 1:
+        raise ValueError("play count must be at least 1")
+
+    watermark = fields[3] if len(fields) >= 4 else ''
+
+    return (text, drawcount, playcount, watermark)
+
+
+def _parse_white(fields):
+    text = fields[0]
+    if not text:
+        raise ValueError("empty card text")
+
+    watermark = fields[1] if len(fields) > 1 else ''
+
+    return (text, watermark)
+
+
+DiscoveryResult = namedtuple("DiscoveryResult", "packs errors")
+DiscoveryResult.__doc__ = """The result of a parallel pack discovery.
+
+``packs`` is the list of packs loaded, in directory order; ``errors`` is an
+``OrderedDict`` of pack paths to the exception raised loading them.
+"""
+
 
 class BasePack(object):
 
@@ -25,13 +118,32 @@ class BasePack(object):
     for a given pack.
 
     It can be passed to the :py:class:`~inhumane.game.Game` instance.
+
+    The cards themselves are loaded on first access to
+    :py:attr:`whitecards`, :py:attr:`blackcards`, :py:attr:`maxplay` or
+    :py:attr:`maxdraw` (or an explicit call to :py:meth:`load_cards`).
+
+    If :py:attr:`bundle_dir` is set, file-backed packs are loaded through
+    compiled bundles kept in that directory (see :py:mod:`inhumane.bundle`).
     """
 
+    #: Directory to keep compiled pack bundles in, or None to not use them.
+    #: Defaults to the ``INHUMANE_BUNDLE_DIR`` environment variable.
+    bundle_dir = os.environ.get("INHUMANE_BUNDLE_DIR")
+
+    #: How bundles are checked against the pack files: ``"mtime"`` or
+    #: ``"hash"``.
+    bundle_check = "mtime"
+
+    #: Raise :py:exc:`PackFormatError` on malformed card records. If false,
+    #: they are skipped and recorded in :py:attr:`errors` instead.
+    strict = True
+
     def __init__(self, path):
         self.path = path
 
-        self.whitecards = OrderedSet()
-        self.blackcards = OrderedSet()
+        self._whitecards = OrderedSet()
+        self._blackcards = OrderedSet()
 
         self.name = None
         self.license = None
@@ -39,13 +151,73 @@ class BasePack(object):
         self.desc = None
         self.official = None
 
-        self.maxplay = 0
-        self.maxdraw = 0
+        self._maxplay = 0
+        self._maxdraw = 0
+
+        self.loaded = False
+        self._ident = None
+
+        # Malformed records skipped when not strict
+        self.errors = list()
+
+    @property
+    def whitecards(self):
+        self.load_cards()
+        return self._whitecards
+
+    @property
+    def blackcards(self):
+        self.load_cards()
+        return self._blackcards
+
+    @property
+    def maxplay(self):
+        self.load_cards()
+        return self._maxplay
+
+    @maxplay.setter
+    def maxplay(self, value):
+        self._maxplay = value
+
+    @property
+    def maxdraw(self):
+        self.load_cards()
+        return self._maxdraw
+
+    @maxdraw.setter
+    def maxdraw(self, value):
+        self._maxdraw = value
 
     def _formatpath(self, path): raise NotImplementedError
     def _isdir(self, path): raise NotImplementedError
     def _listdir(self, path): raise NotImplementedError
     def _exists(self, path): raise NotImplementedError
+    def _stat(self, path): raise NotImplementedError
+
+    @property
+    def ident(self):
+        """A string identifying where the pack comes from.
+
+        Used to name the pack's bundle and to cache decks. It is worked out
+        on first use, and kept, since every deck cache lookup needs it."""
+        if self._ident is None:
+            self._ident = self._make_ident()
+
+        return self._ident
+
+    def _make_ident(self):
+        return "{0}:{1}".format(type(self).__name__, self._formatpath(""))
+
+    @property
+    def stamp(self):
+        """The size and modification time of each of the pack's files, or
+        None if the pack isn't backed by files.
+
+        Used to notice when a pack has changed since a deck was built."""
+        try:
+            return tuple(self._stat(filename) for filename in bundle.SOURCES)
+        except NotImplementedError:
+            return None
 
     @contextmanager
     def _open(self, filename): raise NotImplementedError
@@ -60,105 +232,346 @@ class BasePack(object):
         self.desc = info.get("desc", "")
         self.official = info.get("official", False)
 
-    def load_black(self):
-        if not self._exists("/black.txt"):
-            return False
-
-        with self._open("/black.txt") as f:
-            for cardinfo in f.readlines():
-                if isinstance(cardinfo, bytes):
-                    cardinfo = cardinfo.decode("utf-8", "replace")
-
-                cardinfo = cardinfo.rstrip().split("\t")
-
-                # Draw information
-                cardinfo[1], cardinfo[2] = int(cardinfo[1]), int(cardinfo[2])
+    def _records(self, filename, parse):
+        """Parse one of the pack's card files, one line at a time.
+
+        :param filename:
+            The card file to parse.
+
+        :param parse:
+            Called with the tab-separated fields of each non-blank line;
+            returns the record, or raises ``ValueError`` if it is malformed.
+        """
+        with self._open(filename) as f:
+            lines = io.TextIOWrapper(f, encoding="utf-8", errors="replace")
+            for lineno, line in enumerate(lines, 1):
+                line = line.rstrip()
+                if not line:
+                    continue
+
+                try:
+                    record = parse(line.split("\t"))
+                except ValueError as e:
+                    error = PackFormatError(self.name or self.path,
+                                            filename.lstrip("/"), lineno,
+                                            str(e))
+                    if self.strict:
+                        raise error from None
+
+                    self.errors.append(error)
+                    continue
+
+                yield record
+
+    def _black_records(self):
+        """Yield ``(text, drawcount, playcount, watermark)`` for each black
+        card in the pack's files."""
+        return self._records("/black.txt", _parse_black)
+
+    def _white_records(self):
+        """Yield ``(text, watermark)`` for each white card in the pack's
+        files."""
+        return self._records("/white.txt", _parse_white)
+
+    def _add_black(self, records):
+        for text, drawcount, playcount, watermark in records:
+            if drawcount > self.maxdraw:
+                self.maxdraw = drawcount
 
-                text = cardinfo[0]
-                drawcount = cardinfo[1]
-                playcount = cardinfo[2]
-                watermark = cardinfo[3] if len(cardinfo) >= 4 else ''
+            if playcount > self.maxplay:
+                self.maxplay = playcount
 
-                if drawcount > self.maxdraw:
-                    self.maxdraw = drawcount
+            c = BlackCard(text, watermark, drawcount, playcount)
+            # TODO warn on dupes
+            self.blackcards.add(c)
 
-                if playcount > self.maxplay:
-                    self.maxplay = playcount
+    def _add_white(self, records):
+        for text, watermark in records:
+            c = WhiteCard(text, watermark)
+            # TODO warn on dupes
+            self.whitecards.add(c)
 
-                c = BlackCard(text, watermark, drawcount, playcount)
-                # TODO warn on dupes
-                self.blackcards.add(c)
+    def load_black(self):
+        if not self._exists("/black.txt"):
+            return False
 
+        self._add_black(self._black_records())
         return True
 
     def load_white(self):
         if not self._exists("/white.txt"):
             return False
 
-        with self._open("/white.txt") as f:
-            for cardinfo in f.readlines():
-                if isinstance(cardinfo, bytes):
-                    cardinfo = cardinfo.decode("utf-8", "replace")
+        self._add_white(self._white_records())
+        return True
 
-                cardinfo = cardinfo.rstrip().split("\t")
+    def _load_bundle(self):
+        if self.bundle_dir is None:
+            return False
+
+        try:
+            self._stat("/info.txt")
+        except NotImplementedError:
+            # Not backed by files
+            return False
 
-                text = cardinfo[0]
-                watermark = cardinfo[1] if len(cardinfo) > 1 else ''
+        return bundle.load_pack(self, self.bundle_dir, self.bundle_check)
 
-                c = WhiteCard(text, watermark)
-                # TODO warn on dupes
-                self.whitecards.add(c)
+    def load_cards(self):
+        """Load the white and black cards, if not already loaded."""
+        if self.loaded:
+            return
 
-        return True
+        # Set this first; load_black and load_white go through the properties
+        self.loaded = True
+        self.errors = list()
+
+        try:
+            if self._load_bundle():
+                return
+
+            if not any((self.load_black(), self.load_white())):
+                raise PackLoadError("Blank pack")
+        except Exception:
+            self.unload_cards()
+            self.errors = list()
+            raise
+
+    def unload_cards(self):
+        """Forget the white and black cards, to free their memory.
+
+        They are loaded again on next use. :py:class:`Deck` does this to
+        the packs it loaded itself, once it has copied their cards.
+        """
+        self._whitecards = OrderedSet()
+        self._blackcards = OrderedSet()
+        self._maxplay = self._maxdraw = 0
+        self.loaded = False
 
     def load_all(self):
         self.load_info()
-        if not any((self.load_black(), self.load_white())):
-            raise PackLoadError("Blank pack")
+        self.load_cards()
 
     @classmethod
-    def load(cls, path):
+    def load(cls, path, lazy=False):
+        """Load a pack.
+
+        :param path:
+            Path to the pack.
+
+        :param lazy:
+            Only load the pack info; the cards are loaded on first use.
+        """
         p = cls(path)
-        p.load_all()
+        p.load_info()
+        if not lazy:
+            p.load_cards()
         return p
 
     @classmethod
-    def discover(cls, path):
+    def discover(cls, path, lazy=False):
+        """Load all packs in the given directory.
+
+        :param lazy:
+            Only load the pack info; the cards are loaded on first use.
+        """
+        return [cls.load(p, lazy) for p in cls._discover_paths(path)]
+
+    @classmethod
+    def _discover_paths(cls, path):
         # Dummy object so _listdir works
         dummy = cls(path)
-        return [cls.load(dummy._formatpath(p)) for p in dummy._listdir('') if
+        return [dummy._formatpath(p) for p in dummy._listdir('') if
                 dummy._isdir(p)]
 
+    @classmethod
+    def discover_parallel(cls, path, workers=None, processes=False,
+                          lazy=False):
+        """Load all packs in the given directory in parallel.
+
+        Unlike :py:meth:`discover`, a pack that fails to load doesn't stop the
+        others from loading.
+
+        :param workers:
+            Maximum number of workers; the default is chosen by
+            :py:mod:`concurrent.futures`.
+
+        :param processes:
+            Use a process pool instead of a thread pool.
+
+        :param lazy:
+            Only load the pack info; the cards are loaded on first use.
+
+        :returns:
+            A :py:class:`DiscoveryResult`.
+        """
+        paths = cls._discover_paths(path)
+
+        with _executor(workers, processes) as executor:
+            futures = [executor.submit(cls.load, p, lazy) for p in paths]
+
+            packs = list()
+            errors = OrderedDict()
+            for p, future in zip(paths, futures):
+                try:
+                    packs.append(future.result())
+                except Exception as e:
+                    errors[p] = e
+
+        return DiscoveryResult(packs, errors)
+
+    @classmethod
+    async def discover_async(cls, path, workers=None, processes=False,
+                             lazy=False):
+        """Load all packs in the given directory without blocking the event
+        loop.
+
+        This is a coroutine; the arguments and return value are the same as
+        :py:meth:`discover_parallel`.
+        """
+        # Only needed here, and slow to import
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        executor = _executor(workers, processes)
+        try:
+            paths = await loop.run_in_executor(executor, cls._discover_paths,
+                                               path)
+            results = await asyncio.gather(
+                *[loop.run_in_executor(executor, cls.load, p, lazy) for p in
+                  paths], return_exceptions=True)
+        finally:
+            executor.shutdown(wait=False)
+
+        packs = list()
+        errors = OrderedDict()
+        for p, result in zip(paths, results):
+            if isinstance(result, Exception):
+                errors[p] = result
+            elif isinstance(result, BaseException):
+                # Cancellation (or an exit) isn't an error in the pack
+                raise result
+            else:
+                packs.append(result)
+
+        return DiscoveryResult(packs, errors)
+
     def __repr__(self):
+        if not self.loaded:
+            return ("Pack(name={0}, <cards not loaded>, copyright={1}, "
+                    "license={2}, desc={3}, official={4})").format(
+                        self.name, self.copyright, self.license, self.desc,
+                        self.official)
+
         return ("Pack(name={0}, blackcards=<{1} cards>, whitecards=<{2} cards>, "
                 "copyright={3}, license={4}, desc={5}, official={6})").format(
                     self.name, len(self.blackcards), len(self.whitecards),
                     self.copyright, self.license, self.desc, self.official)
 
 
+class PackRegistry(Sequence):
+
+    """A lazily discovered, read-only sequence of packs.
+
+    Nothing is read until the registry is first used; the packs are then
+    discovered with only their info loaded, and each pack's cards are parsed
+    on first use.
+    """
+
+    def __init__(self, packcls, path):
+        """Create a pack registry.
+
+        :param packcls:
+            The :py:class:`BasePack` subclass used to discover the packs.
+
+        :param path:
+            Path to the directory containing the packs.
+        """
+        self.packcls = packcls
+        self.path = path
+
+        self._packs = None
+        self._lock = RLock()
+
+    @property
+    def packs(self):
+        """The list of discovered packs."""
+        if self._packs is None:
+            with self._lock:
+                if self._packs is None:
+                    self._packs = self.packcls.discover(self.path, lazy=True)
+
+        return self._packs
+
+    def names(self):
+        """Return the names of all packs."""
+        return [pack.name for pack in self.packs]
+
+    def get(self, name, default=None):
+        """Return the pack with the given name, or default if not found."""
+        for pack in self.packs:
+            if pack.name == name:
+                return pack
+
+        return default
+
+    def __getitem__(self, index):
+        return self.packs[index]
+
+    def __len__(self):
+        return len(self.packs)
+
+    def __repr__(self):
+        if self._packs is None:
+            return "PackRegistry(path={0}, <not discovered>)".format(self.path)
+
+        return "PackRegistry(path={0}, packs={1})".format(self.path,
+                                                          self.names())
+
+
 class BuiltinPack(BasePack):
 
     """The pack object for builtin (package) packs."""
 
+    # pkg_resources is slow to import, and isn't needed until a builtin pack
+    # is actually touched.
+
     def _formatpath(self, path):
         return "{0}/{1}".format(self.path, path)
 
     def _isdir(self, path):
+        from pkg_resources import resource_isdir
         return resource_isdir(__name__, self._formatpath(path))
 
     def _listdir(self, path):
+        from pkg_resources import resource_listdir
         return resource_listdir(__name__, self._formatpath(path))
 
     def _exists(self, path):
+        from pkg_resources import resource_exists
         return resource_exists(__name__, self._formatpath(path))
 
+    def _stat(self, path):
+        from pkg_resources import resource_filename
+        try:
+            st = os.stat(resource_filename(__name__, self._formatpath(path)))
+        except (FileNotFoundError, KeyError):
+            return None
+
+        return (st.st_size, st.st_mtime_ns)
+
+    def _make_ident(self):
+        return "{0}:{1}".format(__file__, super()._make_ident())
+
     @contextmanager
     def _open(self, filename):
+        from pkg_resources import resource_stream
         with resource_stream(__name__, self._formatpath(filename)) as f:
             yield f
 
 
-basepacks = BuiltinPack.discover("packs")
+# Discovered on first use
+basepacks = PackRegistry(BuiltinPack, "packs")
 
 
 class ExternalPack(BasePack):
@@ -173,7 +586,7 @@ class ExternalPack(BasePack):
         super().__init__(path)
 
     def _formatpath(self, path):
-        return os.path.join(self.path, path)
+        return os.path.join(self.path, path.lstrip("/"))
 
     def _isdir(self, path):
         return os.path.isdir(self._formatpath(path))
@@ -184,9 +597,137 @@ class ExternalPack(BasePack):
     def _exists(self, path):
         return os.path.exists(self._formatpath(path))
 
+    def _stat(self, path):
+        try:
+            st = os.stat(self._formatpath(path))
+        except FileNotFoundError:
+            return None
+
+        return (st.st_size, st.st_mtime_ns)
+
+    def _make_ident(self):
+        return "{0}:{1}".format(type(self).__name__,
+                                os.path.abspath(self.path))
+
     @contextmanager
     def _open(self, filename):
-        with open(self._formatpath(filename), "r") as f:
+        with open(self._formatpath(filename), "rb") as f:
+            yield f
+
+
+class _Archive(object):
+
+    """An open zip archive, with its central directory read once."""
+
+    def __init__(self, path):
+        st = os.stat(path)
+        self.stamp = (st.st_size, st.st_mtime_ns)
+
+        # Forked children must not share the file offset with the parent
+        self.pid = os.getpid()
+
+        self.zipfile = zipfile.ZipFile(path)
+        self.members = {info.filename: info for info in
+                        self.zipfile.infolist()}
+
+        # Directories and their immediate children
+        self.children = defaultdict(set)
+        for name in self.members:
+            parts = name.rstrip("/").split("/")
+            for i in range(len(parts)):
+                self.children["/".join(parts[:i])].add(parts[i])
+
+    def isdir(self, member):
+        member = member.rstrip("/")
+        return member == "" or (member in self.children and
+                                member not in self.members)
+
+
+_archives = dict()
+_archives_lock = RLock()
+
+
+def _open_archive(path):
+    """Return the open archive for a path, reopening it if it has changed.
+
+    The archive it replaces is closed; members already being read from it
+    can still be read to the end.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+
+    with _archives_lock:
+        archive = _archives.get(path)
+        if (archive is None or archive.pid != os.getpid() or
+                archive.stamp != (st.st_size, st.st_mtime_ns)):
+            if archive is not None:
+                archive.zipfile.close()
+
+            archive = _archives[path] = _Archive(path)
+
+        return archive
+
+
+class ArchivePack(BasePack):
+
+    """The pack object for packs inside a zip archive.
+
+    The path is that of the archive, optionally followed by ``!/`` and the
+    directory of the pack inside it (e.g. ``packs.zip!/First Version``);
+    without a directory the pack is at the top of the archive.
+    :py:meth:`~BasePack.discover` on an archive loads every pack in its top
+    level directories.
+
+    The archive is opened and its directory read once, and shared by all the
+    packs in it. It is looked up on every use, so all the packs move to the
+    new archive if the file is replaced.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+
+        self.archivepath, sep, member = path.partition("!/")
+        self.member = member.strip("/")
+
+    @property
+    def archive(self):
+        return _open_archive(self.archivepath)
+
+    def _member(self, path):
+        return "/".join(p for p in (self.member, path.strip("/")) if p)
+
+    def _formatpath(self, path):
+        member = self._member(path)
+        if not member:
+            return self.archivepath
+
+        return "{0}!/{1}".format(self.archivepath, member)
+
+    def _isdir(self, path):
+        return self.archive.isdir(self._member(path))
+
+    def _listdir(self, path):
+        return sorted(self.archive.children.get(self._member(path), ()))
+
+    def _exists(self, path):
+        return self._member(path) in self.archive.members
+
+    def _stat(self, path):
+        info = self.archive.members.get(self._member(path))
+        if info is None:
+            return None
+
+        # The CRC stands in for the modification time
+        return (info.file_size, info.CRC)
+
+    def _make_ident(self):
+        return "{0}:{1}!/{2}".format(type(self).__name__,
+                                     os.path.abspath(self.archivepath),
+                                     self.member)
+
+    @contextmanager
+    def _open(self, filename):
+        with self.archive.zipfile.open(self._member(filename)) as f:
             yield f
 
 
@@ -198,6 +739,10 @@ class PycardcastPack(BasePack):
         super().__init__(None)
         self.deck = deck
 
+    def _make_ident(self):
+        # Unique while the pack is alive
+        return "{0}:{1}".format(type(self).__name__, id(self))
+
     def load_info(self):
         deck = self.deck.deckinfo
 
@@ -245,25 +790,100 @@ class PycardcastPack(BasePack):
         return True
 
 
+def rows_typecode(count):
+    """Return the smallest ``array`` typecode that holds count rows."""
+    return "H" if count <= 0x10000 else "I"
+
+
+class _FrozenRows(array):
+
+    """A read-only ``array`` of rows, for a frozen deck.
+
+    Copying one into a new ``array`` (as every game's draw piles do) is
+    still a single memory copy.
+    """
+
+    def _frozen(self, *args, **kwargs):
+        raise TypeError("Can't change the rows of a frozen deck")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _frozen
+    append = extend = insert = pop = remove = reverse = byteswap = _frozen
+    frombytes = fromfile = fromlist = fromunicode = _frozen
+
+
+def normalize_text(text):
+    """Normalize card text for finding duplicates.
+
+    Case and runs of whitespace are ignored.
+    """
+    return " ".join(text.split()).casefold()
+
+
 class Deck(object):
 
     """The entire deck, containing packs.
 
-    Dupes are filtered out optionally."""
+    Dupes are filtered out optionally: unless ``dupes`` is set, cards with
+    the same (normalized) text from any of the packs are only kept once, with
+    the watermarks of all the copies. The number of cards dropped this way is
+    kept in :py:attr:`collapsed`.
+
+    The cards are stored once, in the :py:class:`~inhumane.table.CardTable`
+    :py:attr:`table`; :py:attr:`whiteindices` and :py:attr:`blackindices` are
+    arrays (of :py:attr:`typecode`) of the rows of the white and black cards,
+    and :py:attr:`ranks` holds the position of each row when all the cards
+    are sorted for display. :py:attr:`whitecards` and :py:attr:`blackcards` are read-only
+    sequences of the corresponding card objects, which are only built when
+    accessed.
+
+    A deck can be frozen with :py:meth:`freeze`, after which it can't be
+    changed and is safe to share between games; :py:class:`DeckCache` hands
+    out frozen decks. :py:attr:`ident` identifies the deck by the
+    :py:attr:`~BasePack.ident` of each pack (in order) and the ``dupes``
+    flag, as in the cache, and :py:attr:`stamp` holds the
+    :py:attr:`~BasePack.stamp` of each pack when the deck was built.
+
+    Packs that weren't loaded before the deck was built are unloaded again
+    afterwards (see :py:meth:`~BasePack.unload_cards`), so their cards are
+    only kept in the table."""
 
     def __init__(self, packs, dupes=False):
-        self.packs = packs
+        self.frozen = False
+
+        # Iterated more than once below
+        self.packs = packs = list(packs)
         self.dupes = dupes
 
-        self.whitecards = OrderedSet()
-        self.blackcards = OrderedSet()
+        # The same key as in DeckCache, worked out once for snapshots
+        self.ident = (tuple(pack.ident for pack in packs), dupes)
+        self.stamp = tuple(pack.stamp for pack in packs)
+
+        self.table = CardTable()
+        self.whiteindices = array("I")
+        self.blackindices = array("I")
+
+        self.collapsed = 0
 
         self.maxdraw = 0
         self.maxplay = 0
 
+        # Normalized card -> row, across all the packs
+        seen = dict()
+
+        # Sort key of each row
+        sortkeys = list()
+
         for pack in packs:
-            self._do_white(pack)
-            self._do_black(pack)
+            loaded = pack.loaded
+
+            for card in pack.whitecards:
+                self._add(seen, (WHITE, normalize_text(card.text)), card,
+                          self.whiteindices, sortkeys)
+
+            for card in pack.blackcards:
+                self._add(seen, (BLACK, normalize_text(card.text),
+                                 card.drawcount, card.playcount), card,
+                          self.blackindices, sortkeys)
 
             if pack.maxdraw > self.maxdraw:
                 self.maxdraw = pack.maxdraw
@@ -271,38 +891,286 @@ class Deck(object):
             if pack.maxplay > self.maxplay:
                 self.maxplay = pack.maxplay
 
+            if not loaded:
+                pack.unload_cards()
+
+        self.table.finish()
+
+        # Most decks fit in 16-bit rows, halving the size of every game's
+        # piles copied from these
+        typecode = self.typecode = rows_typecode(len(self.table))
+        self.whiteindices = array(typecode, self.whiteindices)
+        self.blackindices = array(typecode, self.blackindices)
+
+        # Display order of every row, so hands can be kept sorted cheaply
+        order = sorted(range(len(self.table)), key=sortkeys.__getitem__)
+        self.ranks = array(typecode, [0]) * len(order)
+        for rank, row in enumerate(order):
+            self.ranks[row] = rank
+
+        self.whitecards = CardView(self.table, self.whiteindices, WHITE)
+        self.blackcards = CardView(self.table, self.blackindices, BLACK)
+
         if not (self.whitecards or self.blackcards):
             raise PackLoadError("No cards in deck")
 
-    def _do_white(self, pack):
-        t_white = dict()
+    def _add(self, seen, norm, card, indices, sortkeys):
+        if not self.dupes:
+            row = seen.get(norm)
+            if row is not None:
+                # Merge the watermarks into the existing card
+                wmask = self.table.wmasks[row]
+                if card.wmask | wmask != wmask:
+                    self.table.set_wmask(row, registry.mask(card.wmask |
+                                                            wmask))
+
+                self.collapsed += 1
+                return
+
+        row = self.table.append_card(card)
+        seen.setdefault(norm, row)
+        indices.append(row)
+        sortkeys.append(card.sortkey)
+
+    def __setattr__(self, name, value):
+        if getattr(self, "frozen", False):
+            raise AttributeError("Deck is frozen")
+
+        super().__setattr__(name, value)
+
+    def freeze(self):
+        """Make the deck immutable.
+
+        :py:attr:`whiteindices`, :py:attr:`blackindices` and :py:attr:`ranks`
+        become read-only arrays, as they are shared by every game using the
+        deck.
+
+        :returns:
+            The deck.
+        """
+        if self.frozen:
+            return self
+
+        self.table.freeze()
+
+        for name in ("whiteindices", "blackindices", "ranks"):
+            rows = getattr(self, name)
+            setattr(self, name, _FrozenRows(rows.typecode, rows))
+
+        self.whitecards.rows = self.whiteindices
+        self.blackcards.rows = self.blackindices
+
+        self.frozen = True
+        return self
 
-        # Dupe filtering and watermark stuff
-        for card in pack.whitecards:
-            if card.text in t_white and not self.dupes:
-                # Update watermark
-                watermark = list(t_white[card.text].watermark)
-                watermark.append(card.watermark)
-                card = WhiteCard(card.text, watermark)
+    def card(self, index):
+        """Return the card object for a row of the table."""
+        return self.table.card(index)
 
-            t_white[card.text] = card
+    def index(self, card):
+        """Return the (first) row of a card in the table.
 
-        for card in t_white.values():
-            self.whitecards.add(card)
+        :raises KeyError:
+            The card isn't in the deck.
+        """
+        return self.indices(card)[0]
 
-    def _do_black(self, pack):
-        t_black = dict()
+    def indices(self, card):
+        """Return a list of the rows holding a card, in order.
 
-        # Dupe filtering and watermark stuff
-        for card in pack.blackcards:
-            if card.text in t_black and not self.dupes:
-                watermark = list(t_black[card.text].watermark)
-                watermark.append(card.watermark)
-                card = BlackCard(card.text, watermark, card.drawcount,
-                                 card.playcount)
+        There is more than one only if the deck keeps duplicates.
 
-            t_black[card.text] = card
+        :raises KeyError:
+            The card isn't in the deck.
+        """
+        table = self.table
+        rows = [row for row in table.find_all(card.key) if
+                table.card(row) == card]
+        if not rows:
+            raise KeyError(card)
 
-        for card in t_black.values():
-            self.blackcards.add(card)
+        return rows
 
+    def sort(self, rows):
+        """Return a list of rows sorted for display."""
+        return sorted(rows, key=self.ranks.__getitem__)
+
+    def watermarked(self, *names):
+        """Return the white and black cards with any of the given watermarks.
+
+        :returns:
+            A ``(whitecards, blackcards)`` tuple of lists.
+        """
+        mask = 0
+        for name in names:
+            mask |= registry.lookup(name)
+
+        wmasks = self.table.wmasks
+        card = self.table.card
+        return ([card(i) for i in self.whiteindices if wmasks[i] & mask],
+                [card(i) for i in self.blackindices if wmasks[i] & mask])
+
+
+CacheInfo = namedtuple("CacheInfo", "hits misses evictions maxsize currsize")
+
+
+class DeckCache(object):
+
+    """A size-bounded LRU cache of frozen decks.
+
+    Decks are keyed by the :py:attr:`~BasePack.ident` of their packs (in
+    order) and the ``dupes`` flag, so the same selection of packs always gets
+    the same shared deck. A cached deck is rebuilt if the
+    :py:attr:`~BasePack.stamp` of any of its packs has changed, which is
+    checked at most every ``check_interval`` seconds (finding the stamps
+    means looking at every pack's files); use :py:meth:`invalidate` to drop
+    decks at once, or for packs changed some other way.
+
+    .. note::
+        Decks are rebuilt from the pack objects passed in, so packs which
+        have changed must be loaded again to pick up the changes.
+    """
+
+    def __init__(self, maxsize=32, check_interval=1.0, clock=time.monotonic):
+        """Create the cache.
+
+        :param maxsize:
+            Maximum number of decks to keep.
+
+        :param check_interval:
+            Check a cached deck's packs for changes at most once in this many
+            seconds; 0 checks on every lookup, and None never does.
+
+        :param clock:
+            The function giving the time in seconds.
+        """
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._decks = OrderedDict()
+        self._lock = RLock()
+
+        # When each deck's packs were last checked for changes
+        self._checked = dict()
+
+    def get(self, packs, dupes=False):
+        """Return the frozen deck for the given packs, building it if
+        needed."""
+        packs = list(packs)
+        key = (tuple(pack.ident for pack in packs), dupes)
+        now = self.clock()
+
+        with self._lock:
+            deck = self._decks.get(key)
+            if deck is not None and (self.check_interval is None or
+                                     now - self._checked[key] <
+                                     self.check_interval):
+                self._decks.move_to_end(key)
+                self.hits += 1
+                return deck
+
+        if deck is not None:
+            stamp = tuple(pack.stamp for pack in packs)
+
+        with self._lock:
+            if deck is not None and self._decks.get(key) is deck:
+                if deck.stamp == stamp:
+                    self._checked[key] = now
+                    self._decks.move_to_end(key)
+                    self.hits += 1
+                    return deck
+
+                # The packs have changed since
+                del self._decks[key]
+                del self._checked[key]
+
+            self.misses += 1
+
+        # Build outside the lock; if another thread beat us, use theirs
+        deck = Deck(packs, dupes).freeze()
+
+        with self._lock:
+            cached = self._decks.get(key)
+            if cached is None or cached.stamp != deck.stamp:
+                self._decks[key] = cached = deck
+                self._checked[key] = now
+
+            deck = cached
+            self._decks.move_to_end(key)
+            while len(self._decks) > self.maxsize:
+                oldest, _ = self._decks.popitem(last=False)
+                del self._checked[oldest]
+                self.evictions += 1
+
+        return deck
+
+    def find(self, ident):
+        """Return the cached deck with the given :py:attr:`Deck.ident`, or
+        None if it isn't loaded."""
+        with self._lock:
+            deck = self._decks.get(ident)
+            if deck is not None:
+                self._decks.move_to_end(ident)
+
+            return deck
+
+    def invalidate(self, packs):
+        """Drop every cached deck with any of the given packs.
+
+        :returns:
+            The number of decks dropped.
+        """
+        idents = {pack.ident for pack in packs}
+        with self._lock:
+            stale = [key for key in self._decks if not idents.isdisjoint(
+                key[0])]
+            for key in stale:
+                del self._decks[key]
+                del self._checked[key]
+
+        return len(stale)
+
+    def info(self):
+        """Return the cache statistics as a :py:class:`CacheInfo`."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             self.maxsize, len(self._decks))
+
+    def clear(self):
+        """Empty the cache (the statistics are kept)."""
+        with self._lock:
+            self._decks.clear()
+            self._checked.clear()
+
+    def __len__(self):
+        return len(self._decks)
+
+
+deck_cache = DeckCache()
+
+
+def get_deck(packs, dupes=False):
+    """Return a shared, frozen deck for the given packs from
+    :py:data:`deck_cache`."""
+    return deck_cache.get(packs, dupes)
+
+
+def combine_decks(decks):
+    """Return a single shared deck with the cards of all the given decks.
+
+    A single deck is returned as-is, and None is returned if there are no
+    decks.
+    """
+    decks = list(decks)
+    if not decks:
+        return None
+    elif len(decks) == 1:
+        return decks[0]
+
+    packs = [pack for deck in decks for pack in deck.packs]
+    return get_deck(packs, all(deck.dupes for deck in decks))
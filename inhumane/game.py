@@ -1,17 +1,23 @@
 # Copyright © 2013 Elizabeth Myers. All Rights reserved.
 # Licensed according to the terms specified in LICENSE.
 
-from random import shuffle, SystemRandom
-from collections import deque, Counter, OrderedDict, defaultdict, Iterable
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Iterable
+from functools import partial, wraps
 from operator import itemgetter
 from uuid import uuid1
 from warnings import warn
 
-from .contrib.orderedset import OrderedSet
-from .deck import Deck, basepacks
-
-
-rng = SystemRandom()
+from .actions import ActionResult, Gamble, Pass, Play, Trade, Vote
+from .audience import AudienceVote
+from .deck import basepacks, combine_decks, get_deck
+from .hand import Hand
+from .journal import Journal
+from .pile import DrawPile
+from .rng import get_rng
+from .roster import Roster
+from .scoreboard import Scoreboard
 
 
 class BaseGameError(Exception):
@@ -34,6 +40,85 @@ class RuleError(BaseGameError):
     """Class for rule violation errors."""
 
 
+def _journaled(method):
+    """Record calls of a method in the game's journal, unless they're made by
+    another journaled method."""
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        journal = self.journal
+        if journal is None or journal.depth:
+            return method(self, *args, **kwargs)
+
+        # Encoded now, so changing the arguments later doesn't matter
+        call = journal.begin(name, args, kwargs)
+        failed = True
+        journal.depth += 1
+        try:
+            result = method(self, *args, **kwargs)
+            failed = False
+        finally:
+            journal.depth -= 1
+
+            # A call that raised may have changed the game first
+            journal.end(call, failed)
+
+        return result
+
+    return wrapper
+
+
+class _Pending(object):
+
+    """What a batch of actions will change, for checking later actions in
+    the batch.
+
+    Each container is only made when it is first used, since a single
+    action needs one or two at most."""
+
+    __slots__ = ("_played", "_voted", "_gambled", "_used", "_ap")
+
+    def __init__(self):
+        self._played = self._voted = self._gambled = None
+        self._used = self._ap = None
+
+    @property
+    def played(self):
+        if self._played is None:
+            self._played = set()
+
+        return self._played
+
+    @property
+    def voted(self):
+        if self._voted is None:
+            self._voted = set()
+
+        return self._voted
+
+    @property
+    def gambled(self):
+        if self._gambled is None:
+            self._gambled = set()
+
+        return self._gambled
+
+    @property
+    def used(self):
+        if self._used is None:
+            self._used = defaultdict(set)
+
+        return self._used
+
+    @property
+    def ap(self):
+        if self._ap is None:
+            self._ap = defaultdict(int)
+
+        return self._ap
+
+
 class Game(object):
 
     """The basic game object.
@@ -43,6 +128,12 @@ class Game(object):
 
     Decks must be added at instantiation time.
 
+    Cards are held as rows of the game's (shared, unmodified)
+    :py:attr:`deck`, in compact integer arrays; use :py:meth:`card` to get
+    the card object for a row. Methods taking cards accept either card
+    objects or rows, and methods returning cards to be shown return card
+    objects.
+
     When an error with the game arises, :py:exc:`~inhumane.game.GameError` is
     raised. When the rules are broken, :py:exc:`~inhumane.game.RuleError` is
     raised. Note that all forms of cheating are not caught (and you could cheat
@@ -51,26 +142,45 @@ class Game(object):
     :ivar name:
         The name of the game. Can be freeform.
 
+    :ivar deck:
+        The :py:class:`~inhumane.deck.Deck` the cards are from.
+
+    :ivar rng:
+        The ``random.Random`` instance used for shuffling.
+
+    :ivar seed:
+        The seed of :py:attr:`rng`, if it was seeded, so the game can be
+        replayed.
+
     :ivar blackcards:
-        A ``deque`` holding the present set of black cards from the deck.
+        A :py:class:`~inhumane.pile.DrawPile` holding the rows of the present
+        set of black cards from the deck.
 
     :ivar whitecards:
-        A ``deque`` holding the present set of white cards from the deck.
+        A :py:class:`~inhumane.pile.DrawPile` holding the rows of the present
+        set of white cards from the deck.
 
     :ivar discardblack:
-        The black discard pile.
+        The black discard pile (an ``array`` of rows).
 
     :ivar discardwhite:
-        The white discard pile.
+        The white discard pile (an ``array`` of rows).
 
     :ivar blackcard:
         The present black card in play.
 
+    :ivar blackrow:
+        The row of the present black card in play.
+
+    :ivar playercards:
+        A ``dict`` of player UUID's to the :py:class:`~inhumane.hand.Hand` of
+        rows in their hand, kept in display order.
+
     :ivar players:
-        An ``OrderedSet`` of player UUID's
+        A :py:class:`~inhumane.roster.Roster` of player UUID's
 
     :ivar playerplay:
-        An ``OrderedDict`` of player UUID's to cards played.
+        An ``OrderedDict`` of player UUID's to the rows of the cards played.
     
     :ivar playerlast:
         A ``dict`` containing player UUID's to last round played.
@@ -80,15 +190,21 @@ class Game(object):
         they have voted for, if voting is enabled. This is subject to change.
 
     :ivar votes:
-        A ``Counter`` containing the total number of votes players have
-        received. Note that players without votes aren't listed.
+        A :py:class:`~inhumane.scoreboard.Scoreboard` containing the total
+        number of votes players have received. Note that players without
+        votes aren't listed.
+
+    :ivar audiencevote:
+        The :py:class:`~inhumane.audience.AudienceVote` for the present
+        round, if the audience house rule is set.
 
     :ivar gamblers:
         The ``set`` containing gamblers for this round, if gambling is
         enabled.
 
     :ivar ap:
-        A ``Counter`` representing the amount of player's current AP.
+        A :py:class:`~inhumane.scoreboard.Scoreboard` representing the amount
+        of player's current AP. Use its ``top()`` method for a leaderboard.
 
     :ivar rounds:
         Present number of rounds played.
@@ -98,6 +214,10 @@ class Game(object):
 
     :ivar spent:
         The game is spent and is over.
+
+    :ivar journal:
+        The :py:class:`~inhumane.journal.Journal` recording the game, or
+        None.
     """
 
     def __init__(self, name, **kwargs):
@@ -113,12 +233,38 @@ class Game(object):
 
         :key decks:
             An iterable containing card decks. See the
-            :py:class:`~inhumane.deck.Deck` class for more information.
+            :py:class:`~inhumane.deck.Deck` class for more information. The
+            decks aren't modified, so shared decks from
+            :py:func:`~inhumane.deck.get_deck` can be used. The default is
+            the shared deck of all the builtin packs.
+
+        :key rng:
+            The RNG strategy for shuffling; see
+            :py:func:`~inhumane.rng.get_rng`. The default is ``"secure"``. A
+            ``random.Random`` instance can also be given.
+
+        :key seed:
+            The seed for the ``"seeded"`` RNG strategy. If not given, a
+            random seed is picked. Either way, it is kept in
+            :py:attr:`seed`.
 
         :key voting:
             A house rule. If set to true, players vote instead of the tsar
             being used. Voting is presently not anonymous (this is a bug).
 
+        :key audience:
+            A house rule. If set to true, an audience outside the game votes
+            for the result of each round instead; see
+            :py:meth:`audience_vote`.
+
+        :key audience_quorum:
+            Close audience votes once this many have voted. The default is
+            no quorum.
+
+        :key audience_deadline:
+            Close audience votes this many seconds after the round starts.
+            The default is no deadline.
+
         :key maxcards:
             A house rule. Change the number of cards per hand. The default is
             10.
@@ -133,43 +279,55 @@ class Game(object):
 
         :key maxap:
             A house rule. Maximum number of AP to play to (default is 10).
+
+        :key journal:
+            A file to journal the game to, or a
+            :py:class:`~inhumane.journal.Journal`; see
+            :py:mod:`inhumane.journal`. The game isn't journaled by default.
         """
         self.name = name
 
         # Current players
-        self.players = OrderedSet()
+        self.players = Roster()
 
         # Card decks
-        self.blackcards = deque()
-        self.whitecards = deque()
-        maxdraw = 0
-        # Get all the decks
-        # (and check for max len in each)
-        for deck in kwargs.get("decks", [Deck(basepacks)]):
-            self.blackcards.extend(deck.blackcards)
-            self.whitecards.extend(deck.whitecards)
-            if deck.maxdraw > maxdraw:
-                maxdraw = deck.maxdraw
-
-        # Maximum amount of cards ever drawn
-        self.maxdraw = maxdraw
-
-        # Shuffle the decks
-        # Use the system RNG to (try to) ensure all possible shuffle states
+        decks = kwargs.get("decks")
+        if decks is None:
+            decks = [get_deck(basepacks)]
+
+        # The draw piles are shuffled as cards are drawn from them.
+        # The RNG strategies all (try to) ensure all possible shuffle states
         # occur, because the default RNG only has 2**32 ish states and a deck
         # can have 2**255.6 possible shuffles.
-        shuffle(self.blackcards, rng.random)
-        shuffle(self.whitecards, rng.random)
+        rng = self.rng = get_rng(kwargs.get("rng", "secure"),
+                                 kwargs.get("seed"))
+        self.seed = getattr(rng, "seedvalue", None)
+
+        self.deck = combine_decks(decks)
+        if self.deck is not None:
+            typecode = self.deck.typecode
+            self.blackcards = DrawPile(self.deck.blackindices, rng, typecode)
+            self.whitecards = DrawPile(self.deck.whiteindices, rng, typecode)
+
+            # Maximum amount of cards ever drawn
+            self.maxdraw = self.deck.maxdraw
+        else:
+            self.blackcards = DrawPile((), rng, "H")
+            self.whitecards = DrawPile((), rng, "H")
+            self.maxdraw = 0
 
         # Discard piles
-        self.discardblack = deque()
-        self.discardwhite = deque()
+        self.discardblack = array(self.blackcards.typecode)
+        self.discardwhite = array(self.whitecards.typecode)
 
         # Black card in play
-        self.blackcard = None
+        self.blackrow = None
 
         # Players:decks/hands
-        self.playercards = defaultdict(OrderedSet)
+        # Not a bound method, so the game isn't in a reference cycle and is
+        # freed as soon as it's dropped
+        ranks = self.deck.ranks if self.deck is not None else ()
+        self.playercards = defaultdict(partial(Hand, ranks))
         self.playerplay = OrderedDict()
 
         # Round that the players last played
@@ -177,8 +335,9 @@ class Game(object):
 
         # Votes and AP
         self.voters = dict()
-        self.votes = Counter()
-        self.ap = Counter()
+        self.votes = Scoreboard()
+        self.ap = Scoreboard()
+        self.audiencevote = None
         self.gamblers = set()
         self.ap_grant = 1
 
@@ -195,6 +354,9 @@ class Game(object):
         # House rules
         self.gambling = kwargs.get("gambling", True)  # Technically official...
         self.voting = kwargs.get("voting", False)
+        self.audience = kwargs.get("audience", False)
+        self.audience_quorum = kwargs.get("audience_quorum")
+        self.audience_deadline = kwargs.get("audience_deadline")
         self.maxcards = kwargs.get("maxcards", 10)
         self.apxchg = kwargs.get("apxchg", (0, 0))
         # TODO more house rules
@@ -211,16 +373,68 @@ class Game(object):
 
         # Current tsar
         self.tsar = None
-        self.tsarindex = 0
 
         self.playerdata = dict()
 
+        self.journal = None
+
         # Add the players if we have any
-        for data in kwargs.get('players', list()):
-            self.player_add(data)
+        self.players_add(kwargs.get('players', list()))
 
         self.gid = uuid1()
 
+        # Journal from here on
+        journal = kwargs.get("journal")
+        if journal is not None:
+            if not isinstance(journal, Journal):
+                journal = Journal(journal)
+
+            journal.attach(self)
+
+    @property
+    def blackcard(self):
+        if self.blackrow is None:
+            return None
+
+        return self.deck.card(self.blackrow)
+
+    def card(self, row):
+        """Return the card object for a row of the deck."""
+        return self.deck.card(row)
+
+    def cards(self, rows):
+        """Return a list of the card objects for rows of the deck."""
+        card = self.deck.card
+        return [card(row) for row in rows]
+
+    def _row(self, card, hand=None, taken=()):
+        """Return the row for a card object (or row).
+
+        If hand is given, prefer a row in it with the same card that isn't
+        in taken; a deck with duplicates holds the same card in many rows."""
+        if isinstance(card, int):
+            return card
+
+        rows = self.deck.indices(card)
+        if hand is not None:
+            for row in rows:
+                if row in hand and row not in taken:
+                    return row
+
+        return rows[0]
+
+    def _rows(self, cards, hand=None, taken=()):
+        """Return the rows for many cards, each resolved to a different row
+        of the hand where possible."""
+        taken = set(taken)
+        rows = []
+        for card in cards:
+            row = self._row(card, hand, taken)
+            taken.add(row)
+            rows.append(row)
+
+        return rows
+
     def player_vote(self, player, player2):
         """Vote for a player if voting enabled.
 
@@ -234,7 +448,10 @@ class Game(object):
             ``(False, turnout)`` for no decision made, or ``(True, turnout)``
             when a plurality is reached.
         """
+        return self._apply_one(Vote(player, player2))
 
+    def _check_vote(self, action, pending):
+        player, player2 = action
         if not self.voting:
             raise RuleError("Voting is prohibited in this game")
 
@@ -244,20 +461,61 @@ class Game(object):
         if player2 not in self.players:
             raise RuleError("No voting for players not in the game!")
 
-        if player in self.voters:
+        if player in self.voters or player in pending.voted:
             raise RuleError("No double voting!")
 
+        pending.voted.add(player)
+        return action
+
+    def _apply_vote(self, player, player2):
         self.voters[player] = player2
         self.votes[player2] += 1
 
         turnout = len(self.voters) / len(self.players)
 
         # Majority reached
-        if self.votes.most_common(1)[0][1] >= (len(self.players) / 2):
+        if self.votes.maxcount >= (len(self.players) / 2):
             return (True, turnout)
 
         return (False, turnout)
 
+    def audience_vote(self, voter, player):
+        """Vote for a player as a member of the audience.
+
+        Safe to call from many threads at once.
+
+        :param voter:
+            A hashable ID for the voter; it need not be a player.
+
+        :param player:
+            The player being voted for.
+
+        :returns:
+            ``(closed, turnout)``, where closed is whether the vote is now
+            closed (so the round can end), and turnout is the number of
+            audience members who have voted.
+        """
+        vote = self.audiencevote
+        if vote is None:
+            raise RuleError("No audience vote in progress")
+
+        try:
+            counted = vote.vote(voter, player)
+        except KeyError:
+            raise RuleError("No voting for players not in the round!")
+
+        if not counted:
+            if vote.closed:
+                raise RuleError("The vote is closed")
+
+            raise RuleError("No double voting!")
+
+        # Never called by other methods, and maybe from other threads
+        if self.journal is not None:
+            self.journal.record("audience_vote", (voter, player))
+
+        return (vote.closed, vote.turnout)
+
     def player_get_vote_sel(self, player):
         """Get the vote (that is, whom the player voted for) of a given
         player."""
@@ -286,16 +544,28 @@ class Game(object):
         return self.votes[player]
 
     def player_all_get_vote_count(self, sort_vote=True):
-        """Get the vote counts for all users."""
-        count = [(player, self.player_get_vote_count(player)) for player in
-                 self.players]
-        if sort_vote:
-            count = sorted(count, key=itemgetter(1))
+        """Get the vote counts for all users.
+
+        If sort_vote is set, they're listed lowest first, with ties in seat
+        order.
+        """
+        return self._all_scores(self.votes, sort_vote)
+
+    def _all_scores(self, scores, ordered):
+        result = [(player, scores[player]) for player in self.players]
+        if ordered:
+            # Lowest first; the sort is stable, so ties stay in seat order
+            # (the board ranks them by when they were added instead)
+            result.sort(key=itemgetter(1))
 
-        return count
+        return result
 
     def player_trade_ap(self, player, cards):
         """Trade AP for cards for the given player."""
+        self._apply_one(Trade(player, cards))
+
+    def _check_trade(self, action, pending):
+        player, cards = action
         if player not in self.players:
             raise GameError("Player not in the game!")
 
@@ -306,32 +576,43 @@ class Game(object):
 
         ap, ccount = self.apxchg
 
-        if self.ap[player] < ap:
+        if self.ap[player] + pending.ap[player] < ap:
             raise RuleError("Insufficient AP")
 
         if isinstance(cards, Iterable):
             if len(cards) > ccount:
                 raise RuleError("Too many cards")
 
-        self.player_discard(player, cards)
+        rows = self._check_cards(player, cards, pending,
+                                 "Can't trade a card the player doesn't have!")
+        pending.ap[player] -= ap
+        return (player, rows)
 
-        self.ap[player] -= ap
+    def _apply_trade(self, player, rows):
+        self.playercards[player].difference_update(rows)
+        self.discardwhite.extend(rows)
 
-        # Deal a new hand
-        self.player_deal(player)
+        self.ap[player] -= self.apxchg[0]
 
     def player_gamble(self, player, card):
         """Gamble an AP on an additional white card.
 
         Only usable when a black card is pick one...
         """
+        self._apply_one(Gamble(player, card))
+
+    def _check_gamble(self, action, pending):
+        player, card = action
         if player not in self.players:
             raise GameError("Player not in the game!")
 
         if not self.gambling:
             raise RuleError("Gambling is not permitted")
 
-        if player in self.gamblers:
+        if not self.inround:
+            raise GameError("Not in a round to play!")
+
+        if player in self.gamblers or player in pending.gambled:
             raise RuleError("No double gambling!")
 
         if self.blackcard.playcount > 1:
@@ -340,18 +621,22 @@ class Game(object):
             # ill-defined, I'm going to go with this rule.
             raise RuleError("Can't gamble on pick > 1 cards")
 
-        if self.ap[player] <= 1:
+        if self.ap[player] + pending.ap[player] <= 1:
             raise RuleError("Player can't gamble - not enough AP")
 
         if isinstance(card, Iterable):
             raise RuleError("Cannot gamble more than one card!")
 
-        if card not in self.playerhand[player]:
-            raise GameError("Can't gamble a card the player doesn't have!")
+        rows = self._check_cards(player, card, pending,
+                                 "Can't gamble a card the player doesn't have!")
+        pending.gambled.add(player)
+        pending.ap[player] -= 1
+        return (player, rows[0])
 
+    def _apply_gamble(self, player, card):
         self.ap[player] -= 1
         self.ap_grant += 1
-        self.player_discard(player, card)
+        self.playercards[player].remove(card)
 
         if player not in self.playerplay:
             self.playerplay[player] = list()
@@ -367,16 +652,55 @@ class Game(object):
         return self.ap[player]
 
     def player_all_get_ap(self, sort_score=True):
-        """Get AP for all users."""
-        ap = [(player, self.player_get_ap(player)) for player in self.players]
-        if sort_score:
-            ap = sorted(ap, key=itemgetter(1))
+        """Get AP for all users.
+
+        If sort_score is set, they're listed lowest first, with ties in seat
+        order.
+        """
+        return self._all_scores(self.ap, sort_score)
+
+    def snapshot(self):
+        """Return a compact snapshot of the game's state, as bytes.
+
+        See :py:mod:`inhumane.snapshot`.
+        """
+        from .snapshot import snapshot
+        return snapshot(self)
 
-        return ap
+    @classmethod
+    def restore(cls, data, decks=None):
+        """Restore a game from a :py:meth:`snapshot`.
 
-    def _check_enough(self):
-        maxhands = (self.maxdraw + self.maxcards) * len(self.players)
-        if maxhands > len(self.whitecards):
+        :param data:
+            The snapshot.
+
+        :param decks:
+            The decks the game was created with. By default, the shared deck
+            with the same packs is used, which must already be loaded.
+
+        :raises ValueError:
+            The data isn't a usable snapshot.
+        """
+        from .snapshot import restore
+        return restore(data, decks, cls)
+
+    @property
+    def tsarindex(self):
+        """The seat of the tsar, or None if there isn't one."""
+        if self.tsar is None:
+            return None
+
+        return self.players.index(self.tsar)
+
+    def _check_enough(self, count=None):
+        if count is None:
+            count = len(self.players)
+
+        # Every white card is somewhere in the game, so check against all
+        # of them rather than just those left in the draw pile
+        total = len(self.deck.whiteindices) if self.deck is not None else 0
+        maxhands = (self.maxdraw + self.maxcards) * count
+        if maxhands > total:
             raise GameConditionError("Insufficient cards for all players!")
 
     def player_add(self, data=None):
@@ -387,33 +711,68 @@ class Game(object):
 
         :returns:
             The player UUID. Keep this around for later use.
+
+        :raises GameConditionError:
+            There aren't enough white cards to go around with the new player
+            seated.
         """
+        return self.players_add([data])[0]
 
-        self._check_enough()
+    def players_add(self, datas):
+        """Add many new players to the game at once.
+
+        The card supply is checked once for all of them, and their hands are
+        dealt in one batch. The check counts the players being added as well
+        as those already seated, so either every player is added or none are.
+
+        :param datas:
+            An iterable of private data for each new player.
+
+        :returns:
+            A list of the new player UUID's, in order.
+
+        :raises GameConditionError:
+            There aren't enough white cards to go around with the new players
+            seated.
+        """
+        datas = list(datas)
+        return self._players_add(datas, [uuid1() for data in datas])
 
-        player = uuid1()
+    @_journaled
+    def _players_add(self, datas, players):
+        self._check_enough(len(self.players) + len(datas))
 
-        self.players.add(player)
-        self.playerdata[player] = data
+        before = len(self.players)
+        for player, data in zip(players, datas):
+            self.players.add(player)
+            self.playerdata[player] = data
 
         # Reviving a game if it was suspended due to losing all but one player
         self.suspended = len(self.players) < 1
 
-        if len(self.players) == 2:
+        if before < 2 <= len(self.players):
             # Choose a new tsar now that we have enough players
-            self.game_new_tsar(player)
+            self.game_new_tsar(self.players[1])
 
         # Give them cards if the round hasn't yet begun
         if not self.inround:
-            self.player_deal(player, self.maxcards)
+            self.player_all_deal(self.maxcards, players)
 
-        return player
+        return players
 
+    @_journaled
     def player_clear(self, player):
         """Clear a player out."""
         if player not in self.players:
             raise GameError("Player not in the game!")
 
+        self._player_clear(player)
+
+        if self.tsar is not None and player == self.tsar and not self.spent and not self.suspended:
+            # Reassign tsar if need be
+            self.game_new_tsar()
+
+    def _player_clear(self, player):
         # Return all player cards to the deck
         self.discardwhite.extend(self.playercards[player])
 
@@ -433,17 +792,42 @@ class Game(object):
         if self.inround and self.playerlast[player] == self.rounds:
             del self.playerlast[player]
 
-        if self.tsar is not None and player == self.tsar and not self.spent and not self.suspended:
-            # Reassign tsar if need be
-            self.game_new_tsar()
-
     def player_remove(self, player):
         """Remove a player from the game."""
         if player is not None and player not in self.players:
             raise GameError("Player not in the game!")
 
-        self.player_clear(player)
-        self.players.remove(player)
+        return self.players_remove([player])
+
+    def players_remove(self, players):
+        """Remove many players from the game at once.
+
+        If the tsar is removed, the next remaining player in seat order
+        becomes the tsar.
+
+        :param players:
+            An iterable of player UUID's.
+        """
+        return self._players_remove(list(players))
+
+    @_journaled
+    def _players_remove(self, players):
+        players = set(players)
+        if any(player not in self.players for player in players):
+            raise GameError("Player not in the game!")
+
+        # Find the next tsar while the seats are all still there
+        tsar = self.tsar
+        if tsar in players:
+            while tsar in players:
+                tsar = self.players.successor(tsar)
+                if tsar == self.tsar:
+                    tsar = None
+                    break
+
+        for player in players:
+            self._player_clear(player)
+            self.players.remove(player)
 
         if len(self.players) == 1:
             # Game can't continue!
@@ -452,7 +836,16 @@ class Game(object):
             # Punt. destroy the game.
             return self.game_end(True)
 
+        if self.tsar in players:
+            if self.spent or self.suspended:
+                self.tsar = None
+            else:
+                self.game_new_tsar(tsar)
+
     def player_play(self, player, cards):
+        self._apply_one(Play(player, cards))
+
+    def _check_turn(self, player, pending, again):
         if player not in self.players:
             raise GameError("Player not in the game!")
 
@@ -462,44 +855,181 @@ class Game(object):
         if not self.voting and self.tsar == player:
             raise RuleError("The tsar can't play!")
 
-        if self.playerlast[player] == self.rounds:
-            raise RuleError("Can't double play!")
+        if self.playerlast[player] == self.rounds or player in pending.played:
+            raise again
+
+        pending.played.add(player)
+
+    def _check_cards(self, player, cards, pending, missing):
+        """Return the rows for cards from a player's hand, checking they're
+        there and not used by an earlier action in the batch."""
+        hand = self.playercards[player]
+        try:
+            used = pending.used[player]
+            if isinstance(cards, Iterable):
+                rows = self._rows(cards, hand, used)
+            else:
+                rows = [self._row(cards, hand, used)]
+        except KeyError:
+            raise GameError(missing)
+
+        if (len(set(rows)) != len(rows) or not used.isdisjoint(rows) or
+                not all(map(hand.__contains__, rows))):
+            raise GameError(missing)
+
+        used.update(rows)
+        return rows
+
+    def _check_play(self, action, pending):
+        player, cards = action
+        self._check_turn(player, pending, RuleError("Can't double play!"))
 
         if isinstance(cards, Iterable):
-            clen = len(cards)
+            count = len(cards)
         else:
-            clen = 1
+            count = 1
 
-        if clen != self.blackcard.playcount:
+        if count != self.blackcard.playcount:
             raise RuleError("Invalid number of cards played")
 
+        rows = self._check_cards(player, cards, pending,
+                                 "Can't play a card the player doesn't have!")
+        return (player, rows)
+
+    def _apply_play(self, player, rows):
         self.playerlast[player] = self.rounds
 
-        if player not in self.playerplay:
-            self.playerplay[player] = list()
+        played = self.playerplay.get(player)
+        if played is None:
+            played = self.playerplay[player] = list()
 
-        if isinstance(cards, Iterable):
-            self.playercards[player].difference_update(cards)
-            self.playerplay[player].extend(cards)
-        else:
-            self.playercards[player].remove(cards)
-            self.playerplay[player].append(cards)
+        self.playercards[player].difference_update(rows)
+        played.extend(rows)
 
     def player_pass(self, player):
         """Skip a player's turn."""
-        if player not in self.players:
-            raise GameError("Player not in the game!")
+        self._apply_one(Pass(player))
 
-        if not self.inround:
-            raise GameError("Not in a round to play!")
+    def _check_pass(self, action, pending):
+        self._check_turn(action.player, pending,
+                         GameError("You have already played!"))
+        return action
 
-        if not self.voting and self.tsar == player:
-            raise RuleError("The tsar can't play!")
+    def _apply_pass(self, player):
+        self.playerlast[player] = self.rounds
 
-        if self.playerlast[player] == self.rounds:
-            raise GameError("You have already played!")
+    # Action type -> (check, apply)
+    _actions = {
+        Play: (_check_play, _apply_play),
+        Pass: (_check_pass, _apply_pass),
+        Gamble: (_check_gamble, _apply_gamble),
+        Vote: (_check_vote, _apply_vote),
+        Trade: (_check_trade, _apply_trade),
+    }
+
+    def apply_actions(self, actions, atomic=True):
+        """Apply a batch of actions.
+
+        Every action is checked first, in order, against the present state
+        plus the changes of the actions before it in the batch (so a player
+        can't play twice, or use the same card twice, in one batch). Then all
+        the valid actions are applied, in order, and players who traded AP
+        are dealt new cards in one go. There must be enough white cards for
+        that deal, or every trade fails, so nothing can fail once actions are
+        being applied.
+
+        :param actions:
+            An iterable of actions from :py:mod:`inhumane.actions`.
+
+        :param atomic:
+            If set (the default), apply nothing unless every action is
+            valid; otherwise, apply the valid actions and report the rest.
 
-        self.playerlast[player] = self.rounds
+        :returns:
+            A list of :py:class:`~inhumane.actions.ActionResult`, one per
+            action, in order.
+        """
+        return self._apply_actions(list(actions), atomic)
+
+    @_journaled
+    def _apply_actions(self, actions, atomic):
+        pending = _Pending()
+        checked = list()
+        failed = False
+        for action in actions:
+            try:
+                check, apply = self._actions[type(action)]
+            except KeyError:
+                checked.append((action, None, GameError("Unknown action")))
+                failed = True
+                continue
+
+            try:
+                checked.append((action, check(self, action, pending), None))
+            except BaseGameError as e:
+                checked.append((action, None, e))
+                failed = True
+
+        trades = [args for action, args, error in checked if error is None
+                  and type(action) is Trade]
+        if trades and not self._check_deal(trades, pending):
+            short = GameConditionError("Not enough white cards!")
+            checked = [(action, None, short) if error is None and
+                       type(action) is Trade else (action, args, error) for
+                       action, args, error in checked]
+            failed = True
+
+        if atomic and failed:
+            rejected = GameError("Batch rejected: another action failed")
+            return [ActionResult(action, None, error or rejected) for action,
+                    args, error in checked]
+
+        results = list()
+        traders = list()
+        for action, args, error in checked:
+            value = None
+            if error is None:
+                value = self._actions[type(action)][1](self, *args)
+                if type(action) is Trade:
+                    traders.append(action.player)
+
+            results.append(ActionResult(action, value, error))
+
+        if traders:
+            # Deal a new hand
+            self.player_all_deal(0, list(OrderedDict.fromkeys(traders)))
+
+        return results
+
+    def _check_deal(self, trades, pending):
+        """Check there are enough white cards to refill the hands of the
+        players trading in a batch."""
+        hands = self.playercards
+        players = OrderedDict.fromkeys(player for player, rows in trades)
+        need = sum(max(self.maxcards - len(hands[player]) +
+                       len(pending.used[player]), 0) for player in players)
+        supply = (len(self.whitecards) + len(self.discardwhite) +
+                  sum(len(rows) for player, rows in trades))
+        return need <= supply
+
+    @_journaled
+    def _apply_one(self, action):
+        """Check and apply a single action, raising its error.
+
+        The same as a batch of one, without building the results."""
+        check, apply = self._actions[type(action)]
+        pending = _Pending()
+        args = check(self, action, pending)
+        if type(action) is not Trade:
+            return apply(self, *args)
+
+        if not self._check_deal([args], pending):
+            raise GameConditionError("Not enough white cards!")
+
+        apply(self, *args)
+
+        # Deal a new hand
+        self.player_all_deal(0, [action.player])
 
     def player_played(self):
         """Get the cards a player played.
@@ -509,10 +1039,20 @@ class Game(object):
             :py:attr:`~inhumane.game.Game.playerplay`'s methods directly
             instead.
         """
-        warn("This method is deprecated, use playerplay.items() instead",
+        warn("This method is deprecated, use player_all_get_play() instead",
              DeprecationWarning, 2)
-        return self.playerplay.items()
+        return self.player_all_get_play().items()
+
+    def player_all_get_play(self):
+        """Get the cards all players have played this round.
+
+        :returns:
+            An ``OrderedDict`` of players to the list of cards they played.
+        """
+        return OrderedDict((player, self.cards(rows)) for player, rows in
+                           self.playerplay.items())
 
+    @_journaled
     def card_refill(self):
         """Check if the decks are empty, and add cards from the discard pile if
         needs be."""
@@ -522,26 +1062,31 @@ class Game(object):
         blackempty = whiteempty = False
 
         if len(self.blackcards) == 0:
-            # Swap them
-            tmp = self.blackcards
-            self.blackcards = self.discardblack
-            self.discardblack = tmp
-
-            shuffle(self.blackcards, rng.random)
+            # Move the discards back; they are shuffled as they are drawn
+            self.blackcards.extend(self.discardblack)
+            del self.discardblack[:]
 
             blackempty = True
 
         if len(self.whitecards) == 0:
-            tmp = self.whitecards
-            self.whitecards = self.discardwhite
-            self.discardwhite = tmp
-
-            shuffle(self.whitecards, rng.random)
+            self.whitecards.extend(self.discardwhite)
+            del self.discardwhite[:]
 
             whiteempty = True
 
         return (blackempty, whiteempty)
 
+    def _draw_white(self, count):
+        """Draw count white cards, refilling the pile at most once."""
+        if count > len(self.whitecards):
+            self.whitecards.extend(self.discardwhite)
+            del self.discardwhite[:]
+
+            if count > len(self.whitecards):
+                raise GameConditionError("Not enough white cards!")
+
+        return self.whitecards.take(count)
+
     def card_black(self):
         """Return the current black card.
         
@@ -553,6 +1098,7 @@ class Game(object):
              DeprecationWarning, 2)
         return self.blackcard
 
+    @_journaled
     def player_deal(self, player, count=0):
         """Deal white cards to the player.
         
@@ -566,16 +1112,12 @@ class Game(object):
             return
         elif count == 0:
             count = self.maxcards - len(self.playercards[player])
-            if count == 0:
+            if count <= 0:
                 return
 
-        deal = list()
-        for i in range(count):
-            self.card_refill()  # XXX I hate constantly checking
-            deal.append(self.whitecards.popleft())
-
-        self.player_deal_raw(player, deal)
+        self.playercards[player].update(self._draw_white(count))
 
+    @_journaled
     def player_deal_raw(self, player, cards):
         """raw version of player_deal where you specify your own cards.
 
@@ -585,15 +1127,49 @@ class Game(object):
             raise GameError("Player not in the game!")
 
         if isinstance(cards, Iterable):
-            self.playercards[player].update(cards)
+            self.playercards[player].update(self._rows(cards))
         else:
-            self.playercards[player].add(cards)
+            self.playercards[player].add(self._row(cards))
 
-    def player_all_deal(self):
-        """Deal to all the players to fill their hands."""
+    @_journaled
+    def player_all_deal(self, count=0, players=None):
+        """Deal white cards to many players at once.
 
-        for player in self.players:
-            self.player_deal(player)
+        The cards for everyone are drawn in one go, refilling the draw pile
+        from the discards at most once.
+
+        :param count:
+            Number of cards to deal to each player; use 0 to fill their
+            hands.
+
+        :param players:
+            The players to deal to; the default is all of them.
+        """
+        if players is None:
+            players = self.players
+        elif any(player not in self.players for player in players):
+            raise GameError("Player not in the game!")
+
+        if count < 0:
+            return
+
+        hands = self.playercards
+        if count:
+            demand = [(player, count) for player in players]
+        else:
+            demand = [(player, self.maxcards - len(hands[player])) for player
+                      in players]
+            demand = [(player, count) for player, count in demand if count > 0]
+
+        total = sum(count for player, count in demand)
+        if not total:
+            return
+
+        deal = self._draw_white(total)
+        start = 0
+        for player, count in demand:
+            hands[player].update(deal[start:start + count])
+            start += count
 
     def player_cards(self, player):
         """Return a player's cards."""
@@ -601,8 +1177,9 @@ class Game(object):
         if player not in self.players:
             raise GameError("Player not in the game!")
 
-        return sorted(self.playercards[player])
+        return self.cards(self.playercards[player])
 
+    @_journaled
     def player_discard(self, player, cards):
         """Discard cards from a player's hands into the discard pile.
 
@@ -612,16 +1189,20 @@ class Game(object):
         if player not in self.players:
             raise GameError("Player not in game!")
 
+        hand = self.playercards[player]
         if cards is None:
-            self.discardwhite.extend(self.playercards[player])
-            self.playercards.clear()
+            self.discardwhite.extend(hand)
+            hand.clear()
         elif isinstance(cards, Iterable):
+            cards = self._rows(cards, hand)
             self.discardwhite.extend(cards)
-            self.playercards[player].difference_update(cards)
+            hand.difference_update(cards)
         else:
+            cards = self._row(cards, hand)
+            hand.remove(cards)
             self.discardwhite.append(cards)
-            self.playercards[player].remove(cards)
 
+    @_journaled
     def round_start(self):
         """Start a round."""
         if self.inround:
@@ -637,7 +1218,7 @@ class Game(object):
         #assert [len(self.playerplay[player]) == 0 for player in self.players].count(False) == 0
 
         # Black card should be the null sentinel
-        assert self.blackcard is None
+        assert self.blackrow is None
 
         self.inround = True
         self.rounds += 1
@@ -648,13 +1229,19 @@ class Game(object):
         # Recycle the decks if need be
         self.card_refill()
 
-        self.blackcard = self.blackcards.popleft()
+        self.blackrow = self.blackcards.pop()
+
+        if self.audience:
+            candidates = [player for player in self.players if self.voting or
+                          player != self.tsar]
+            self.audiencevote = AudienceVote(candidates, self.audience_quorum,
+                                             self.audience_deadline)
 
         # Add cards to players' hands
         if self.blackcard.drawcount:
-            for player in self.players:
-                self.player_deal(player, self.blackcard.drawcount)
+            self.player_all_deal(self.blackcard.drawcount)
 
+    @_journaled
     def game_new_tsar(self, player=None):
         """Select a new tsar (without player, automatically)."""
         if player is not None and player not in self.players:
@@ -664,20 +1251,22 @@ class Game(object):
             # Game is spent.
             self.suspended = True
             self.tsar = None
-            self.tsarindex = 0
             raise GameConditionError("Insufficient Players")
 
         if player is not None and player not in self.players:
             raise GameError("Invalid player")
 
         if not player:
-            player = self.players[(self.tsarindex + 1) % len(self.players)]
+            if self.tsar in self.players:
+                player = self.players.successor(self.tsar)
+            else:
+                player = self.players.seat(1)
 
-        self.tsarindex = self.players.index(player)
         self.tsar = player
 
         return self.tsar
 
+    @_journaled
     def round_result(self, player=None):
         """Choose the result of a round. If player is omitted, it will choose
         it based on the rules.
@@ -707,16 +1296,25 @@ class Game(object):
                 raise RuleError("Tsar can't declare himself result!")
             results = player
             give_ap(player)
+        elif self.audiencevote is not None:
+            # An audience vote; same as for a voting round
+            votes = self.audiencevote.tally()
+            for player in list(votes):
+                if player not in self.players:
+                    # Left during the vote
+                    del votes[player]
+
+            results = votes.most_common()
+
+            # Give all winners AP
+            for player in votes.leaders():
+                give_ap(player)
         elif self.voting:
             # A voting round without a fiat-declared result.
             results = self.votes.most_common()
-            top = results[0][1]  # Top result count
 
             # Give all winners AP
-            for player, votes in results:
-                if votes < top:
-                    break
-
+            for player in self.votes.leaders():
                 give_ap(player)
         else:
             raise GameConditionError(
@@ -724,6 +1322,7 @@ class Game(object):
 
         return results
 
+    @_journaled
     def round_end(self, player=None):
         """End a round and return round_result. Pass through a player to select
         the result the tsar picked.
@@ -742,21 +1341,21 @@ class Game(object):
         results = self.round_result(player)
 
         # Discard the black card
-        self.discardblack.append(self.blackcard)
-        self.blackcard = None
+        self.discardblack.append(self.blackrow)
+        self.blackrow = None
 
         # Return played white cards to the discard pile and clear their played
         # cards, then give them new cards.
         for player in self.players:
             self.discardwhite.extend(self.playerplay.get(player, []))
 
-            self.player_deal(player)
-
         self.playerplay.clear()
+        self.player_all_deal()
 
         # Reset votes
         self.voters.clear()
         self.votes.clear()
+        self.audiencevote = None
 
         # Reset the AP grant and gamblers
         self.ap_grant = 1
@@ -767,10 +1366,8 @@ class Game(object):
             return self.game_end()
 
         if self.maxap is not None:
-            # Maximum AP earnt (first most common ((1)[0]) then [1] for the
-            # tally.
-            max = self.ap.most_common(1)[0][1]
-            if max >= self.maxap:
+            # Maximum AP earnt
+            if self.ap.maxcount >= self.maxap:
                 return self.game_end()
 
         # Choose the new tsar
@@ -778,6 +1375,7 @@ class Game(object):
 
         return results
 
+    @_journaled
     def game_end(self, forreal=False):
         """End the game.
 
@@ -806,20 +1404,19 @@ class Game(object):
 
         # Clear the tsar
         self.tsar = None
-        self.tsarindex = None
 
         self.rounds = 0
 
         if forreal:
             # Nuke the players
-            for player in self.players:
+            for player in list(self.players):
                 self.player_remove(player)
 
             # Wipe the decks
             self.blackcards.clear()
             self.whitecards.clear()
-            self.discardblack.clear()
-            self.discardwhite.clear()
+            del self.discardblack[:]
+            del self.discardwhite[:]
 
             self.maxdraw = None
         else:
@@ -830,7 +1427,7 @@ class Game(object):
             # Add the discard piles to the main decks
             self.blackcards.extend(self.discardblack)
             self.whitecards.extend(self.discardwhite)
-            self.discardblack.clear()
-            self.discardwhite.clear()
+            del self.discardblack[:]
+            del self.discardwhite[:]
 
         return results
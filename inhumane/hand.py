@@ -0,0 +1,96 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Players' hands.
+
+A :py:class:`Hand` is a set of deck rows kept in display order as cards are
+added and removed, using the deck's precomputed
+:py:attr:`~inhumane.deck.Deck.ranks`, so listing a hand never has to sort
+it.
+"""
+
+
+from bisect import bisect_left, insort
+from collections.abc import MutableSet
+
+
+class Hand(MutableSet):
+
+    """A set of deck rows, in display order.
+
+    Adding or removing a card is a binary search, plus moving at most a hand
+    of entries. Indexing and slicing give rows in display order.
+    """
+
+    def __init__(self, ranks, rows=()):
+        """Create a hand.
+
+        :param ranks:
+            A sequence giving the display rank of each row, as in
+            :py:attr:`~inhumane.deck.Deck.ranks`.
+
+        :param rows:
+            The rows to start with.
+        """
+        self.ranks = ranks
+        self.order = []                 # sorted (rank, row) pairs
+        self.members = set()
+        self.update(rows)
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, row):
+        return row in self.members
+
+    def __iter__(self):
+        return (row for rank, row in self.order)
+
+    def __reversed__(self):
+        return (row for rank, row in reversed(self.order))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [row for rank, row in self.order[index]]
+
+        return self.order[index][1]
+
+    def index(self, row):
+        if row not in self.members:
+            raise KeyError("row not in hand")
+
+        return bisect_left(self.order, (self.ranks[row], row))
+
+    def add(self, row):
+        if row not in self.members:
+            self.members.add(row)
+            insort(self.order, (self.ranks[row], row))
+
+    def update(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def discard(self, row):
+        if row in self.members:
+            self.members.remove(row)
+            del self.order[bisect_left(self.order, (self.ranks[row], row))]
+
+    def remove(self, row):
+        if row not in self.members:
+            raise KeyError(row)
+
+        self.discard(row)
+
+    def difference_update(self, rows):
+        for row in rows:
+            self.discard(row)
+
+    def clear(self):
+        self.members.clear()
+        del self.order[:]
+
+    def _from_iterable(self, rows):
+        return self.__class__(self.ranks, rows)
+
+    def __repr__(self):
+        return "Hand({0!r})".format(list(self))
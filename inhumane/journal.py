@@ -0,0 +1,540 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Game journals, for replaying games.
+
+A :py:class:`Journal` attached to a :py:class:`~inhumane.game.Game` (with
+the ``journal`` option, or :py:meth:`Journal.attach`) records every call
+that changes the game's state to a file: first a
+:py:mod:`~inhumane.snapshot` of the game as it was, including the state of
+its RNG, then each call, in order. Calls a method makes to other methods
+aren't recorded, since replaying the outer call repeats them. Since
+replaying starts from the same RNG state, every card is drawn the same way
+again; :py:func:`replay` rebuilds the game as it was after any number of
+calls.
+
+A call that raised is recorded too, flagged with :py:data:`FAILED`, since it
+may have changed the game before failing; replaying it fails the same way.
+
+.. warning::
+    The snapshot holds the key and state of the game's RNG, so anyone who
+    can read a journal can work out every card that will be drawn after it.
+    Journals are created readable only by their owner; keep them that way,
+    and don't hand them to players while the game is going.
+
+The arguments of a call are captured as it is made (any lists or dicts in
+them are copied, so changing them later doesn't change the record), then
+queued in a buffer, and only encoded and written out, in one go, once
+``flush_size`` calls are buffered or ``flush_interval`` seconds have passed,
+or on :py:meth:`Journal.flush`.
+Calls still in the buffer are lost if the process dies.
+
+:py:meth:`Journal.compact` replaces the file with a fresh snapshot of the
+game, so it doesn't grow forever; this can be done every ``compact_every``
+calls.
+
+A journal that is closed and then attached again (as a
+:py:class:`~inhumane.pool.GamePool` does when a game hibernates and is
+restored) adds a new snapshot to the end of the file, and carries on from
+there, so the calls before it are kept. Replaying a journal restores each
+snapshot as it comes to it.
+
+Some things can't be replayed: changes made to the game's attributes
+directly, audience votes that arrived after the deadline (which depends on
+the clock), and arguments that were iterators (which have been used up by
+the time they're recorded).
+
+Each record is a 32-bit little-endian length, an opcode byte (with
+:py:data:`FAILED` set if the call raised), and the arguments of the call, or
+a snapshot for opcode 0. Players are numbered in the order they first appear
+after the last snapshot, so each UUID is only stored once per snapshot, and
+cards are stored as deck rows.
+"""
+
+
+import os
+import pickle
+import struct
+import time
+
+from random import SystemRandom
+from threading import Lock
+from uuid import UUID
+
+from .actions import Gamble, Pass, Play, Trade, Vote
+from .card import Card
+
+
+MAGIC = b"IHJL"
+VERSION = 1
+
+# Opcode flag for calls that raised
+FAILED = 0x80
+
+# Opcode -> method; opcode 0 is a snapshot, which the journal starts with,
+# and which is added again each time it's attached to a game
+methods = (None, "_players_add", "_players_remove", "player_clear",
+           "player_deal", "player_deal_raw", "player_all_deal",
+           "player_discard", "card_refill", "round_start", "round_result",
+           "round_end", "game_new_tsar", "game_end", "_apply_actions",
+           "audience_vote", "_apply_one")
+_opcodes = {method: opcode for opcode, method in enumerate(methods)}
+
+_actions = (Play, Pass, Gamble, Vote, Trade)
+_action_types = {action: i for i, action in enumerate(_actions)}
+
+_header = struct.Struct("<4sB")
+_record = struct.Struct("<IB")
+_uint = struct.Struct("<I")
+_int = struct.Struct("<i")
+
+
+class Journal(object):
+
+    """A journal file for a game."""
+
+    def __init__(self, path, flush_size=4096, flush_interval=1.0,
+                 compact_every=None, clock=time.monotonic):
+        """Create a journal.
+
+        :param path:
+            The file to write. It is replaced when the journal is first
+            attached (and added to when it is attached again), and created
+            readable only by its owner.
+
+        :param flush_size:
+            Write out records once this many calls are buffered.
+
+        :param flush_interval:
+            Write out records once they've been buffered this many seconds
+            (checked every 16 calls, as they finish), or None.
+
+        :param compact_every:
+            :py:meth:`compact` the journal after this many calls, or None.
+
+        :param clock:
+            The function giving the time in seconds, for the flush interval.
+        """
+        self.path = path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.clock = clock
+
+        self.game = None
+        self.file = None
+
+        # Calls of journaled methods in progress
+        self.depth = 0
+
+        # Calls recorded since the snapshot
+        self.count = 0
+
+        self._pending = list()
+        self._flushed = clock()
+        self._ids = dict()
+        self._lock = Lock()
+
+    def attach(self, game):
+        """Start journaling a game, from a snapshot of its present state.
+
+        If the journal has been attached before (and closed since), the
+        snapshot is added to the end of the file, keeping the calls before
+        it.
+
+        :raises ValueError:
+            The game uses the system RNG, so it can't be replayed.
+        """
+        if isinstance(game.rng, SystemRandom):
+            raise ValueError("Can't journal a game using the system RNG")
+
+        append = self.game is not None
+        self.game = game
+        self._start(_create(self.path, append))
+        game.journal = self
+
+    def _start(self, file):
+        # Add a snapshot of the game to a file, after the header if it's new
+        self.file = file
+        self.count = 0
+        self._ids.clear()
+
+        snapshot = self.game.snapshot()
+        if not file.tell():
+            file.write(_header.pack(MAGIC, VERSION))
+
+        file.write(_record.pack(len(snapshot), 0))
+        file.write(snapshot)
+        file.flush()
+
+    def begin(self, method, args, kwargs=None):
+        """Capture a call as it is made, and queue it.
+
+        Usually called by the game itself. The call isn't encoded or written
+        out until it is finished with :py:meth:`end`, nor are any calls
+        queued after it.
+
+        :returns:
+            The queued call, to pass to :py:meth:`end`.
+        """
+        # [opcode, args, kwargs, finished]; list.append is atomic, so this
+        # needs no lock
+        call = [_opcodes[method], _capture(args),
+                _capture(kwargs) if kwargs else None, False]
+        self._pending.append(call)
+        return call
+
+    def end(self, call, failed=False):
+        """Finish a call queued by :py:meth:`begin`.
+
+        :param failed:
+            Whether the call raised.
+        """
+        if failed:
+            call[0] |= FAILED
+
+        call[3] = True
+
+        # The clock is only read every 16 calls, to keep it off the hot path
+        self.count += 1
+        if len(self._pending) >= self.flush_size or (
+                not self.count & 15 and self.flush_interval is not None and
+                self.clock() - self._flushed >= self.flush_interval):
+            self.flush()
+
+        if (self.compact_every is not None and not self.depth and
+                self.count >= self.compact_every and
+                all(call[3] for call in self._pending)):
+            self.compact()
+
+    def record(self, method, args, kwargs=None, failed=False):
+        """Add a finished call to the journal."""
+        self.end(self.begin(method, args, kwargs), failed)
+
+    def _encode(self, value, out):
+        kind = type(value)
+        if kind is UUID:
+            i = self._ids.get(value.int)
+            if i is None:
+                self._ids[value.int] = len(self._ids)
+                out += b"u"
+                out += value.bytes
+            else:
+                out += b"p"
+                out += _uint.pack(i)
+        elif kind is int and -0x80000000 <= value < 0x80000000:
+            out += b"i"
+            out += _int.pack(value)
+        elif value is None:
+            out += b"N"
+        elif kind is bool:
+            out += b"T" if value else b"F"
+        elif kind is list or kind is tuple:
+            out += b"l" if kind is list else b"t"
+            out += _uint.pack(len(value))
+            for item in value:
+                # Rows are most of what's in lists, so skip the call for them
+                if type(item) is int and -0x80000000 <= item < 0x80000000:
+                    out += b"i"
+                    out += _int.pack(item)
+                else:
+                    self._encode(item, out)
+        elif kind in _action_types:
+            out += b"a"
+            out.append(_action_types[kind])
+            for item in value:
+                self._encode(item, out)
+        elif kind is dict:
+            out += b"d"
+            out += _uint.pack(len(value))
+            for item in value.items():
+                self._encode(item, out)
+        elif isinstance(value, Card) and self._row(value) is not None:
+            out += b"c"
+            out += _uint.pack(self._row(value))
+        elif kind is _Pickled:
+            out += b"o"
+            out += _uint.pack(len(value))
+            out += value
+        else:
+            data = pickle.dumps(value, protocol=4)
+            out += b"o"
+            out += _uint.pack(len(data))
+            out += data
+
+    def _row(self, card):
+        # Cards not in the deck are pickled, and rejected by the game
+        try:
+            return self.game.deck.index(card)
+        except (AttributeError, KeyError):
+            return None
+
+    def _flush(self):
+        # Only calls up to the first one still in progress are written out
+        pending = self._pending
+        count = 0
+        while count < len(pending) and pending[count][3]:
+            count += 1
+
+        if count:
+            calls = pending[:count]
+            del pending[:count]
+
+            # Encoded in order, so players are numbered as they're written
+            buffer = bytearray()
+            encode = self._encode
+            pack = _record.pack
+            for opcode, args, kwargs, finished in calls:
+                payload = bytearray()
+                encode(args, payload)
+                if kwargs:
+                    encode(kwargs, payload)
+
+                buffer += pack(len(payload), opcode)
+                buffer += payload
+
+            self.file.write(buffer)
+            self.file.flush()
+
+        self._flushed = self.clock()
+
+    def flush(self):
+        """Write out the buffered records."""
+        with self._lock:
+            self._flush()
+
+    def compact(self):
+        """Replace the journal with a snapshot of the game as it is now.
+
+        The new file is written beside the old one, then moved over it.
+
+        :raises RuntimeError:
+            A call is in progress.
+        """
+        with self._lock:
+            self._flush()
+            if self._pending:
+                raise RuntimeError("Can't compact a journal mid-call")
+
+            self.file.close()
+
+            temp = "{0}.tmp".format(self.path)
+            self._start(_create(temp))
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+            os.replace(temp, self.path)
+            self.file = open(self.path, "ab")
+
+    def close(self):
+        """Write out the buffered records, and stop journaling."""
+        with self._lock:
+            if self.file is None:
+                return
+
+            self._flush()
+            self.file.close()
+            self.file = None
+
+        if self.game is not None and self.game.journal is self:
+            self.game.journal = None
+
+
+class _Pickled(bytes):
+    # An argument of a type the journal doesn't know, pickled when captured
+    __slots__ = ()
+
+
+# Types whose values can't change after the call, so are kept as they are
+_immutable = frozenset((UUID, int, bool, str, float, bytes, type(None),
+                        _Pickled))
+
+
+def _capture(value):
+    # Copy anything the caller could change before the call is encoded
+    kind = type(value)
+    if kind in _immutable:
+        return value
+    elif kind is list or kind is tuple or kind in _action_types:
+        # Checked without a call per item, as most hold only players and rows
+        if _immutable.issuperset(map(type, value)):
+            return value[:] if kind is list else value
+
+        items = [_capture(item) for item in value]
+        if kind is list:
+            return items
+
+        return tuple(items) if kind is tuple else kind(*items)
+    elif kind is dict:
+        return {_capture(key): _capture(item) for key, item in value.items()}
+    elif isinstance(value, Card):
+        return value
+    else:
+        return _Pickled(pickle.dumps(value, protocol=4))
+
+
+def _create(path, append=False):
+    # The snapshot holds the RNG state, so only the owner may read the file
+    if append:
+        return open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                            0o600), "ab")
+
+    return open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600),
+                "wb")
+
+
+class _Decoder(object):
+
+    def __init__(self, card):
+        self.card = card
+        self.players = list()
+
+    def decode(self, data, pos):
+        kind = data[pos:pos + 1]
+        pos += 1
+        if kind == b"p":
+            return self.players[_uint.unpack_from(data, pos)[0]], pos + 4
+        elif kind == b"u":
+            player = UUID(bytes=bytes(data[pos:pos + 16]))
+            self.players.append(player)
+            return player, pos + 16
+        elif kind == b"i":
+            return _int.unpack_from(data, pos)[0], pos + 4
+        elif kind == b"N":
+            return None, pos
+        elif kind == b"T":
+            return True, pos
+        elif kind == b"F":
+            return False, pos
+        elif kind == b"l" or kind == b"t":
+            count = _uint.unpack_from(data, pos)[0]
+            pos += 4
+            items = list()
+            for i in range(count):
+                item, pos = self.decode(data, pos)
+                items.append(item)
+
+            return (items if kind == b"l" else tuple(items)), pos
+        elif kind == b"a":
+            action = _actions[data[pos]]
+            pos += 1
+            items = list()
+            for i in range(len(action._fields)):
+                item, pos = self.decode(data, pos)
+                items.append(item)
+
+            return action(*items), pos
+        elif kind == b"d":
+            count = _uint.unpack_from(data, pos)[0]
+            pos += 4
+            items = list()
+            for i in range(count):
+                item, pos = self.decode(data, pos)
+                items.append(item)
+
+            return dict(items), pos
+        elif kind == b"c":
+            return self.card(_uint.unpack_from(data, pos)[0]), pos + 4
+        elif kind == b"o":
+            length = _uint.unpack_from(data, pos)[0]
+            pos += 4
+            return pickle.loads(data[pos:pos + length]), pos + length
+        else:
+            raise ValueError("Bad journal record")
+
+
+def read(path):
+    """Read a journal.
+
+    A record cut short at the end of the file (if the process died while
+    writing it) is ignored.
+
+    :returns:
+        A ``(snapshot, records)`` tuple, where snapshot is the one the file
+        starts with, and records is a list of ``(opcode, payload)`` tuples,
+        one per call, or per later snapshot (with opcode 0);
+        :py:data:`FAILED` is set in the opcode of calls that raised.
+
+    :raises ValueError:
+        The file isn't a journal of a supported version.
+    """
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+
+    if len(data) < _header.size + _record.size:
+        raise ValueError("Not a game journal")
+
+    magic, version = _header.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a game journal")
+    elif version != VERSION:
+        raise ValueError("Unsupported journal version {0}".format(version))
+
+    pos = _header.size
+    records = list()
+    while pos + _record.size <= len(data):
+        length, opcode = _record.unpack_from(data, pos)
+        pos += _record.size
+        if pos + length > len(data):
+            break
+
+        records.append((opcode, data[pos:pos + length]))
+        pos += length
+
+    if not records or records[0][0] != 0:
+        raise ValueError("Journal doesn't start with a snapshot")
+
+    return bytes(records[0][1]), records[1:]
+
+
+def replay(path, index=None, decks=None):
+    """Rebuild a game from its journal.
+
+    :param path:
+        The journal file.
+
+    :param index:
+        The number of recorded calls to replay; by default, all of them.
+        Later snapshots aren't counted as calls; each one is restored when
+        the replay reaches it.
+
+    :param decks:
+        The decks the game was created with, as for
+        :py:meth:`~inhumane.game.Game.restore`.
+
+    :returns:
+        The game, which isn't being journaled.
+    """
+    from .game import Game
+
+    snapshot, records = read(path)
+    game = Game.restore(snapshot, decks)
+
+    decoder = _Decoder(game.card)
+    count = 0
+    for opcode, payload in records:
+        if index is not None and count >= index:
+            break
+        elif not opcode:
+            # Players are numbered afresh after each snapshot
+            game = Game.restore(bytes(payload), decks)
+            decoder = _Decoder(game.card)
+            continue
+
+        count += 1
+        args, pos = decoder.decode(payload, 0)
+        kwargs = dict()
+        if pos < len(payload):
+            kwargs, pos = decoder.decode(payload, pos)
+
+        method = getattr(game, methods[opcode & ~FAILED])
+        if not opcode & FAILED:
+            method(*args, **kwargs)
+            continue
+
+        try:
+            method(*args, **kwargs)
+        except Exception:
+            pass
+
+    return game
@@ -0,0 +1,110 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Lazily shuffled draw piles.
+
+Instead of shuffling a whole pile up front, a :py:class:`DrawPile` picks each
+card uniformly at random from the cards not yet drawn as it is drawn. This is
+an incremental Fisher-Yates shuffle, so the order cards are drawn in is just
+as random, but creating or refilling a pile costs nothing beyond copying the
+rows, and only the cards actually drawn cost a random number.
+"""
+
+
+from array import array
+
+
+class DrawPile(object):
+
+    """A draw pile of deck rows, shuffled as cards are drawn.
+
+    Iterating a pile, or checking if a row is in it, ignores the order cards
+    will be drawn in (which isn't decided yet).
+    """
+
+    def __init__(self, rows=(), rng=None, typecode="I"):
+        """Create a draw pile.
+
+        :param rows:
+            The rows in the pile. If this is an ``array``, its typecode is
+            used.
+
+        :param rng:
+            The ``random.Random`` instance cards are drawn with.
+
+        :param typecode:
+            The ``array`` typecode for the rows, if rows isn't an ``array``.
+        """
+        if isinstance(rows, array):
+            self.rows = array(rows.typecode, rows)
+        else:
+            self.rows = array(typecode, rows)
+
+        self.rng = rng
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __contains__(self, row):
+        return row in self.rows
+
+    @property
+    def typecode(self):
+        return self.rows.typecode
+
+    def pop(self):
+        """Draw a random row from the pile.
+
+        :raises IndexError:
+            The pile is empty.
+        """
+        rows = self.rows
+        last = len(rows) - 1
+        if last < 0:
+            raise IndexError("pop from empty pile")
+
+        # Swap the chosen row to the end, where it's cheap to remove
+        i = self.rng.randrange(last + 1) if last else 0
+        row = rows[i]
+        rows[i] = rows[last]
+        del rows[last]
+        return row
+
+    def take(self, count):
+        """Draw count random rows from the pile at once.
+
+        :returns:
+            An ``array`` of the rows, in the order they were drawn.
+
+        :raises IndexError:
+            The pile has fewer than count rows.
+        """
+        rows = self.rows
+        size = len(rows)
+        if count > size:
+            raise IndexError("not enough cards in pile")
+
+        # Fisher-Yates over the tail of the pile, then cut the tail off
+        randrange = self.rng.randrange
+        for last in range(size - 1, size - count - 1, -1):
+            i = randrange(last + 1) if last else 0
+            rows[i], rows[last] = rows[last], rows[i]
+
+        drawn = rows[size - count:]
+        del rows[size - count:]
+        drawn.reverse()
+        return drawn
+
+    def extend(self, rows):
+        """Add rows to the pile."""
+        self.rows.extend(rows)
+
+    def clear(self):
+        """Empty the pile."""
+        del self.rows[:]
+
+    def __repr__(self):
+        return "DrawPile(<{0} cards>)".format(len(self))
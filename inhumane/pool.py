@@ -0,0 +1,446 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Pools of games that hibernate when idle.
+
+A :py:class:`GamePool` holds many games, keeping only the recently used ones
+in memory. Games that haven't been used for ``idle`` seconds, or the least
+recently used ones when the games in memory are estimated to take more than
+``budget`` bytes, are hibernated: a :py:mod:`~inhumane.snapshot` of each is
+written to a store (:py:class:`FileStore` or :py:class:`SqliteStore`), and the
+game is dropped. The next time a hibernated game is used, it is restored from
+the store.
+
+Games are reached through a :py:class:`GameHandle`, which passes attribute
+access on to the game, restoring it first if need be, so a handle can be used
+like the game itself. Don't keep references to the game, or to its
+attributes, beyond a call; they'll be stale once it hibernates.
+
+The store keeps a game's last snapshot after the game is restored (until it
+hibernates again, or is removed), so if the process dies, a new pool on the
+same store brings back every game as it last hibernated.
+
+A journaled game's journal is closed when it hibernates, and reattached when
+it is restored, adding a new snapshot to the end of the file, so the journal
+still holds the calls made before the game hibernated.
+
+Idle games are found by :py:meth:`GamePool.sweep`, which is called every
+``interval`` seconds as games are used; it can also be called from a timer.
+The pool isn't safe to use from several threads at once without a lock
+around it.
+"""
+
+
+import os
+import sqlite3
+import time
+
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from uuid import UUID
+
+from .snapshot import restore
+
+
+# Rough sizes in bytes, from tracemalloc, for estimate_size
+_BASE_SIZE = 7680
+_PLAYER_SIZE = 1536
+_CARD_SIZE = 112
+
+
+def estimate_size(game):
+    """Return a rough estimate of the memory a game takes, in bytes, not
+    counting its (shared) deck or private player data."""
+    rows = (len(game.blackcards) + len(game.whitecards) +
+            len(game.discardblack) + len(game.discardwhite))
+    cards = (sum(len(hand) for hand in game.playercards.values()) +
+             sum(len(rows) for rows in game.playerplay.values()))
+    return (_BASE_SIZE + rows * game.discardwhite.itemsize +
+            len(game.playerdata) * _PLAYER_SIZE + cards * _CARD_SIZE)
+
+
+class FileStore(object):
+
+    """A store of snapshots, one file per game in a directory."""
+
+    def __init__(self, path):
+        """Create the store.
+
+        :param path:
+            The directory, which is created if need be.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _filename(self, gid):
+        return os.path.join(self.path, "{0}.snapshot".format(gid.hex))
+
+    def save(self, gid, data):
+        """Store the snapshot of a game."""
+        # Never leave a partly written snapshot behind
+        filename = self._filename(gid)
+        temp = "{0}.tmp".format(filename)
+        with open(temp, "wb") as f:
+            f.write(data)
+
+        os.replace(temp, filename)
+
+    def load(self, gid):
+        """Return the snapshot of a game.
+
+        :raises KeyError:
+            The game isn't in the store.
+        """
+        try:
+            with open(self._filename(gid), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(gid)
+
+    def delete(self, gid):
+        """Remove a game, if it is in the store."""
+        try:
+            os.remove(self._filename(gid))
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        """Return the ID's of the games in the store."""
+        return [UUID(name[:-len(".snapshot")]) for name in
+                os.listdir(self.path) if name.endswith(".snapshot")]
+
+
+class SqliteStore(object):
+
+    """A store of snapshots in an SQLite database."""
+
+    def __init__(self, path):
+        """Create the store.
+
+        :param path:
+            The database file, which is created if need be.
+        """
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+
+        # Commits don't wait for the disk, but survive the process dying
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS games "
+                        "(gid BLOB PRIMARY KEY, data BLOB NOT NULL)")
+        self.db.commit()
+        self._lock = Lock()
+
+    def save(self, gid, data):
+        """Store the snapshot of a game."""
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO games VALUES (?, ?)",
+                            (gid.bytes, data))
+
+    def load(self, gid):
+        """Return the snapshot of a game.
+
+        :raises KeyError:
+            The game isn't in the store.
+        """
+        with self._lock:
+            row = self.db.execute("SELECT data FROM games WHERE gid = ?",
+                                  (gid.bytes,)).fetchone()
+
+        if row is None:
+            raise KeyError(gid)
+
+        return row[0]
+
+    def delete(self, gid):
+        """Remove a game, if it is in the store."""
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM games WHERE gid = ?", (gid.bytes,))
+
+    def keys(self):
+        """Return the ID's of the games in the store."""
+        with self._lock:
+            return [UUID(bytes=gid) for gid, in
+                    self.db.execute("SELECT gid FROM games")]
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self.db.close()
+
+
+PoolInfo = namedtuple("PoolInfo", "resident hibernated size hibernations "
+                                  "rehydrations latency maxlatency")
+
+
+class GameHandle(object):
+
+    """Stands in for a game in a :py:class:`GamePool`.
+
+    Getting or setting any attribute but :py:attr:`pool` and :py:attr:`gid`
+    does so on the game, restoring it first if it is hibernating.
+    """
+
+    __slots__ = ("pool", "gid")
+
+    def __init__(self, pool, gid):
+        object.__setattr__(self, "pool", pool)
+        object.__setattr__(self, "gid", gid)
+
+    @property
+    def game(self):
+        """The game, restored if need be."""
+        return self.pool.get(self.gid)
+
+    def __getattr__(self, name):
+        return getattr(self.pool.get(self.gid), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.pool.get(self.gid), name, value)
+
+    def __eq__(self, other):
+        if not isinstance(other, GameHandle):
+            return NotImplemented
+
+        return self.pool is other.pool and self.gid == other.gid
+
+    def __hash__(self):
+        return hash(self.gid)
+
+    def __repr__(self):
+        return "GameHandle({0})".format(self.gid)
+
+
+class GamePool(object):
+
+    """Games, hibernated to a store when idle."""
+
+    def __init__(self, store, idle=3600, budget=None, interval=60,
+                 clock=time.monotonic):
+        """Create a pool.
+
+        Games already in the store are hibernating in the pool.
+
+        :param store:
+            The :py:class:`FileStore` or :py:class:`SqliteStore` to hibernate
+            games to.
+
+        :param idle:
+            Hibernate games that haven't been used for this many seconds, or
+            None.
+
+        :param budget:
+            Hibernate the least recently used games while the games in memory
+            take more than this many bytes (by :py:func:`estimate_size`), or
+            None.
+
+        :param interval:
+            Look for idle games at most this often, in seconds.
+
+        :param clock:
+            The function giving the time in seconds.
+        """
+        self.store = store
+        self.idle = idle
+        self.budget = budget
+        self.interval = interval
+        self.clock = clock
+
+        # gid -> game, least recently used first
+        self._resident = OrderedDict()
+        self._used = dict()
+        self._sizes = dict()
+        self.size = 0
+
+        # Games hibernated by an earlier pool
+        self._hibernated = set(store.keys())
+
+        # Things to put back when a game is restored
+        self._decks = dict()
+        self._journals = dict()
+
+        self.hibernations = 0
+        self.rehydrations = 0
+        self._latency = 0.0
+        self._maxlatency = 0.0
+
+        self._swept = clock()
+
+    def add(self, game):
+        """Add a game.
+
+        :returns:
+            The :py:class:`GameHandle` for it.
+        """
+        gid = game.gid
+        if gid in self:
+            raise KeyError("Game already in the pool")
+
+        self._decks[gid] = game.deck
+        self._admit(gid, game)
+        return GameHandle(self, gid)
+
+    def _admit(self, gid, game):
+        self._resident[gid] = game
+        self._used[gid] = self.clock()
+        self._sizes[gid] = size = estimate_size(game)
+        self.size += size
+
+        if self.budget is not None:
+            while self.size > self.budget and len(self._resident) > 1:
+                oldest = next(iter(self._resident))
+                if oldest == gid:
+                    break
+
+                self.hibernate(oldest)
+
+    def handle(self, gid):
+        """Return the :py:class:`GameHandle` for a game.
+
+        :raises KeyError:
+            The game isn't in the pool.
+        """
+        if gid not in self:
+            raise KeyError(gid)
+
+        return GameHandle(self, gid)
+
+    __getitem__ = handle
+
+    def get(self, gid):
+        """Return a game itself, restoring it if it is hibernating.
+
+        :raises KeyError:
+            The game isn't in the pool.
+        """
+        now = self.clock()
+        game = self._resident.get(gid)
+        if game is not None:
+            # Touched first, so the sweep doesn't hibernate it
+            self._resident.move_to_end(gid)
+            self._used[gid] = now
+
+        if now - self._swept >= self.interval:
+            self.sweep()
+            game = self._resident.get(gid)
+
+        if game is not None:
+            return game
+
+        if gid not in self._hibernated:
+            raise KeyError(gid)
+
+        return self._rehydrate(gid)
+
+    def _rehydrate(self, gid):
+        start = time.perf_counter()
+
+        deck = self._decks.get(gid)
+        game = restore(self.store.load(gid),
+                       [deck] if deck is not None else None)
+        self._hibernated.discard(gid)
+
+        journal = self._journals.pop(gid, None)
+        if journal is not None:
+            journal.attach(game)
+
+        self._admit(gid, game)
+
+        latency = time.perf_counter() - start
+        self.rehydrations += 1
+        self._latency += latency
+        self._maxlatency = max(self._maxlatency, latency)
+        return game
+
+    def hibernate(self, gid):
+        """Hibernate a game now, if it isn't already."""
+        game = self._resident.get(gid)
+        if game is None:
+            return
+
+        # Saved first, so the game stays resident if that fails
+        self.store.save(gid, game.snapshot())
+
+        del self._resident[gid]
+        if game.journal is not None:
+            journal = self._journals[gid] = game.journal
+            journal.close()
+
+        self._hibernated.add(gid)
+
+        del self._used[gid]
+        self.size -= self._sizes.pop(gid)
+        self.hibernations += 1
+
+    def hibernate_all(self):
+        """Hibernate every game (before shutting down, say)."""
+        for gid in list(self._resident):
+            self.hibernate(gid)
+
+    def sweep(self):
+        """Hibernate idle games, then the least recently used games while
+        over the budget."""
+        now = self._swept = self.clock()
+
+        # Refresh the estimates, since games grow and shrink
+        sizes = self._sizes
+        for gid, game in self._resident.items():
+            sizes[gid] = estimate_size(game)
+
+        self.size = sum(sizes.values())
+
+        if self.idle is not None:
+            used = self._used
+            for gid in list(self._resident):
+                if now - used[gid] < self.idle:
+                    # The rest were used more recently
+                    break
+
+                self.hibernate(gid)
+
+        if self.budget is not None:
+            while self.size > self.budget and self._resident:
+                self.hibernate(next(iter(self._resident)))
+
+    def remove(self, gid):
+        """Remove a game from the pool (and the store).
+
+        :raises KeyError:
+            The game isn't in the pool.
+        """
+        game = self._resident.pop(gid, None)
+        if game is not None:
+            del self._used[gid]
+            self.size -= self._sizes.pop(gid)
+            if game.journal is not None:
+                game.journal.close()
+        elif gid in self._hibernated:
+            self._hibernated.remove(gid)
+        else:
+            raise KeyError(gid)
+
+        # A restored game's last snapshot is still in the store
+        self.store.delete(gid)
+        self._decks.pop(gid, None)
+        self._journals.pop(gid, None)
+
+    def info(self):
+        """Return the pool's statistics as a :py:class:`PoolInfo`.
+
+        The latencies are the mean and longest time taken to restore a game,
+        in seconds.
+        """
+        latency = self._latency / self.rehydrations if self.rehydrations \
+            else 0.0
+        return PoolInfo(len(self._resident), len(self._hibernated),
+                        self.size, self.hibernations, self.rehydrations,
+                        latency, self._maxlatency)
+
+    def __contains__(self, gid):
+        return gid in self._resident or gid in self._hibernated
+
+    def __len__(self):
+        return len(self._resident) + len(self._hibernated)
+
+    def __iter__(self):
+        return iter(list(self._resident) + list(self._hibernated))
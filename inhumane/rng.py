@@ -0,0 +1,203 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Random number generators for games.
+
+Every game has its own RNG, picked by strategy name with :py:func:`get_rng`:
+
+- ``"secure"`` (the default): a :py:class:`StreamRandom` keyed with 256 bits
+  from ``os.urandom``. Entropy is read once, and expanded with keyed BLAKE2b
+  in counter mode, so drawing a card doesn't cost a system call.
+- ``"seeded"``: a :py:class:`StreamRandom` keyed from a seed, which is kept
+  in :py:attr:`StreamRandom.seedvalue` so the game can be replayed. A random
+  256-bit seed is picked if none is given.
+- ``"system"``: ``random.SystemRandom``, one system call per number.
+
+The default Mersenne Twister isn't offered: seeded from an integer it only
+has 2**32 ish starting states, and a deck can have 2**255.6 possible
+shuffles. The stream generators have 2**256 keys.
+"""
+
+
+import os
+import sys
+
+from array import array
+from hashlib import blake2b
+from random import Random, SystemRandom
+
+
+# Bytes of keystream generated at a time
+_CHUNK = 4096
+_BLOCK = 64
+
+_RECIP = 2.0 ** -53
+
+
+class StreamRandom(Random):
+
+    """A ``random.Random`` backed by a keyed BLAKE2b keystream.
+
+    The keystream is generated in chunks of 64-bit words, and the key is
+    replaced after every chunk, so earlier output can't be recovered from the
+    state.
+    """
+
+    VERSION = 1
+
+    def __init__(self, seed=None):
+        """Create the generator.
+
+        :param seed:
+            An ``int``, ``str`` or ``bytes`` seed, or None to use 256 bits
+            from ``os.urandom``.
+        """
+        super().__init__(seed)
+
+    def seed(self, a=None, version=2):
+        """Key the generator.
+
+        :param a:
+            An ``int``, ``str`` or ``bytes`` seed, or None to use 256 bits
+            from ``os.urandom``.
+        """
+        if a is None:
+            key = os.urandom(32)
+        else:
+            if isinstance(a, int):
+                data = a.to_bytes(a.bit_length() // 8 + 1, "little",
+                                  signed=True)
+            elif isinstance(a, str):
+                data = a.encode("utf-8")
+            elif isinstance(a, (bytes, bytearray)):
+                data = bytes(a)
+            else:
+                raise TypeError("Seed must be an int, str, or bytes")
+
+            key = blake2b(data, digest_size=32, person=b"inhumane").digest()
+
+        self.seedvalue = a
+        self.gauss_next = None
+
+        self._key = key
+        self._counter = 0
+
+        # Unused keystream, as 64-bit words used from the end
+        self._words = array("Q")
+
+    def _refill(self):
+        key = self._key
+        counter = self._counter
+        blocks = [blake2b(i.to_bytes(8, "little"), key=key).digest() for i in
+                  range(counter, counter + _CHUNK // _BLOCK + 1)]
+
+        # Fast key erasure: the last block becomes the next key
+        self._key = blocks.pop()[:32]
+        self._counter = counter + len(blocks) + 1
+
+        words = array("Q", b"".join(blocks))
+        if sys.byteorder != "little":
+            words.byteswap()
+
+        self._words = words + self._words
+
+    def _word(self):
+        try:
+            return self._words.pop()
+        except IndexError:
+            self._refill()
+            return self._words.pop()
+
+    def getrandbits(self, k):
+        if k <= 64:
+            if k <= 0:
+                if k < 0:
+                    raise ValueError("number of bits must be non-negative")
+
+                return 0
+
+            try:
+                return self._words.pop() >> (64 - k)
+            except IndexError:
+                return self._word() >> (64 - k)
+
+        n = (k + 63) // 64
+        value = 0
+        for i in range(n):
+            value = (value << 64) | self._word()
+
+        return value >> (n * 64 - k)
+
+    def random(self):
+        # 53 bits, as for the default generator
+        try:
+            return (self._words.pop() >> 11) * _RECIP
+        except IndexError:
+            return (self._word() >> 11) * _RECIP
+
+    def randbytes(self, n):
+        return self.getrandbits(n * 8).to_bytes(n, "little")
+
+    def getstate(self):
+        return (self.VERSION, self._key, self._counter, self._words.tobytes(),
+                self.gauss_next, self.seedvalue)
+
+    def setstate(self, state):
+        if state[0] != self.VERSION:
+            raise ValueError("Unsupported state version")
+
+        (version, self._key, self._counter, words, self.gauss_next,
+         self.seedvalue) = state
+        self._words = array("Q", words)
+
+
+def _secure(seed):
+    if seed is not None:
+        raise ValueError("The secure RNG can't be seeded")
+
+    return StreamRandom()
+
+
+def _seeded(seed):
+    if seed is None:
+        seed = int.from_bytes(os.urandom(32), "little")
+
+    return StreamRandom(seed)
+
+
+def _system(seed):
+    if seed is not None:
+        raise ValueError("The system RNG can't be seeded")
+
+    return SystemRandom()
+
+
+strategies = {
+    "secure": _secure,
+    "seeded": _seeded,
+    "system": _system,
+}
+
+
+def get_rng(strategy="secure", seed=None):
+    """Create an RNG.
+
+    :param strategy:
+        The name of a strategy in :py:data:`strategies`, or a
+        ``random.Random`` instance, which is returned as-is.
+
+    :param seed:
+        The seed, for the ``"seeded"`` strategy.
+
+    :raises ValueError:
+        The strategy is unknown, or can't be seeded.
+    """
+    if isinstance(strategy, Random):
+        return strategy
+
+    try:
+        make = strategies[strategy]
+    except KeyError:
+        raise ValueError("Unknown RNG strategy {0!r}".format(strategy))
+
+    return make(seed)
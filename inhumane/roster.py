@@ -0,0 +1,109 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Player rosters.
+
+A :py:class:`Roster` is an :py:class:`~inhumane.contrib.orderedset.OrderedSet`
+of players in seat order, which also links every seat to the next one around
+the table. Finding the player after a given one is O(1), and the links are
+kept up to date as players leave, so rotating (the tsar, say) never skips or
+repeats a seat.
+"""
+
+
+from .contrib.orderedset import OrderedSet
+
+
+class Roster(OrderedSet):
+
+    """Players in seat order, in a ring."""
+
+    def __init__(self, iterable=None):
+        self._next = {}
+        self._prev = {}
+        self._first = None
+        super().__init__(iterable)
+
+    def add(self, player):
+        if player in self.map:
+            return
+
+        super().add(player)
+
+        # Link in at the end, before the first seat
+        first = self._first
+        if first is None:
+            self._first = self._next[player] = self._prev[player] = player
+        else:
+            last = self._prev[first]
+            self._next[last] = self._prev[first] = player
+            self._prev[player] = last
+            self._next[player] = first
+
+    def update(self, players):
+        for player in players:
+            self.add(player)
+
+    def discard(self, player):
+        if player not in self.map:
+            return
+
+        super().discard(player)
+
+        prev = self._prev.pop(player)
+        next = self._next.pop(player)
+        if next == player:
+            self._first = None
+        else:
+            self._next[prev] = next
+            self._prev[next] = prev
+            if self._first == player:
+                self._first = next
+
+    def clear(self):
+        super().clear()
+        self._next.clear()
+        self._prev.clear()
+        self._first = None
+
+    def __setitem__(self, index, player):
+        # Replaces the player, keeping their seat
+        old = self[index]
+        super().__setitem__(index, player)
+        if player == old:
+            return
+
+        prev = self._prev.pop(old)
+        next = self._next.pop(old)
+        if next == old:
+            prev = next = player
+
+        self._next[prev] = self._prev[next] = player
+        self._prev[player] = prev
+        self._next[player] = next
+        if self._first == old:
+            self._first = player
+
+    def successor(self, player):
+        """Return the player in the seat after the given one.
+
+        :raises KeyError:
+            The player isn't in the roster.
+        """
+        return self._next[player]
+
+    def predecessor(self, player):
+        """Return the player in the seat before the given one.
+
+        :raises KeyError:
+            The player isn't in the roster.
+        """
+        return self._prev[player]
+
+    def seat(self, index):
+        """Return the player in a seat, counting around the table (so any
+        index is valid for a non-empty roster)."""
+        if not self:
+            raise IndexError("Roster is empty")
+
+        return self[index % len(self)]
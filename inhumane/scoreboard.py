@@ -0,0 +1,156 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Incrementally ordered tallies.
+
+A :py:class:`Scoreboard` is a ``Counter`` that keeps its keys grouped by
+count, with the distinct counts in a sorted list, as counts change. The
+leading count is O(1) to find and the top ``n`` keys are O(n), instead of
+sorting the whole tally every time. The order is the same as that of
+``Counter.most_common``, ties included.
+"""
+
+
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import count
+
+
+class Scoreboard(Counter):
+
+    """A ``Counter`` with a leaderboard kept up to date as counts change.
+
+    Keys with equal counts are ranked in the order they were added, as in
+    ``Counter.most_common``.
+    """
+
+    def __init__(self, iterable=None, **kwds):
+        # count -> sorted [(position, key)], where a key's position is when
+        # it was added, so ties keep the order of the dict
+        self._buckets = {}
+        self._counts = []
+        self._positions = {}
+        self._added = count()
+        super().__init__(iterable, **kwds)
+
+    def _unlink(self, key, count):
+        bucket = self._buckets[count]
+        del bucket[bisect_left(bucket, (self._positions[key],))]
+        if not bucket:
+            del self._buckets[count]
+            del self._counts[bisect_left(self._counts, count)]
+
+    def _link(self, key, count):
+        bucket = self._buckets.get(count)
+        if bucket is None:
+            bucket = self._buckets[count] = []
+            insort(self._counts, count)
+
+        insort(bucket, (self._positions[key], key))
+
+    def __setitem__(self, key, count):
+        old = self.get(key)
+        if old is not None:
+            if old == count:
+                return
+
+            self._unlink(key, old)
+        else:
+            self._positions[key] = next(self._added)
+
+        super().__setitem__(key, count)
+        self._link(key, count)
+
+    def __delitem__(self, key):
+        old = self[key] if key in self else None
+        super().__delitem__(key)
+        if old is not None:
+            self._unlink(key, old)
+            del self._positions[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            self._unlink(key, self[key])
+            del self._positions[key]
+
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, count = super().popitem()
+        self._unlink(key, count)
+        del self._positions[key]
+        return key, count
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+
+        return self[key]
+
+    def clear(self):
+        super().clear()
+        self._buckets.clear()
+        del self._counts[:]
+        self._positions.clear()
+
+    def update(self, iterable=None, **kwds):
+        # Counter.update bypasses __setitem__ when the counter is empty
+        if iterable is not None and hasattr(iterable, "items"):
+            for key, count in iterable.items():
+                self[key] = self.get(key, 0) + count
+
+            iterable = None
+
+        super().update(iterable, **kwds)
+
+    @property
+    def maxcount(self):
+        """The highest count, or 0 if there are no keys."""
+        return self._counts[-1] if self._counts else 0
+
+    def leader(self):
+        """Return the ``(key, count)`` of the first key with the highest
+        count, or None if there are no keys."""
+        if not self._counts:
+            return None
+
+        count = self._counts[-1]
+        return self._buckets[count][0][1], count
+
+    def leaders(self):
+        """Return the list of keys with the highest count."""
+        if not self._counts:
+            return []
+
+        return [key for position, key in self._buckets[self._counts[-1]]]
+
+    def top(self, n=None):
+        """Yield ``(key, count)`` from the highest count down, for at most n
+        keys (or all of them)."""
+        if n is not None and n <= 0:
+            return
+
+        for count in reversed(self._counts):
+            for position, key in self._buckets[count]:
+                yield key, count
+                if n is not None:
+                    n -= 1
+                    if not n:
+                        return
+
+    def bottom(self, n=None):
+        """Yield ``(key, count)`` from the lowest count up, for at most n
+        keys (or all of them)."""
+        if n is not None and n <= 0:
+            return
+
+        for count in self._counts:
+            for position, key in self._buckets[count]:
+                yield key, count
+                if n is not None:
+                    n -= 1
+                    if not n:
+                        return
+
+    def most_common(self, n=None):
+        return list(self.top(n))
@@ -0,0 +1,336 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Compact snapshots of games.
+
+:py:func:`snapshot` turns a :py:class:`~inhumane.game.Game` into bytes, and
+:py:func:`restore` turns them back into a game, so live games can be carried
+over a restart. Usually these are called as
+:py:meth:`Game.snapshot <inhumane.game.Game.snapshot>` and
+:py:meth:`Game.restore <inhumane.game.Game.restore>`.
+
+Pickling a game would copy its whole deck and every card object along with
+it. A snapshot instead refers to the deck by its
+:py:attr:`~inhumane.deck.Deck.ident`, and to cards by their rows in it, so
+restoring rebinds to the shared deck already loaded (from
+:py:data:`~inhumane.deck.deck_cache`, or as given). Players are numbered,
+with their UUID's stored once, and piles, hands, and scores are packed
+little-endian integer arrays.
+
+A snapshot starts with :py:data:`MAGIC` and a version byte, followed by a
+pickle of plain data. Private player data is pickled as-is, so only restore
+snapshots from a trusted source.
+"""
+
+
+import pickle
+import struct
+import sys
+
+from array import array
+from collections import OrderedDict, defaultdict
+from functools import partial
+from random import Random, SystemRandom
+from uuid import UUID
+
+from .audience import AudienceVote
+from .deck import combine_decks, deck_cache
+from .game import Game
+from .hand import Hand
+from .pile import DrawPile
+from .rng import StreamRandom
+from .roster import Roster
+from .scoreboard import Scoreboard
+
+
+MAGIC = b"IHGS"
+VERSION = 1
+
+_header = struct.Struct("<4sB")
+
+# Player ID standing in for None (round_start records the tsar as having
+# played even when there isn't one)
+_NOBODY = 0xFFFFFFFF
+
+
+def _pack(values, typecode):
+    values = array(typecode, values)
+    if sys.byteorder == "big":
+        values.byteswap()
+
+    return values.tobytes()
+
+
+def _unpack(data, typecode):
+    values = array(typecode, data)
+    if sys.byteorder == "big":
+        values.byteswap()
+
+    return values
+
+
+def _pack_groups(groups, typecode):
+    """Pack ``(player, rows)`` pairs into three arrays: players, lengths, and
+    all the rows one after another."""
+    players = array("I")
+    lengths = array("I")
+    rows = array(typecode)
+    for player, group in groups:
+        players.append(player)
+        lengths.append(len(group))
+        rows.extend(group)
+
+    return (_pack(players, "I"), _pack(lengths, "I"), _pack(rows, typecode))
+
+
+def _unpack_groups(packed, typecode):
+    players, lengths, rows = packed
+    rows = _unpack(rows, typecode)
+    start = 0
+    for player, length in zip(_unpack(players, "I"), _unpack(lengths, "I")):
+        yield player, rows[start:start + length]
+        start += length
+
+
+def _fingerprint(deck):
+    return (len(deck.table), len(deck.whiteindices), len(deck.blackindices))
+
+
+def _rng_state(rng):
+    if isinstance(rng, StreamRandom):
+        return ("stream", rng.getstate())
+    elif isinstance(rng, SystemRandom):
+        # Nothing to save
+        return ("system", None)
+    else:
+        return ("random", rng.getstate())
+
+
+def _rng_restore(state):
+    kind, state = state
+    if kind == "system":
+        return SystemRandom()
+
+    rng = StreamRandom() if kind == "stream" else Random()
+    rng.setstate(state)
+    return rng
+
+
+def snapshot(game):
+    """Return a snapshot of a game.
+
+    :param game:
+        The :py:class:`~inhumane.game.Game`.
+
+    :returns:
+        The snapshot, as bytes.
+    """
+    players = list(game.players)
+    ids = {player: i for i, player in enumerate(players)}
+
+    def pid(player):
+        if player is None:
+            return _NOBODY
+
+        # Players who have left may still be mentioned
+        i = ids.get(player)
+        if i is None:
+            i = ids[player] = len(players)
+            players.append(player)
+
+        return i
+
+    deck = game.deck
+    typecode = game.whitecards.typecode
+
+    def scores(board):
+        board = list(board.bottom())
+        return (_pack([pid(player) for player, count in board], "I"),
+                _pack([count for player, count in board], "i"))
+
+    audiencevote = None
+    if game.audiencevote is not None:
+        audiencevote = game.audiencevote.__getstate__()
+        audiencevote["candidates"] = [pid(player) for player in
+                                      audiencevote["candidates"]]
+        audiencevote["counts"] = {pid(player): count for player, count in
+                                  audiencevote["counts"].items()}
+
+    state = {
+        "name": game.name,
+        "gid": game.gid.bytes,
+        "deck": (deck.ident, _fingerprint(deck)) if deck is not None else None,
+        "typecode": typecode,
+        "rng": _rng_state(game.rng),
+        "seed": game.seed,
+
+        "blackcards": _pack(game.blackcards.rows, typecode),
+        "whitecards": _pack(game.whitecards.rows, typecode),
+        "discardblack": _pack(game.discardblack, typecode),
+        "discardwhite": _pack(game.discardwhite, typecode),
+        "blackrow": game.blackrow,
+        "maxdraw": game.maxdraw,
+
+        "roster": len(game.players),
+        "tsar": pid(game.tsar) if game.tsar is not None else None,
+        "playercards": _pack_groups(((pid(player), hand) for player, hand in
+                                     game.playercards.items()), typecode),
+        "playerplay": _pack_groups(((pid(player), rows) for player, rows in
+                                    game.playerplay.items()), typecode),
+        "playerlast": (_pack([pid(player) for player in game.playerlast],
+                             "I"),
+                       _pack(game.playerlast.values(), "I")),
+        "playerdata": [(pid(player), data) for player, data in
+                       game.playerdata.items()],
+
+        "voters": (_pack([pid(player) for player in game.voters], "I"),
+                   _pack([pid(player) for player in game.voters.values()],
+                         "I")),
+        "votes": scores(game.votes),
+        "ap": scores(game.ap),
+        "audiencevote": audiencevote,
+        "gamblers": _pack([pid(player) for player in game.gamblers], "I"),
+        "ap_grant": game.ap_grant,
+
+        "rounds": game.rounds,
+        "inround": game.inround,
+        "suspended": game.suspended,
+        "spent": game.spent,
+
+        "rules": {name: getattr(game, name) for name in
+                  ("gambling", "voting", "audience", "audience_quorum",
+                   "audience_deadline", "maxcards", "apxchg", "maxrounds",
+                   "maxap")},
+    }
+
+    # Last, now every player mentioned has an ID
+    state["players"] = b"".join(player.bytes for player in players)
+
+    return _header.pack(MAGIC, VERSION) + pickle.dumps(state, protocol=4)
+
+
+def restore(data, decks=None, cls=Game):
+    """Restore a game from a snapshot.
+
+    :param data:
+        The snapshot, from :py:func:`snapshot`.
+
+    :param decks:
+        The decks the game was created with. By default, the deck is looked
+        up in :py:data:`~inhumane.deck.deck_cache` by its
+        :py:attr:`~inhumane.deck.Deck.ident`.
+
+    :param cls:
+        The class of game to create.
+
+    :returns:
+        The game.
+
+    :raises ValueError:
+        The data isn't a snapshot of a supported version, or the deck isn't
+        loaded or doesn't match the one the game was played with.
+    """
+    if len(data) < _header.size:
+        raise ValueError("Not a game snapshot")
+
+    magic, version = _header.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a game snapshot")
+    elif version != VERSION:
+        raise ValueError("Unsupported snapshot version {0}".format(version))
+
+    state = pickle.loads(data[_header.size:])
+
+    if decks is not None:
+        deck = combine_decks(decks)
+    elif state["deck"] is not None:
+        deck = deck_cache.find(state["deck"][0])
+        if deck is None:
+            raise ValueError("The snapshot's deck isn't loaded")
+    else:
+        deck = None
+
+    if (deck is None) != (state["deck"] is None) or (
+            deck is not None and _fingerprint(deck) != state["deck"][1]):
+        raise ValueError("The snapshot is for a different deck")
+
+    raw = state["players"]
+    players = [UUID(bytes=raw[i:i + 16]) for i in range(0, len(raw), 16)]
+    typecode = state["typecode"]
+
+    def scores(packed):
+        board = Scoreboard()
+        for player, count in zip(_unpack(packed[0], "I"),
+                                 _unpack(packed[1], "i")):
+            board[players[player]] = count
+
+        return board
+
+    game = cls.__new__(cls)
+    game.name = state["name"]
+    game.gid = UUID(bytes=state["gid"])
+    game.deck = deck
+    game.rng = rng = _rng_restore(state["rng"])
+    game.seed = state["seed"]
+
+    game.blackcards = DrawPile(_unpack(state["blackcards"], typecode), rng)
+    game.whitecards = DrawPile(_unpack(state["whitecards"], typecode), rng)
+    game.discardblack = _unpack(state["discardblack"], typecode)
+    game.discardwhite = _unpack(state["discardwhite"], typecode)
+    game.blackrow = state["blackrow"]
+    game.maxdraw = state["maxdraw"]
+
+    game.players = Roster(players[:state["roster"]])
+    tsar = state["tsar"]
+    game.tsar = players[tsar] if tsar is not None else None
+
+    ranks = deck.ranks if deck is not None else ()
+    game.playercards = defaultdict(partial(Hand, ranks))
+    for player, rows in _unpack_groups(state["playercards"], typecode):
+        game.playercards[players[player]] = Hand(ranks, rows)
+
+    game.playerplay = OrderedDict()
+    for player, rows in _unpack_groups(state["playerplay"], typecode):
+        game.playerplay[players[player]] = rows.tolist()
+
+    game.playerlast = defaultdict(int)
+    last = state["playerlast"]
+    for player, rounds in zip(_unpack(last[0], "I"), _unpack(last[1], "I")):
+        game.playerlast[players[player] if player != _NOBODY else None] = \
+            rounds
+
+    game.playerdata = {players[player]: data for player, data in
+                       state["playerdata"]}
+
+    voters = state["voters"]
+    game.voters = {players[player]: players[target] for player, target in
+                   zip(_unpack(voters[0], "I"), _unpack(voters[1], "I"))}
+    game.votes = scores(state["votes"])
+    game.ap = scores(state["ap"])
+
+    audiencevote = state["audiencevote"]
+    if audiencevote is not None:
+        audiencevote["candidates"] = [players[player] for player in
+                                      audiencevote["candidates"]]
+        audiencevote["counts"] = {players[player]: count for player, count
+                                  in audiencevote["counts"].items()}
+        game.audiencevote = AudienceVote.__new__(AudienceVote)
+        game.audiencevote.__setstate__(audiencevote)
+    else:
+        game.audiencevote = None
+
+    game.gamblers = {players[player] for player in
+                     _unpack(state["gamblers"], "I")}
+    game.ap_grant = state["ap_grant"]
+
+    game.rounds = state["rounds"]
+    game.inround = state["inround"]
+    game.suspended = state["suspended"]
+    game.spent = state["spent"]
+
+    for name, value in state["rules"].items():
+        setattr(game, name, value)
+
+    game.journal = None
+
+    return game
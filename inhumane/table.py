@@ -0,0 +1,283 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Columnar card storage.
+
+A :py:class:`CardTable` stores cards as rows of parallel arrays instead of
+one Python object per card, so large decks can be shared by many games
+cheaply. Card objects are only built for the rows that are actually used.
+"""
+
+
+from array import array
+from collections.abc import Sequence
+
+from .card import BlackCard, Card, WhiteCard
+from .watermark import registry
+
+
+WHITE = 0
+BLACK = 1
+
+
+class CardTable(object):
+
+    """Columnar storage for a set of cards.
+
+    Each card is a row, identified by its index. The text of every card is
+    kept UTF-8 encoded in the single buffer :py:attr:`text` (identical texts
+    are stored once), and everything else in parallel arrays:
+
+    - ``offsets`` and ``lengths``: where the card's text is in the buffer
+    - ``kinds``: :py:data:`WHITE` or :py:data:`BLACK`
+    - ``drawcounts`` and ``playcounts``: zero for white cards
+    - ``wmasks``: the watermark mask (see :py:mod:`inhumane.watermark`)
+    - ``keys``: the card's content key (see :py:attr:`~inhumane.card.Card.key`)
+
+    :py:meth:`card` builds the card object for a row on first use, and caches
+    it.
+
+    .. note::
+        ``wmasks`` becomes a list if a mask doesn't fit in 64 bits.
+    """
+
+    def __init__(self):
+        self.text = b""
+        self.offsets = array("I")
+        self.lengths = array("I")
+        self.kinds = array("B")
+        self.drawcounts = array("B")
+        self.playcounts = array("B")
+        self.wmasks = array("Q")
+        self.keys = array("Q")
+
+        # Text not yet appended to the buffer, and where interned texts are
+        self._pending = bytearray()
+        self._textpos = dict()
+
+        self._cards = list()
+        self._rows = None
+
+        self.frozen = False
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def append(self, kind, text, wmask=0, drawcount=0, playcount=0,
+               key=None):
+        """Add a card.
+
+        :param kind:
+            :py:data:`WHITE` or :py:data:`BLACK`.
+
+        :param text:
+            Text of the card.
+
+        :param wmask:
+            Watermark mask of the card.
+
+        :param drawcount:
+            Draw count of a black card.
+
+        :param playcount:
+            Play count of a black card.
+
+        :param key:
+            Content key of the card; computed if not given.
+
+        :returns:
+            The row of the new card.
+        """
+        if self.frozen:
+            raise TypeError("Can't add cards to a frozen table")
+
+        pos = self._textpos.get(text)
+        if pos is None:
+            data = text.encode("utf-8")
+            pos = self._textpos[text] = (len(self.text) + len(self._pending),
+                                         len(data))
+            self._pending += data
+
+        if key is None:
+            if kind == BLACK:
+                key = BlackCard(text, (), drawcount, playcount).key
+            else:
+                key = WhiteCard(text).key
+
+        row = len(self.kinds)
+        self.offsets.append(pos[0])
+        self.lengths.append(pos[1])
+        self.kinds.append(kind)
+        self.drawcounts.append(drawcount)
+        self.playcounts.append(playcount)
+        self.keys.append(key)
+        self._cards.append(None)
+        self.set_wmask(row, wmask)
+
+        if self._rows is not None:
+            self._rows.setdefault(key, []).append(row)
+
+        return row
+
+    def append_card(self, card):
+        """Add a card object.
+
+        :returns:
+            The row of the new card.
+        """
+        if isinstance(card, BlackCard):
+            return self.append(BLACK, card.text, card.wmask, card.drawcount,
+                               card.playcount, card.key)
+
+        return self.append(WHITE, card.text, card.wmask, key=card.key)
+
+    def set_wmask(self, row, wmask):
+        """Set the watermark mask of a row."""
+        if self.frozen:
+            raise TypeError("Can't change a frozen table")
+
+        if isinstance(self.wmasks, array) and wmask >> 64:
+            self.wmasks = list(self.wmasks)
+
+        if row == len(self.wmasks):
+            self.wmasks.append(wmask)
+        else:
+            self.wmasks[row] = wmask
+            self._cards[row] = None
+
+    def _flush(self):
+        if self._pending:
+            self.text += self._pending
+            self._pending = bytearray()
+
+    def finish(self):
+        """Finish adding cards.
+
+        This frees the memory only needed while adding cards. Cards can still
+        be added afterwards, but won't share text with the existing ones.
+        """
+        self._flush()
+        self._textpos = dict()
+
+    def freeze(self):
+        """Finish adding cards, and forbid any further changes."""
+        self.finish()
+        self.frozen = True
+
+    def gettext(self, row):
+        """Return the text of a row."""
+        self._flush()
+        offset = self.offsets[row]
+        return str(self.text[offset:offset + self.lengths[row]], "utf-8")
+
+    def card(self, row):
+        """Return the card object for a row."""
+        card = self._cards[row]
+        if card is None:
+            text = self.gettext(row)
+            if self.kinds[row] == BLACK:
+                card = BlackCard(text, self.wmasks[row], self.drawcounts[row],
+                                 self.playcounts[row])
+            else:
+                card = WhiteCard(text, self.wmasks[row])
+
+            self._cards[row] = card
+
+        return card
+
+    def find(self, key):
+        """Return the first row with the given content key, or None."""
+        rows = self.find_all(key)
+        return rows[0] if rows else None
+
+    def find_all(self, key):
+        """Return a list of every row with the given content key.
+
+        A table holds several rows with the same key when duplicates are
+        kept (see :py:class:`~inhumane.deck.Deck`).
+        """
+        if self._rows is None:
+            rows = dict()
+            for row, k in enumerate(self.keys):
+                rows.setdefault(k, []).append(row)
+
+            self._rows = rows
+
+        return self._rows.get(key, [])
+
+    def __getstate__(self):
+        self._flush()
+        state = self.__dict__.copy()
+        state["_cards"] = None
+        state["_rows"] = None
+
+        # Watermark masks only mean something within a process
+        names = dict()
+        state["wmasks"] = array("I", (names.setdefault(mask, len(names)) for
+                                      mask in self.wmasks))
+        state["_wmnames"] = [tuple(registry.names(mask)) for mask in names]
+        return state
+
+    def __setstate__(self, state):
+        wmnames = state.pop("_wmnames")
+        wmasks = state["wmasks"]
+
+        self.__dict__.update(state)
+        self._cards = [None] * len(self.kinds)
+        self.wmasks = array("Q")
+
+        frozen, self.frozen = self.frozen, False
+        masks = [registry.mask(names) for names in wmnames]
+        for row, i in enumerate(wmasks):
+            self.set_wmask(row, masks[i])
+
+        self.frozen = frozen
+
+
+class CardView(Sequence):
+
+    """A read-only sequence of the cards in some rows of a table.
+
+    Card objects are built as they are accessed.
+    """
+
+    def __init__(self, table, rows, kind):
+        """Create the view.
+
+        :param table:
+            The :py:class:`CardTable`.
+
+        :param rows:
+            The rows in the view.
+
+        :param kind:
+            The kind of the cards in the view. The view must hold every row
+            of that kind in the table, as membership is checked by kind.
+        """
+        self.table = table
+        self.rows = rows
+        self.kind = kind
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table.card(row) for row in self.rows[index]]
+
+        return self.table.card(self.rows[index])
+
+    def __iter__(self):
+        return map(self.table.card, self.rows)
+
+    def __contains__(self, card):
+        if not isinstance(card, Card):
+            return False
+
+        # Equal keys are checked against the card, as in Deck.indices
+        table = self.table
+        return any(table.kinds[row] == self.kind and table.card(row) == card
+                   for row in table.find_all(card.key))
+
+    def __repr__(self):
+        return "CardView(<{0} cards>)".format(len(self))
@@ -0,0 +1,97 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+"""Watermark registry.
+
+Every watermark name seen in the process is assigned a bit, and cards store
+their watermarks as a bitmask of those bits. The masks and the sets of names
+they stand for are interned, so cards with the same watermarks share them.
+
+.. note::
+    The bits are assigned in the order watermarks are first seen, so masks
+    only mean something within one process. Use the names to move watermarks
+    between processes.
+"""
+
+
+from threading import RLock
+
+
+class WatermarkRegistry(object):
+
+    """Maps watermark names to bits in a mask."""
+
+    def __init__(self):
+        self._bits = dict()
+        self._names = list()
+
+        # Interned masks and their name sets
+        self._masks = {0: 0}
+        self._sets = {0: frozenset()}
+
+        self._lock = RLock()
+
+    def bit(self, name):
+        """Return the bit for a watermark name, assigning it if needed."""
+        bit = self._bits.get(name)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.get(name)
+                if bit is None:
+                    bit = 1 << len(self._names)
+                    self._names.append(name)
+                    self._bits[name] = bit
+
+        return bit
+
+    def lookup(self, name):
+        """Return the bit for a watermark name, or 0 if it hasn't been seen.
+
+        Unlike :py:meth:`bit`, this never assigns a bit.
+        """
+        return self._bits.get(name, 0)
+
+    def mask(self, watermark):
+        """Return the interned mask for the given watermark(s).
+
+        :param watermark:
+            A single watermark name, an iterable of names, or a mask. Empty
+            names are ignored.
+        """
+        if isinstance(watermark, int):
+            mask = watermark
+        elif isinstance(watermark, str):
+            mask = self.bit(watermark) if watermark else 0
+        else:
+            mask = 0
+            for name in watermark:
+                if name:
+                    mask |= self.bit(name)
+
+        return self._masks.setdefault(mask, mask)
+
+    def names(self, mask):
+        """Return the (interned) frozenset of watermark names in a mask."""
+        names = self._sets.get(mask)
+        if names is None:
+            names = frozenset(name for i, name in enumerate(self._names) if
+                              mask & (1 << i))
+            names = self._sets.setdefault(mask, names)
+
+        return names
+
+    def __contains__(self, name):
+        return name in self._bits
+
+    def __len__(self):
+        return len(self._names)
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __repr__(self):
+        return "WatermarkRegistry({0!r})".format(self._names)
+
+
+# The process-wide registry
+registry = WatermarkRegistry()
@@ -0,0 +1,110 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+from threading import Thread
+import pickle
+import unittest
+
+from inhumane import deck
+from inhumane.audience import AudienceVote
+from inhumane.game import Game, RuleError
+
+
+class AudienceVoteTestCase(unittest.TestCase):
+
+    def test_threads(self):
+        """Ensure votes from many threads are all counted once."""
+        vote = AudienceVote("abc", shards=4)
+
+        def voters(start):
+            for voter in range(start, start + 500):
+                vote.vote(voter, "abc"[voter % 3])
+                vote.vote(voter, "a")
+
+        threads = [Thread(target=voters, args=(i * 250,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        # 8 overlapping runs of 500 cover voters 0 to 2249
+        self.assertEqual(vote.turnout, 2250)
+        self.assertEqual(vote.tally(), {"a": 750, "b": 750, "c": 750})
+
+    def test_quorum_threads(self):
+        """Ensure votes from many threads stop exactly at the quorum."""
+        vote = AudienceVote("ab", quorum=1000, shards=4)
+
+        def voters(start):
+            for voter in range(start, start + 500):
+                vote.vote(voter, "ab"[voter % 2])
+
+        threads = [Thread(target=voters, args=(i * 500,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(vote.closed)
+        self.assertEqual(vote.turnout, 1000)
+        self.assertEqual(sum(vote.tally().values()), 1000)
+
+    def test_close(self):
+        """Ensure the quorum and deadline close the vote."""
+        vote = AudienceVote("ab", quorum=2)
+        self.assertTrue(vote.vote(1, "a"))
+        self.assertFalse(vote.vote(1, "b"))
+        self.assertTrue(vote.vote(2, "b"))
+        self.assertTrue(vote.closed)
+        self.assertFalse(vote.vote(3, "b"))
+
+        now = [0]
+        vote = AudienceVote("ab", deadline=10, clock=lambda: now[0])
+        self.assertTrue(vote.vote(1, "a"))
+        now[0] = 10
+        self.assertFalse(vote.vote(2, "a"))
+        self.assertEqual(vote.tally().leader(), ("a", 1))
+
+        with self.assertRaises(KeyError):
+            vote.vote(3, "z")
+
+    def test_pickle(self):
+        """Ensure a pickled vote keeps its voters, counts, and quorum."""
+        vote = AudienceVote("ab", quorum=3, deadline=60)
+        vote.vote("v1", "a")
+        vote.vote("v2", "b")
+
+        copy = pickle.loads(pickle.dumps(vote))
+        self.assertEqual(copy.tally(), {"a": 1, "b": 1})
+        self.assertTrue(copy.has_voted("v1"))
+        self.assertFalse(copy.vote("v2", "a"))
+        self.assertFalse(copy.closed)
+        self.assertTrue(copy.vote("v3", "a"))
+        self.assertTrue(copy.closed)
+
+
+class AudienceGameTestCase(unittest.TestCase):
+
+    def test_round(self):
+        """Ensure audience votes decide the round."""
+        game = Game(name='Audience Test Game', audience=True,
+                    audience_quorum=3, decks=[deck.get_deck(deck.basepacks)],
+                    players=range(3))
+        game.round_start()
+        a, b = [player for player in game.players if player != game.tsar]
+
+        self.assertEqual(game.audience_vote("viewer1", a), (False, 1))
+        with self.assertRaises(RuleError):
+            game.audience_vote("viewer1", b)
+
+        with self.assertRaises(RuleError):
+            game.audience_vote("viewer2", game.tsar)
+
+        game.audience_vote("viewer2", b)
+        self.assertEqual(game.audience_vote("viewer3", b), (True, 3))
+
+        self.assertEqual(game.round_end(), [(b, 2), (a, 1)])
+        self.assertEqual(game.ap[b], 1)
+        self.assertIsNone(game.audiencevote)
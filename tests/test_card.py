@@ -0,0 +1,52 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+from inhumane.card import (BlackCard, WhiteCard, card_key, collation_key,
+                           sort_cards)
+import unittest
+
+
+class CardKeyTestCase(unittest.TestCase):
+
+    def test_equal_content(self):
+        """Ensure cards with the same content are equal and collapse."""
+        a = WhiteCard("Flightless birds.", ["1.1"])
+        b = WhiteCard("Flightless birds.", ["1.2"])
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(len({a, b}), 1)
+        self.assertNotEqual(a.cid, b.cid)
+
+    def test_type_and_counts(self):
+        """Ensure the type and black card counts are part of the key."""
+        white = WhiteCard("What's that smell?")
+        black = BlackCard("What's that smell?")
+        self.assertNotEqual(white, black)
+        self.assertNotEqual(black, BlackCard("What's that smell?",
+                                             drawcount=2, playcount=3))
+
+    def test_key_collision(self):
+        """Ensure cards with colliding keys but different content differ."""
+        a = WhiteCard("Flightless birds.")
+        b = WhiteCard("Vigilante justice.")
+        b.key = a.key
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, b)
+        self.assertEqual(len({a, b}), 2)
+
+    def test_stable(self):
+        """Ensure the key only depends on the card content."""
+        card = BlackCard("What's that smell?", drawcount=0, playcount=1)
+        self.assertEqual(card.key,
+                         card_key("black", "What's that smell?", 0, 1))
+
+
+class CollationTestCase(unittest.TestCase):
+
+    def test_key(self):
+        """Ensure case and markup are ignored when sorting."""
+        self.assertEqual(collation_key("A _____ \\\\ Thing."), "a thing.")
+        cards = [WhiteCard("b"), WhiteCard("A"), WhiteCard("_____ c")]
+        self.assertEqual([card.text for card in sort_cards(cards)],
+                         ["A", "b", "_____ c"])
+        self.assertEqual(sorted(cards), sort_cards(cards))
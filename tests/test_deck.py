@@ -0,0 +1,143 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+from inhumane import deck
+from inhumane.game import Game
+import os.path
+import shutil
+import tempfile
+import unittest
+
+
+TESTPACK = os.path.join(os.path.dirname(__file__), 'TestPack')
+
+
+class DeckDupesTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the test pack, and a copy with other watermarks."""
+        cls.pack = deck.ExternalPack.load(TESTPACK)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'Copy')
+            shutil.copytree(TESTPACK, path)
+            for filename in ('black.txt', 'white.txt'):
+                with open(os.path.join(path, filename)) as f:
+                    data = f.read()
+
+                with open(os.path.join(path, filename), 'w') as f:
+                    f.write(data.replace("\tTEST", "\tCOPY").upper())
+
+            cls.copy = deck.ExternalPack.load(path)
+
+    def test_collapse(self):
+        """Ensure cards repeated across packs are kept once."""
+        d = deck.Deck([self.pack, self.copy])
+        count = len(self.pack.whitecards) + len(self.pack.blackcards)
+
+        self.assertEqual(len(d.whitecards), len(self.pack.whitecards))
+        self.assertEqual(len(d.blackcards), len(self.pack.blackcards))
+        self.assertEqual(d.collapsed, count)
+
+        card = d.whitecards[0]
+        self.assertEqual(card, self.pack.whitecards[0])
+        self.assertEqual(card.watermark, frozenset(["TEST", "COPY"]))
+
+    def test_dupes(self):
+        """Ensure duplicates are kept when asked for."""
+        d = deck.Deck([self.pack, self.copy], dupes=True)
+        self.assertEqual(len(d.whitecards), 2 * len(self.pack.whitecards))
+        self.assertEqual(d.collapsed, 0)
+
+    def test_iterator(self):
+        """Ensure a deck can be built from a one-shot iterable of packs."""
+        d = deck.Deck(pack for pack in [self.pack, self.copy])
+        self.assertEqual(len(d.packs), 2)
+        self.assertEqual(len(d.whitecards), len(self.pack.whitecards))
+        self.assertEqual(d.ident, deck.Deck([self.pack, self.copy]).ident)
+
+    def test_real_dupes(self):
+        """Ensure identical duplicates resolve to distinct rows in a hand."""
+        d = deck.Deck([self.pack, self.pack], dupes=True)
+        card = self.pack.whitecards[0]
+        first, second = d.indices(card)
+        self.assertEqual(d.index(card), first)
+        self.assertEqual(d.card(first), d.card(second))
+
+        game = Game(name='Dupes Test Game', decks=[d])
+        player = game.player_add()
+        game.player_discard(player, None)
+        game.player_deal_raw(player, [second, first])
+
+        # Equal card objects resolve to both copies, not one row twice
+        game.player_discard(player, [card, card])
+
+        hand = game.playercards[player]
+        self.assertNotIn(first, hand)
+        self.assertNotIn(second, hand)
+
+
+class DeckCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pack = deck.ExternalPack.load(TESTPACK)
+        self.now = 0
+        self.cache = deck.DeckCache(maxsize=2, clock=lambda: self.now)
+
+    def test_shared(self):
+        """Ensure the same packs get the same frozen deck."""
+        a = self.cache.get([self.pack])
+        b = self.cache.get([deck.ExternalPack.load(TESTPACK)])
+        self.assertIs(a, b)
+        self.assertTrue(a.frozen)
+        self.assertIsNot(self.cache.get([self.pack], dupes=True), a)
+
+        info = self.cache.info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 2, 2))
+
+        with self.assertRaises(AttributeError):
+            a.dupes = True
+
+        # The row arrays are shared by every game too
+        with self.assertRaises(TypeError):
+            a.whiteindices[0] = a.blackindices[0]
+
+        with self.assertRaises(TypeError):
+            a.ranks[0] = 0
+
+    def test_changed(self):
+        """Ensure decks are rebuilt when their packs change on disk."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'Copy')
+            shutil.copytree(TESTPACK, path)
+            a = self.cache.get([deck.ExternalPack.load(path)])
+
+            white = os.path.join(path, 'white.txt')
+            with open(white, 'a') as f:
+                f.write("A brand new card.\tCOPY\n")
+
+            st = os.stat(white)
+            os.utime(white, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+            # Not noticed until the packs are due to be checked again
+            pack = deck.ExternalPack.load(path)
+            self.assertIs(self.cache.get([pack]), a)
+            self.now = 1
+            b = self.cache.get([pack])
+            self.assertIsNot(a, b)
+            self.assertEqual(len(b.whitecards), len(a.whitecards) + 1)
+            self.assertIs(self.cache.get([pack]), b)
+
+            self.assertEqual(self.cache.invalidate([pack]), 1)
+            self.assertIsNot(self.cache.get([pack]), b)
+
+    def test_eviction(self):
+        """Ensure the least recently used deck is evicted."""
+        a = self.cache.get([self.pack])
+        self.cache.get([self.pack], dupes=True)
+        self.cache.get([self.pack])
+        self.cache.get([self.pack, self.pack])
+
+        self.assertEqual(self.cache.info().evictions, 1)
+        self.assertIs(self.cache.get([self.pack]), a)
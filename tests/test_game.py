@@ -1,6 +1,7 @@
 # Copyright © 2013 Andrew Wilcox. All Rights Reserved.
 
-from inhumane.game import Game, GameError, RuleError
+from inhumane.actions import Pass, Play, Trade
+from inhumane.game import Game, GameConditionError, GameError, RuleError
 from inhumane import deck
 from math import ceil
 import random
@@ -118,3 +119,245 @@ class TradeCardsTestCase(unittest.TestCase):
         """Ensure I can't trade more cards than the deck has remaining."""
         # XXX TODO
         self.assertEqual(True, True)
+
+
+class CardPilesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.deck = deck.get_deck(deck.basepacks)
+        self.game = Game(name='Piles Test Game', decks=[self.deck])
+        self.fox = self.game.player_add("TheWilfox")
+
+    def test_shared_deck(self):
+        """Ensure piles are rows of the shared deck."""
+        self.assertIs(self.game.deck, self.deck)
+        self.assertEqual(sorted(self.game.blackcards),
+                         sorted(self.deck.blackindices))
+        self.assertEqual(len(self.game.whitecards) +
+                         len(self.game.playercards[self.fox]),
+                         len(self.deck.whiteindices))
+
+    def test_sorted_hand(self):
+        """Ensure hands are listed sorted, through deals and plays."""
+        hand = self.game.player_cards(self.fox)
+        self.assertEqual([card.sortkey for card in hand],
+                         sorted(card.sortkey for card in hand))
+
+        self.game.player_discard(self.fox, hand[::2])
+        self.game.player_deal(self.fox)
+        hand = self.game.player_cards(self.fox)
+        self.assertEqual(len(hand), self.game.maxcards)
+        self.assertEqual([card.sortkey for card in hand],
+                         sorted(card.sortkey for card in hand))
+
+    def test_play_card_objects(self):
+        """Ensure cards can be played as card objects."""
+        self.game.round_start()
+        hand = self.game.player_cards(self.fox)
+        count = self.game.blackcard.playcount
+        self.game.player_play(self.fox, hand[:count])
+        self.assertEqual(self.game.player_all_get_play()[self.fox],
+                         [self.game.card(row) for row in
+                          self.game.playerplay[self.fox]])
+        for card in hand[:count]:
+            self.assertNotIn(card, self.game.player_cards(self.fox))
+
+    def test_deal_all(self):
+        """Ensure hands can be topped up and drawn into all at once."""
+        other = self.game.player_add("Missingno")
+        for player in self.game.players:
+            self.assertEqual(len(self.game.playercards[player]),
+                             self.game.maxcards)
+
+        self.game.player_discard(self.fox, None)
+        self.game.player_all_deal()
+        self.assertEqual(len(self.game.playercards[self.fox]),
+                         self.game.maxcards)
+
+        self.game.player_all_deal(2)
+        for player in self.game.players:
+            self.assertEqual(len(self.game.playercards[player]),
+                             self.game.maxcards + 2)
+
+        in_hands = len(self.game.playercards[self.fox]) + len(
+            self.game.playercards[other])
+        self.assertEqual(len(self.game.whitecards) +
+                         len(self.game.discardwhite) + in_hands,
+                         len(self.deck.whiteindices))
+
+
+class RosterGameTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.game = Game(name='Roster Test Game',
+                         decks=[deck.get_deck(deck.basepacks)])
+        self.players = self.game.players_add(range(6))
+
+    def test_bulk_add(self):
+        """Ensure bulk added players get full hands and a tsar."""
+        self.assertEqual(list(self.game.players), self.players)
+        self.assertEqual(self.game.tsar, self.players[1])
+        for player in self.players:
+            self.assertEqual(len(self.game.playercards[player]),
+                             self.game.maxcards)
+
+    def test_rotation_under_removal(self):
+        """Ensure the tsar rotates through every remaining seat in order."""
+        p = self.players
+        self.game.players_remove([p[0], p[3]])
+        self.assertEqual(self.game.tsar, p[1])
+        self.assertEqual(self.game.tsarindex, 0)
+
+        # Removing the tsar passes it to the next remaining seat
+        self.game.players_remove([p[1], p[2]])
+        self.assertEqual(self.game.tsar, p[4])
+
+        self.assertEqual(self.game.game_new_tsar(), p[5])
+        self.assertEqual(self.game.game_new_tsar(), p[4])
+
+        self.game.player_remove(p[5])
+        self.assertTrue(self.game.suspended)
+        self.assertEqual(
+            len(self.game.whitecards) + len(self.game.discardwhite) +
+            len(self.game.playercards[p[4]]),
+            len(self.game.deck.whiteindices))
+
+    def test_supply_counts_new_players(self):
+        """Ensure players being added count against the card supply."""
+        perplayer = self.game.maxcards + self.game.maxdraw
+        room = (len(self.game.deck.whiteindices) // perplayer -
+                len(self.game.players))
+
+        with self.assertRaises(GameConditionError):
+            self.game.players_add(range(room + 1))
+        self.assertEqual(list(self.game.players), self.players)
+
+        self.game.players_add(range(room))
+        with self.assertRaises(GameConditionError):
+            self.game.player_add()
+
+
+class VotingTestCase(unittest.TestCase):
+
+    def test_majority(self):
+        """Ensure a majority is detected and the leaders get AP."""
+        game = Game(name='Voting Test Game', voting=True,
+                    decks=[deck.get_deck(deck.basepacks)],
+                    players=range(4))
+        a, b, c, d = game.players
+        game.round_start()
+        self.assertEqual(game.player_vote(a, b), (False, 0.25))
+        self.assertEqual(game.player_vote(c, d), (False, 0.5))
+        self.assertEqual(game.player_vote(d, b), (True, 0.75))
+        self.assertEqual(game.votes.leader(), (b, 2))
+
+        game.round_end()
+        self.assertEqual(game.ap.leader(), (b, 1))
+        self.assertEqual(game.player_all_get_ap()[-1], (b, 1))
+
+    def test_tie_order(self):
+        """Ensure ties are listed in seat order, however they were reached."""
+        game = Game(name='Tie Test Game', voting=True,
+                    decks=[deck.get_deck(deck.basepacks)],
+                    players=range(4))
+        a, b, c, d = game.players
+        game.ap[d] += 2
+        game.ap[c] += 1
+        game.ap[a] += 1
+        game.ap[d] -= 1
+        game.ap[b] += 1
+        game.ap[b] -= 1
+
+        self.assertEqual(game.player_all_get_ap(),
+                         [(b, 0), (a, 1), (c, 1), (d, 1)])
+
+        game.round_start()
+        game.player_vote(d, c)
+        game.player_vote(c, a)
+        self.assertEqual(game.player_all_get_vote_count(),
+                         [(b, 0), (d, 0), (a, 1), (c, 1)])
+
+    def test_game_end_ties(self):
+        """Ensure tied results are ranked by who first got AP, as they
+        always have been."""
+        game = Game(name='Tie Test Game', decks=[deck.get_deck(deck.basepacks)],
+                    players=range(3))
+        a, b, c = game.players
+        game.ap[c] += 1
+        game.ap[a] += 2
+        game.ap[b] += 1
+        game.ap[c] += 1
+
+        self.assertEqual(game.game_end(), [(c, 2), (a, 2), (b, 1)])
+
+
+class ApplyActionsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.game = Game(name='Batch Test Game', apxchg=(1, 2),
+                         decks=[deck.get_deck(deck.basepacks)],
+                         players=range(4))
+        self.game.round_start()
+        self.others = [player for player in self.game.players if player !=
+                       self.game.tsar]
+
+    def hand(self, player, count):
+        return self.game.playercards[player][0:count]
+
+    def test_batch(self):
+        """Ensure valid actions apply and invalid ones report errors."""
+        a, b, c = self.others
+        count = self.game.blackcard.playcount
+        self.game.ap[c] = 1
+        results = self.game.apply_actions([
+            Play(a, self.hand(a, count)),
+            Play(a, self.hand(a, count)),
+            Pass(self.game.tsar),
+            Pass(b),
+            Trade(c, self.hand(c, 2)),
+            Trade(c, self.hand(c, 2)),
+        ], atomic=False)
+
+        self.assertEqual([result.ok for result in results],
+                         [True, False, False, True, True, False])
+        self.assertIsInstance(results[1].error, RuleError)
+        self.assertIsInstance(results[5].error, RuleError)
+        self.assertEqual(len(self.game.playerplay[a]), count)
+        self.assertEqual(len(self.game.playercards[c]), self.game.maxcards)
+        self.assertEqual(self.game.ap[c], 0)
+
+    def test_atomic(self):
+        """Ensure an atomic batch with an invalid action changes nothing."""
+        a, b, c = self.others
+        count = self.game.blackcard.playcount
+        before = len(self.game.playercards[a])
+        results = self.game.apply_actions([
+            Play(a, self.hand(a, count)),
+            Play(b, self.hand(a, count)),
+        ])
+
+        self.assertFalse(any(result.ok for result in results))
+        self.assertIsInstance(results[1].error, GameError)
+        self.assertNotIn(a, self.game.playerplay)
+        self.assertEqual(len(self.game.playercards[a]), before)
+
+    def test_deal_shortage(self):
+        """Ensure trades fail up front if their cards can't be dealt."""
+        a, b, c = self.others
+        count = self.game.blackcard.playcount
+        self.game.ap[c] = 1
+        self.game.player_discard(c, self.hand(c, 3))
+        self.game.whitecards.clear()
+        del self.game.discardwhite[:]
+        hand = list(self.game.playercards[c])
+
+        batch = [Play(a, self.hand(a, count)), Trade(c, self.hand(c, 2))]
+        results = self.game.apply_actions(batch)
+        self.assertFalse(any(result.ok for result in results))
+        self.assertIsInstance(results[1].error, GameConditionError)
+        self.assertNotIn(a, self.game.playerplay)
+
+        results = self.game.apply_actions(batch, atomic=False)
+        self.assertEqual([result.ok for result in results], [True, False])
+        self.assertEqual(list(self.game.playercards[c]), hand)
+        self.assertEqual(self.game.ap[c], 1)
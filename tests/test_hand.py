@@ -0,0 +1,30 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+import unittest
+
+from inhumane.hand import Hand
+
+
+class HandTestCase(unittest.TestCase):
+
+    def test_order(self):
+        """Ensure rows are kept in rank order."""
+        ranks = [3, 0, 4, 1, 2]
+        hand = Hand(ranks, [0, 2, 4])
+        self.assertEqual(list(hand), [4, 0, 2])
+
+        hand.add(1)
+        hand.add(3)
+        self.assertEqual(list(hand), [1, 3, 4, 0, 2])
+        self.assertEqual(hand[1:3], [3, 4])
+        self.assertEqual(hand.index(0), 3)
+
+        hand.remove(4)
+        hand.difference_update([1, 2])
+        self.assertEqual(list(hand), [3, 0])
+        self.assertNotIn(4, hand)
+        with self.assertRaises(KeyError):
+            hand.remove(4)
+
+        self.assertEqual(list(hand | {2}), [3, 0, 2])
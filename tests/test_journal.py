@@ -0,0 +1,169 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from inhumane import deck, journal
+from inhumane.actions import Play
+from inhumane.game import Game, GameConditionError
+
+
+class JournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "journal")
+        self.game = Game(name='Journal Test Game',
+                         decks=[deck.get_deck(deck.basepacks)],
+                         players=range(4), maxap=None, maxrounds=100,
+                         journal=self.path)
+
+    def tearDown(self):
+        self.game.journal.close()
+        shutil.rmtree(self.dir)
+
+    def play_round(self):
+        game = self.game
+        game.round_start()
+        count = game.blackcard.playcount
+        players = [player for player in game.players if player != game.tsar]
+        game.apply_actions([Play(player, game.player_cards(player)[:count])
+                            for player in players])
+        game.round_end(players[0])
+
+    def test_replay(self):
+        """Ensure replaying a journal rebuilds the game exactly."""
+        self.play_round()
+        self.game.player_add("Latecomer")
+        self.play_round()
+        self.game.player_remove(self.game.players[1])
+        self.play_round()
+
+        self.game.journal.flush()
+        self.assertEqual(journal.replay(self.path).snapshot(),
+                         self.game.snapshot())
+
+    def test_single(self):
+        """Ensure single moves are recorded and replayed."""
+        game = self.game
+        game.round_start()
+        count = game.blackcard.playcount
+        for player in game.players:
+            if player != game.tsar:
+                game.player_play(player, game.player_cards(player)[:count])
+
+        game.journal.flush()
+        self.assertEqual(journal.replay(self.path).snapshot(),
+                         game.snapshot())
+
+    def test_index(self):
+        """Ensure replaying stops after the given number of calls."""
+        before = self.game.snapshot()
+        self.play_round()
+        self.game.journal.flush()
+
+        # round_start, apply_actions, round_end
+        self.assertEqual(len(journal.read(self.path)[1]), 3)
+        self.assertEqual(journal.replay(self.path, 0).snapshot(), before)
+        self.assertTrue(journal.replay(self.path, 1).inround)
+
+    def test_nested(self):
+        """Ensure calls made by other methods aren't recorded."""
+        self.game.journal.flush()
+        self.assertEqual(journal.read(self.path)[1], [])
+
+        self.game.player_all_deal()
+        self.game.game_end()
+        self.game.journal.flush()
+        self.assertEqual([journal.methods[opcode] for opcode, payload in
+                          journal.read(self.path)[1]],
+                         ["player_all_deal", "game_end"])
+
+    def test_compact(self):
+        """Ensure compacting folds the journal into a snapshot."""
+        for i in range(3):
+            self.play_round()
+
+        self.game.journal.compact()
+        snapshot, records = journal.read(self.path)
+        self.assertEqual(records, [])
+        self.assertEqual(snapshot, self.game.snapshot())
+
+        self.play_round()
+        self.game.journal.flush()
+        self.assertEqual(journal.replay(self.path).snapshot(),
+                         self.game.snapshot())
+
+    def test_reattach(self):
+        """Ensure reattaching a journal keeps the calls before it."""
+        self.play_round()
+        self.game.journal.flush()
+        before = self.game.snapshot()
+        count = len(journal.read(self.path)[1])
+
+        log = self.game.journal
+        log.close()
+        self.game = Game.restore(before)
+        log.attach(self.game)
+        self.game.player_add("Latecomer")
+        self.play_round()
+        self.game.journal.flush()
+
+        # The old calls, the new snapshot, then the new calls
+        records = journal.read(self.path)[1]
+        self.assertEqual(records[count][0], 0)
+        self.assertEqual(journal.replay(self.path, count).snapshot(), before)
+        self.assertEqual(journal.replay(self.path).snapshot(),
+                         self.game.snapshot())
+
+    def test_arguments_captured(self):
+        """Ensure changing arguments after a call doesn't change its record."""
+        player = self.game.players[0]
+        cards = list(self.game.playercards[player])[:3]
+        self.game.player_discard(player, cards)
+        cards.clear()
+
+        self.game.journal.flush()
+        self.assertEqual(journal.replay(self.path).snapshot(),
+                         self.game.snapshot())
+
+    def test_failed(self):
+        """Ensure calls that fail part way are replayed the same way."""
+        player = self.game.players[0]
+        self.game.player_discard(player, None)
+        with self.assertRaises(GameConditionError):
+            self.game.player_deal(player, 10 ** 6)
+
+        # The discards went back into the draw pile before it failed
+        self.assertEqual(len(self.game.discardwhite), 0)
+
+        self.game.journal.flush()
+        opcode, payload = journal.read(self.path)[1][-1]
+        self.assertTrue(opcode & journal.FAILED)
+        self.assertEqual(journal.replay(self.path).snapshot(),
+                         self.game.snapshot())
+
+    @unittest.skipUnless(os.name == "posix", "needs POSIX permissions")
+    def test_private(self):
+        """Ensure journals (which hold the RNG state) are private."""
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        self.game.journal.compact()
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_truncated(self):
+        """Ensure a record cut short by a crash is ignored."""
+        self.play_round()
+        self.game.journal.flush()
+        with open(self.path, "rb+") as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+
+        self.assertEqual(len(journal.read(self.path)[1]), 2)
+
+    def test_system_rng(self):
+        """Ensure games that can't be replayed can't be journaled."""
+        with self.assertRaises(ValueError):
+            Game(name='Unjournaled Game', rng="system",
+                 journal=os.path.join(self.dir, "system"))
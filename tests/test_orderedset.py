@@ -0,0 +1,87 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+import pickle
+import random
+import unittest
+
+from inhumane.contrib.orderedset import OrderedSet
+
+
+class OrderedSetTestCase(unittest.TestCase):
+
+    def test_order(self):
+        """Ensure insertion order is kept through removals."""
+        s = OrderedSet("abracadabra")
+        self.assertEqual(list(s), list("abrcd"))
+        s.remove("r")
+        s.add("r")
+        s.discard("a")
+        self.assertEqual(list(s), list("bcdr"))
+        self.assertEqual(list(reversed(s)), list("rdcb"))
+        self.assertEqual(s.pop(), "r")
+        self.assertEqual(s.pop(last=False), "b")
+
+    def test_positions(self):
+        """Ensure indexing, index() and slicing skip removed keys."""
+        s = OrderedSet(range(10))
+        for i in (0, 3, 4, 9):
+            s.remove(i)
+
+        self.assertEqual(s[0], 1)
+        self.assertEqual(s[-1], 8)
+        self.assertEqual(s[1:4], [2, 5, 6])
+        self.assertEqual(s.index(5), 2)
+        with self.assertRaises(IndexError):
+            s[6]
+
+        with self.assertRaises(KeyError):
+            s.index(3)
+
+        del s[0]
+        self.assertEqual(s[0], 2)
+
+        s[0] = 20
+        self.assertEqual(list(s), [20, 5, 6, 7, 8])
+
+    def test_many_removals(self):
+        """Ensure many removals keep the set consistent."""
+        s = OrderedSet(range(100))
+        for i in range(0, 100, 3):
+            s.discard(i)
+            self.assertEqual(s[0], next(iter(s)))
+
+        self.assertEqual(list(s), [i for i in range(100) if i % 3])
+        self.assertEqual([s.index(k) for k in s], list(range(len(s))))
+
+    def test_interleaved(self):
+        """Ensure removals between positional accesses don't compact."""
+        s = OrderedSet(range(1000))
+        model = list(range(1000))
+        rng = random.Random(0)
+        for _ in range(200):
+            key = rng.choice(model)
+            s.remove(key)
+            model.remove(key)
+
+            i = rng.randrange(len(model))
+            self.assertEqual(s[i], model[i])
+            self.assertEqual(s[-i - 1], model[-i - 1])
+            self.assertEqual(s.index(model[i]), i)
+            self.assertEqual(s[i:i + 5], model[i:i + 5])
+            self.assertEqual(s[i::7], model[i::7])
+
+            self.assertEqual(len(s.holes), len(s.keylist) - len(model))
+
+        # Too few holes to be worth compacting
+        self.assertGreater(len(s.holes), 0)
+        self.assertEqual(list(s), model)
+
+    def test_set_ops(self):
+        """Ensure the MutableSet interface still works."""
+        s = OrderedSet("abc")
+        self.assertEqual(s | OrderedSet("cd"), OrderedSet("abcd"))
+        self.assertEqual(s & {"b", "c", "x"}, {"b", "c"})
+        s -= {"a"}
+        self.assertEqual(list(s), ["b", "c"])
+        self.assertEqual(pickle.loads(pickle.dumps(s)), s)
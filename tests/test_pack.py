@@ -0,0 +1,243 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+from inhumane import deck
+import asyncio
+import os.path
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+
+TESTPACK = os.path.join(os.path.dirname(__file__), 'TestPack')
+
+
+class LazyPackTestCase(unittest.TestCase):
+
+    def test_lazy_load(self):
+        """Ensure lazy packs only parse their cards on first use."""
+        pack = deck.ExternalPack.load(TESTPACK, lazy=True)
+        self.assertEqual(pack.name, "Stuff and nonsense")
+        self.assertFalse(pack.loaded)
+
+        self.assertGreater(len(pack.whitecards), 0)
+        self.assertTrue(pack.loaded)
+        self.assertEqual(pack.maxplay, 4)
+
+    def test_registry(self):
+        """Ensure the registry is discovered on first use, and its packs'
+        cards are only kept in decks built from them."""
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copytree(TESTPACK, os.path.join(tmp, 'TestPack'))
+            self._test_registry(tmp)
+
+    def _test_registry(self, path):
+        registry = deck.PackRegistry(deck.ExternalPack, path)
+        self.assertIsNone(registry._packs)
+
+        self.assertEqual(registry.names(), ["Stuff and nonsense"])
+        self.assertIs(registry.get("Stuff and nonsense"), registry[0])
+        self.assertFalse(registry[0].loaded)
+
+        a_deck = deck.Deck(registry)
+        self.assertFalse(registry[0].loaded)
+        self.assertEqual(len(a_deck.blackcards), len(registry[0].blackcards))
+
+
+class BundleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.packdir = os.path.join(self.tmp.name, 'TestPack')
+        self.bundledir = os.path.join(self.tmp.name, 'bundles')
+        shutil.copytree(TESTPACK, self.packdir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self):
+        pack = deck.ExternalPack(self.packdir)
+        pack.bundle_dir = self.bundledir
+        pack.load_all()
+        return pack
+
+    def test_roundtrip(self):
+        """Ensure a bundled pack loads the same cards as the text files."""
+        plain = deck.ExternalPack.load(TESTPACK)
+
+        self.load()
+        self.assertEqual(len(os.listdir(self.bundledir)), 1)
+
+        bundled = self.load()
+        self.assertEqual([repr(c) for c in bundled.blackcards],
+                         [repr(c) for c in plain.blackcards])
+        self.assertEqual([repr(c) for c in bundled.whitecards],
+                         [repr(c) for c in plain.whitecards])
+        self.assertEqual(bundled.maxplay, plain.maxplay)
+        self.assertEqual(bundled.maxdraw, plain.maxdraw)
+
+    def test_rebuild(self):
+        """Ensure a bundle is rebuilt when the pack changes."""
+        pack = self.load()
+        count = len(pack.whitecards)
+
+        path = os.path.join(self.packdir, 'white.txt')
+        with open(path, 'a') as f:
+            f.write("A brand new card.\tTEST\n")
+
+        pack = self.load()
+        self.assertEqual(len(pack.whitecards), count + 1)
+
+
+class ParallelDiscoveryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name in ('PackA', 'PackB'):
+            shutil.copytree(TESTPACK, os.path.join(self.tmp.name, name))
+
+        # A broken pack
+        os.mkdir(os.path.join(self.tmp.name, 'Broken'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, result):
+        self.assertEqual(len(result.packs), 2)
+        self.assertEqual(list(result.errors),
+                         [os.path.join(self.tmp.name, 'Broken')])
+        self.assertTrue(all(pack.loaded for pack in result.packs))
+
+    def test_threads(self):
+        """Ensure packs load in parallel and errors are collected."""
+        result = deck.ExternalPack.discover_parallel(self.tmp.name, workers=2)
+        self.check(result)
+
+    def test_processes(self):
+        """Ensure packs can be loaded in a process pool."""
+        result = deck.ExternalPack.discover_parallel(self.tmp.name, workers=2,
+                                                     processes=True)
+        self.check(result)
+
+    def test_async(self):
+        """Ensure packs can be loaded from a coroutine."""
+        loop = asyncio.new_event_loop()
+        try:
+            result = loop.run_until_complete(
+                deck.ExternalPack.discover_async(self.tmp.name, workers=2))
+        finally:
+            loop.close()
+
+        self.check(result)
+
+    def test_async_cancelled(self):
+        """Ensure a cancelled load cancels discovery, not just the pack."""
+        class CancelledPack(deck.ExternalPack):
+            @classmethod
+            def load(cls, path, lazy=False):
+                raise asyncio.CancelledError
+
+        loop = asyncio.new_event_loop()
+        try:
+            with self.assertRaises(asyncio.CancelledError):
+                loop.run_until_complete(
+                    CancelledPack.discover_async(self.tmp.name, workers=2))
+        finally:
+            loop.close()
+
+
+class MalformedPackTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.packdir = os.path.join(self.tmp.name, 'TestPack')
+        shutil.copytree(TESTPACK, self.packdir)
+
+        with open(os.path.join(self.packdir, 'black.txt'), 'a') as f:
+            f.write("A card without a play count.\t0\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_strict(self):
+        """Ensure a malformed record is reported with its line number."""
+        with self.assertRaises(deck.PackFormatError) as cm:
+            deck.ExternalPack.load(self.packdir)
+
+        self.assertEqual(cm.exception.pack, "Stuff and nonsense")
+        self.assertEqual(cm.exception.filename, "black.txt")
+        self.assertEqual(cm.exception.lineno, 126)
+
+    def test_skip(self):
+        """Ensure malformed records can be skipped."""
+        pack = deck.ExternalPack(self.packdir)
+        pack.strict = False
+        pack.load_all()
+
+        self.assertEqual(len(pack.blackcards), 125)
+        self.assertEqual([e.lineno for e in pack.errors], [126])
+
+    def test_not_bundled(self):
+        """Ensure skipped records aren't hidden by a bundle."""
+        bundledir = os.path.join(self.tmp.name, 'bundles')
+        for i in range(2):
+            pack = deck.ExternalPack(self.packdir)
+            pack.bundle_dir = bundledir
+            pack.strict = False
+            pack.load_all()
+            self.assertEqual([e.lineno for e in pack.errors], [126])
+
+        pack = deck.ExternalPack(self.packdir)
+        pack.bundle_dir = bundledir
+        with self.assertRaises(deck.PackFormatError):
+            pack.load_all()
+
+
+class ArchivePackTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.archive = os.path.join(self.tmp.name, 'packs.zip')
+
+        with zipfile.ZipFile(self.archive, 'w') as zf:
+            for name in ('PackA', 'PackB'):
+                for filename in os.listdir(TESTPACK):
+                    zf.write(os.path.join(TESTPACK, filename),
+                             '{0}/{1}'.format(name, filename))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_discover(self):
+        """Ensure every pack in an archive is discovered."""
+        plain = deck.ExternalPack.load(TESTPACK)
+        packs = deck.ArchivePack.discover(self.archive)
+
+        self.assertEqual([p.member for p in packs], ['PackA', 'PackB'])
+        self.assertIs(packs[0].archive, packs[1].archive)
+        for pack in packs:
+            self.assertEqual([repr(c) for c in pack.whitecards],
+                             [repr(c) for c in plain.whitecards])
+
+    def test_load(self):
+        """Ensure a single pack can be loaded from an archive."""
+        pack = deck.ArchivePack.load(self.archive + '!/PackB')
+        self.assertEqual(pack.name, "Stuff and nonsense")
+        self.assertEqual(len(pack.blackcards), 125)
+
+    def test_replaced(self):
+        """Ensure packs move to a replaced archive, and the old is closed."""
+        pack = deck.ArchivePack(self.archive + '!/PackA')
+        old = pack.archive
+        self.assertFalse(pack._exists('/extra.txt'))
+
+        with zipfile.ZipFile(self.archive, 'a') as zf:
+            zf.writestr('PackA/extra.txt', 'extra')
+
+        st = os.stat(self.archive)
+        os.utime(self.archive, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+        self.assertTrue(pack._exists('/extra.txt'))
+        self.assertIsNot(pack.archive, old)
+        self.assertIsNone(old.zipfile.fp)
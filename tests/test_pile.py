@@ -0,0 +1,54 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+from array import array
+from collections import Counter
+from random import Random
+import unittest
+
+from inhumane.pile import DrawPile
+
+
+class DrawPileTestCase(unittest.TestCase):
+
+    def test_draws_every_row(self):
+        """Ensure every row is drawn exactly once."""
+        rows = array("H", range(100))
+        pile = DrawPile(rows, Random(1))
+        drawn = [pile.pop() for i in range(100)]
+        self.assertEqual(sorted(drawn), list(rows))
+        self.assertEqual(len(pile), 0)
+        self.assertEqual(pile.typecode, "H")
+
+        with self.assertRaises(IndexError):
+            pile.pop()
+
+    def test_source_unchanged(self):
+        """Ensure the rows the pile was created from aren't modified."""
+        rows = array("I", range(10))
+        pile = DrawPile(rows, Random(1))
+        pile.pop()
+        self.assertEqual(list(rows), list(range(10)))
+
+    def test_uniform(self):
+        """Ensure the first card drawn is roughly uniform."""
+        rng = Random(1)
+        counts = Counter(DrawPile(range(4), rng).pop() for i in range(4000))
+        for row in range(4):
+            self.assertAlmostEqual(counts[row], 1000, delta=150)
+
+    def test_refill(self):
+        """Ensure added rows can be drawn."""
+        pile = DrawPile((), Random(1))
+        pile.extend([5, 6])
+        self.assertEqual({pile.pop(), pile.pop()}, {5, 6})
+
+    def test_take(self):
+        """Ensure many rows can be drawn at once."""
+        pile = DrawPile(range(10), Random(1))
+        drawn = pile.take(4)
+        self.assertEqual(len(drawn), 4)
+        self.assertEqual(sorted(list(drawn) + list(pile)), list(range(10)))
+
+        with self.assertRaises(IndexError):
+            pile.take(7)
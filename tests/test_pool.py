@@ -0,0 +1,149 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+import weakref
+
+from inhumane import deck
+from inhumane.game import Game
+from inhumane.journal import replay
+from inhumane.pool import (FileStore, GamePool, SqliteStore,
+                           estimate_size)
+
+
+class GamePoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.deck = deck.get_deck(deck.basepacks)
+        self.now = 0
+        self.pool = GamePool(FileStore(os.path.join(self.dir, "games")),
+                             idle=60, interval=10, clock=lambda: self.now)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def new_game(self, **kwargs):
+        return Game(name='Pool Test Game', decks=[self.deck],
+                    players=range(3), **kwargs)
+
+    def test_idle(self):
+        """Ensure idle games hibernate, and come back when used."""
+        game = self.new_game()
+        handle = self.pool.add(game)
+        other = self.pool.add(self.new_game())
+        handle.round_start()
+        black = game.blackrow
+
+        self.now = 50
+        other.round_start()
+        self.now = 100
+        self.pool.sweep()
+        self.assertEqual(self.pool.info()[:2], (1, 1))
+
+        # Used through the handle, as if it never left
+        self.assertTrue(handle.inround)
+        self.assertEqual(handle.blackrow, black)
+        self.assertIsNot(handle.game, game)
+
+        info = self.pool.info()
+        self.assertEqual((info.resident, info.hibernated), (2, 0))
+        self.assertEqual((info.hibernations, info.rehydrations), (1, 1))
+        self.assertGreater(info.latency, 0)
+
+    def test_idle_used(self):
+        """Ensure an idle game being used isn't hibernated by the sweep."""
+        handle = self.pool.add(self.new_game())
+        self.now = 100
+        handle.round_start()
+
+        info = self.pool.info()
+        self.assertEqual((info.resident, info.hibernated), (1, 0))
+        self.assertEqual((info.hibernations, info.rehydrations), (0, 0))
+
+    def test_save_failed(self):
+        """Ensure a game stays resident if it can't be saved."""
+        handle = self.pool.add(self.new_game())
+        game = handle.game
+
+        def save(gid, data):
+            raise OSError("No space left on device")
+
+        self.pool.store.save = save
+        with self.assertRaises(OSError):
+            self.pool.hibernate(handle.gid)
+
+        self.assertIs(handle.game, game)
+        self.assertEqual(self.pool.info()[:2], (1, 0))
+        handle.round_start()
+        self.assertTrue(game.inround)
+
+    def test_freed(self):
+        """Ensure hibernated games are freed at once, not by the garbage
+        collector."""
+        handle = self.pool.add(self.new_game())
+        handle.round_start()
+        ref = weakref.ref(handle.game)
+
+        gc.disable()
+        try:
+            self.pool.hibernate(handle.gid)
+            self.assertIsNone(ref())
+        finally:
+            gc.enable()
+
+    def test_budget(self):
+        """Ensure the least recently used games hibernate to stay in the
+        budget."""
+        games = [self.new_game() for i in range(3)]
+        self.pool.budget = estimate_size(games[0]) * 2 + 1
+        a, b, c = [self.pool.add(game) for game in games]
+        self.assertEqual(self.pool.info()[:2], (2, 1))
+
+        # a was evicted, so using it evicts b
+        a.round_start()
+        self.assertEqual(list(self.pool._resident), [c.gid, a.gid])
+        self.assertEqual(len(self.pool), 3)
+
+    def test_store(self):
+        """Ensure a new pool finds the games hibernating in its store."""
+        store = SqliteStore(os.path.join(self.dir, "games.db"))
+        pool = GamePool(store)
+        handle = pool.add(self.new_game())
+        players = list(handle.players)
+        pool.hibernate_all()
+        store.close()
+
+        store = SqliteStore(os.path.join(self.dir, "games.db"))
+        pool = GamePool(store)
+        self.assertEqual(pool.info()[:2], (0, 1))
+        self.assertEqual(list(pool[handle.gid].players), players)
+        store.close()
+
+    def test_journal(self):
+        """Ensure a journaled game carries on journaling."""
+        path = os.path.join(self.dir, "journal")
+        handle = self.pool.add(self.new_game(journal=path))
+        self.pool.hibernate(handle.gid)
+
+        handle.round_start()
+        handle.journal.flush()
+        self.assertEqual(replay(path).snapshot(), handle.snapshot())
+        handle.journal.close()
+
+    def test_remove(self):
+        """Ensure a removed game is gone from the store, even if it was
+        restored since it hibernated."""
+        path = os.path.join(self.dir, "journal")
+        handle = self.pool.add(self.new_game(journal=path))
+        self.pool.hibernate(handle.gid)
+        game = self.pool.get(handle.gid)
+        self.pool.remove(handle.gid)
+
+        self.assertIsNone(game.journal)
+        self.assertNotIn(handle.gid, self.pool)
+        self.assertNotIn(handle.gid, GamePool(self.pool.store))
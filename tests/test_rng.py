@@ -0,0 +1,67 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+import pickle
+import unittest
+
+from inhumane import deck
+from inhumane.game import Game
+from inhumane.rng import StreamRandom, get_rng
+
+
+class StreamRandomTestCase(unittest.TestCase):
+
+    def test_seeded(self):
+        """Ensure the same seed gives the same numbers."""
+        a = StreamRandom(1234)
+        b = StreamRandom(1234)
+        self.assertEqual([a.randrange(5000) for i in range(2000)],
+                         [b.randrange(5000) for i in range(2000)])
+        self.assertNotEqual(StreamRandom(1).random(),
+                            StreamRandom(2).random())
+
+    def test_state(self):
+        """Ensure the state can be saved and restored."""
+        a = StreamRandom()
+        a.getrandbits(17)
+        state = a.getstate()
+        first = [a.random() for i in range(1000)]
+        a.setstate(state)
+        self.assertEqual([a.random() for i in range(1000)], first)
+
+        b = pickle.loads(pickle.dumps(a))
+        self.assertEqual(a.randbytes(5000), b.randbytes(5000))
+
+    def test_range(self):
+        """Ensure numbers are in range."""
+        a = StreamRandom(1)
+        for i in range(1000):
+            self.assertTrue(0.0 <= a.random() < 1.0)
+            self.assertLess(a.getrandbits(3), 8)
+
+    def test_strategies(self):
+        """Ensure strategies are checked."""
+        self.assertEqual(get_rng("seeded", 5).seedvalue, 5)
+        self.assertIsNotNone(get_rng("seeded").seedvalue)
+        with self.assertRaises(ValueError):
+            get_rng("secure", 5)
+
+        with self.assertRaises(ValueError):
+            get_rng("mersenne")
+
+
+class SeededGameTestCase(unittest.TestCase):
+
+    def test_replay(self):
+        """Ensure a seeded game deals the same cards again."""
+        decks = [deck.get_deck(deck.basepacks)]
+
+        def hands(seed):
+            game = Game(name='Seeded Test Game', decks=decks, rng="seeded",
+                        seed=seed, players=["a", "b", "c"])
+            game.round_start()
+            return game.seed, [game.player_cards(player) for player in
+                               game.players]
+
+        seed, first = hands(None)
+        self.assertEqual(hands(seed), (seed, first))
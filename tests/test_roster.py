@@ -0,0 +1,36 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+import unittest
+
+from inhumane.roster import Roster
+
+
+class RosterTestCase(unittest.TestCase):
+
+    def test_ring(self):
+        """Ensure seats are linked in a ring through removals."""
+        r = Roster("abcde")
+        self.assertEqual(r.successor("e"), "a")
+        self.assertEqual(r.predecessor("a"), "e")
+
+        r.remove("c")
+        self.assertEqual(r.successor("b"), "d")
+        r.remove("a")
+        self.assertEqual(r.successor("e"), "b")
+        self.assertEqual(r.seat(-1), "e")
+        self.assertEqual(r.seat(3), "b")
+
+        r.add("f")
+        self.assertEqual(r.successor("e"), "f")
+        self.assertEqual(r.successor("f"), "b")
+
+        r[0] = "x"
+        self.assertEqual(r.successor("f"), "x")
+        self.assertEqual(r.successor("x"), "d")
+
+        for player in list(r):
+            r.remove(player)
+
+        with self.assertRaises(IndexError):
+            r.seat(0)
@@ -0,0 +1,69 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+import pickle
+import unittest
+
+from collections import Counter
+
+from inhumane.scoreboard import Scoreboard
+
+
+class ScoreboardTestCase(unittest.TestCase):
+
+    def test_leader(self):
+        """Ensure the leader follows count changes."""
+        s = Scoreboard()
+        self.assertEqual(s.maxcount, 0)
+        self.assertIsNone(s.leader())
+
+        s["a"] += 1
+        s["b"] += 2
+        self.assertEqual(s.leader(), ("b", 2))
+        s["a"] += 2
+        self.assertEqual(s.leader(), ("a", 3))
+        s["b"] += 1
+        self.assertEqual(s.leaders(), ["a", "b"])
+
+        del s["a"]
+        self.assertEqual(s.leader(), ("b", 3))
+        s.pop("b")
+        self.assertEqual(s.maxcount, 0)
+
+    def test_order(self):
+        """Ensure top and bottom match a full sort."""
+        s = Scoreboard("abracadabra")
+        s.update({"z": 4})
+        s.subtract("aa")
+        expected = sorted(dict(s).items(), key=lambda i: -i[1])
+        self.assertEqual([c for k, c in s.top()], [c for k, c in expected])
+        self.assertEqual(s.most_common(2), list(s.top(2)))
+        self.assertEqual(sorted(s.top()), sorted(dict(s).items()))
+        self.assertEqual([c for k, c in s.bottom()],
+                         sorted(c for k, c in expected))
+
+        s.clear()
+        self.assertEqual(list(s.top()), [])
+
+    def test_ties(self):
+        """Ensure ties are ranked as Counter.most_common ranks them."""
+        s = Scoreboard()
+        c = Counter()
+        for board in (s, c):
+            board["a"] += 1
+            board["b"] += 2
+            board["c"] += 1
+            board["b"] -= 1
+            board["d"] += 2
+            board["a"] += 1
+            del board["c"]
+            board["c"] += 2
+
+        self.assertEqual(s.most_common(), c.most_common())
+        self.assertEqual(s.leader(), c.most_common(1)[0])
+        self.assertEqual(s.leaders(), ["a", "d", "c"])
+
+    def test_pickle(self):
+        """Ensure a pickled board keeps its leaderboard."""
+        s = pickle.loads(pickle.dumps(Scoreboard(x=3, y=5)))
+        self.assertEqual(s.leader(), ("y", 5))
@@ -0,0 +1,83 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+import pickle
+import unittest
+
+from inhumane import deck
+from inhumane.game import Game
+
+
+class SnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.deck = deck.get_deck(deck.basepacks)
+        self.game = Game(name='Snapshot Test Game', decks=[self.deck],
+                         rng="seeded", voting=True, players=range(4))
+        self.game.round_start()
+        for player in self.game.players:
+            if player == self.game.tsar:
+                continue
+
+            hand = self.game.player_cards(player)
+            self.game.player_play(player,
+                                  hand[:self.game.blackcard.playcount])
+
+        # A player who leaves is still remembered
+        self.game.player_remove(self.game.players[3])
+
+    def assertSameGame(self, game, other):
+        self.assertIs(other.deck, game.deck)
+        for name, value in vars(game).items():
+            if name in ("rng", "deck", "blackcards", "whitecards"):
+                continue
+
+            self.assertEqual(getattr(other, name), value, name)
+
+        self.assertEqual(list(other.blackcards.rows),
+                         list(game.blackcards.rows))
+        self.assertEqual(list(other.whitecards.rows),
+                         list(game.whitecards.rows))
+        self.assertEqual(list(other.ap.top()), list(game.ap.top()))
+        self.assertEqual(other.tsarindex, game.tsarindex)
+
+    def test_round_trip(self):
+        """Ensure every field survives a snapshot."""
+        a, b, c = self.game.players
+        self.game.player_vote(a, b)
+        self.game.player_vote(b, a)
+        self.game.ap[c] = 3
+
+        other = Game.restore(self.game.snapshot())
+        self.assertSameGame(self.game, other)
+        self.assertEqual(other.voters, {a: b, b: a})
+
+        # Both carry on the same way from here
+        self.assertEqual(other.round_end(), self.game.round_end())
+        other.round_start()
+        self.game.round_start()
+        self.assertSameGame(self.game, other)
+
+    def test_no_tsar(self):
+        """Ensure a game playing without a tsar can be snapshotted."""
+        game = Game(name='Lonely Test Game', decks=[self.deck],
+                    players=range(1))
+        game.round_start()
+        self.assertIsNone(game.tsar)
+
+        self.assertSameGame(game, Game.restore(game.snapshot()))
+
+    def test_compact(self):
+        """Ensure snapshots don't carry the cards."""
+        self.assertLess(len(self.game.snapshot()) * 10,
+                        len(pickle.dumps(self.game)))
+
+    def test_deck_mismatch(self):
+        """Ensure restoring needs the right deck."""
+        data = self.game.snapshot()
+        other = deck.Deck(deck.basepacks[:1])
+        with self.assertRaises(ValueError):
+            Game.restore(data, decks=[other])
+
+        with self.assertRaises(ValueError):
+            Game.restore(b"junk" + data)
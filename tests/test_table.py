@@ -0,0 +1,50 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+from inhumane.card import BlackCard, WhiteCard
+from inhumane.table import BLACK, WHITE, CardTable, CardView
+import pickle
+import unittest
+
+
+class CardTableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.table = CardTable()
+        self.white = self.table.append_card(WhiteCard("Man meat.", "1.1"))
+        self.black = self.table.append_card(
+            BlackCard("What's that smell?", "1.1", 0, 1))
+        self.table.finish()
+
+    def test_card(self):
+        """Ensure rows come back as equal, cached card objects."""
+        card = self.table.card(self.black)
+        self.assertEqual(card, BlackCard("What's that smell?", (), 0, 1))
+        self.assertEqual(card.watermark, frozenset(["1.1"]))
+        self.assertIs(card, self.table.card(self.black))
+
+    def test_find(self):
+        """Ensure rows can be found by content key."""
+        self.assertEqual(self.table.find(WhiteCard("Man meat.").key),
+                         self.white)
+        self.assertIsNone(self.table.find(WhiteCard("Woman meat.").key))
+
+    def test_view(self):
+        """Ensure views only hold cards of their kind."""
+        view = CardView(self.table, [self.white], WHITE)
+        self.assertEqual(list(view), [WhiteCard("Man meat.")])
+        self.assertIn(WhiteCard("Man meat."), view)
+        self.assertNotIn(self.table.card(self.black), view)
+
+        # A card whose key collides with one in the view isn't in it
+        card = WhiteCard("Woman meat.")
+        card.key = self.table.keys[self.white]
+        self.assertNotIn(card, view)
+
+    def test_pickle(self):
+        """Ensure tables survive pickling."""
+        copy = pickle.loads(pickle.dumps(self.table))
+        self.assertEqual(copy.card(self.white), self.table.card(self.white))
+        self.assertEqual(copy.card(self.white).watermark,
+                         frozenset(["1.1"]))
+        self.assertEqual(copy.kinds[self.black], BLACK)
@@ -0,0 +1,38 @@
+# Copyright © 2013-2015 Elizabeth Myers. All Rights reserved.
+# Licensed according to the terms specified in LICENSE.
+
+from inhumane.card import WhiteCard
+from inhumane.watermark import WatermarkRegistry, registry
+import pickle
+import unittest
+
+
+class WatermarkTestCase(unittest.TestCase):
+
+    def test_masks(self):
+        """Ensure names map to bits and back."""
+        reg = WatermarkRegistry()
+        self.assertEqual(reg.mask("1.1"), 1)
+        self.assertEqual(reg.mask(["1.2", "1.1"]), 3)
+        self.assertEqual(reg.mask(""), 0)
+        self.assertEqual(reg.names(3), frozenset(["1.1", "1.2"]))
+        self.assertIs(reg.names(3), reg.names(reg.mask(["1.1", "1.2"])))
+
+        self.assertEqual(reg.lookup("1.2"), 2)
+        self.assertEqual(reg.lookup("UK"), 0)
+        self.assertEqual(len(reg), 2)
+
+    def test_card(self):
+        """Ensure a watermark string is one watermark, not its letters."""
+        card = WhiteCard("Flightless birds.", "1.1")
+        self.assertEqual(card.watermark, frozenset(["1.1"]))
+        self.assertTrue(card.has_watermark("1.1"))
+        self.assertFalse(card.has_watermark("1"))
+        self.assertNotIn("1", registry)
+        self.assertEqual(card.wmask, registry.mask("1.1"))
+
+    def test_pickle(self):
+        """Ensure watermarks survive pickling by name."""
+        card = WhiteCard("Flightless birds.", ["1.1", "UK"])
+        copy = pickle.loads(pickle.dumps(card))
+        self.assertEqual(copy.watermark, card.watermark)
@@ -0,0 +1,438 @@
+#!/usr/bin/python3
+# bench.py - crude benchmarks for the hot paths of inhumane
+# Copyright © 2015 Elizabeth Myers. All rights reserved.
+# License terms can be found in LICENSE.
+#
+# Usage: python3 util/bench.py [benchmark...]
+# Run from the top of the source tree.
+
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from inhumane import card, deck, game, pile, rng
+from inhumane.contrib.orderedset import OrderedSet
+
+
+def timed(func, repeat=5):
+    """Return the best time of func() over repeat runs, in seconds."""
+    best = None
+    for i in range(repeat):
+        start = default_timer()
+        func()
+        elapsed = default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def load_builtin(bundle_dir=None):
+    packs = deck.BuiltinPack.discover("packs", lazy=True)
+    for pack in packs:
+        pack.bundle_dir = bundle_dir
+        pack.load_cards()
+
+    return packs
+
+
+def bench_packs():
+    """Load all the builtin packs from text and from bundles."""
+    print("text:    {0:.1f}ms".format(timed(load_builtin) * 1000))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        load_builtin(tmp)
+        print("bundled: {0:.1f}ms".format(
+            timed(lambda: load_builtin(tmp)) * 1000))
+
+
+def bench_cards():
+    """Construct every builtin card, and measure the memory used per card."""
+    packs = load_builtin()
+    records = list()
+    for pack in packs:
+        records.extend(pack._black_records())
+        records.extend(pack._white_records())
+
+    def build():
+        cards = list()
+        for record in records:
+            if len(record) == 4:
+                cards.append(card.BlackCard(record[0], record[3], record[1],
+                                            record[2]))
+            else:
+                cards.append(card.WhiteCard(*record))
+
+        return cards
+
+    elapsed = timed(build)
+    print("{0} cards: {1:.1f}ms ({2:.2f}us/card)".format(
+        len(records), elapsed * 1000, elapsed * 1e6 / len(records)))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    cards = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print("{0:.0f} bytes/card".format(used / len(cards)))
+
+
+def bench_deck():
+    """Build a deck of every builtin pack, and measure its memory use."""
+    packs = load_builtin()
+
+    elapsed = timed(lambda: deck.Deck(packs))
+    print("build: {0:.1f}ms".format(elapsed * 1000))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    d = deck.Deck(packs)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print("{0} cards: {1:.0f}KiB".format(
+        len(d.whitecards) + len(d.blackcards), used / 1024))
+
+
+def bench_game():
+    """Create games over a shared deck, and measure the memory per game."""
+    d = deck.get_deck(load_builtin())
+
+    elapsed = timed(lambda: game.Game(name="bench", decks=[d]))
+    print("create: {0:.1f}us".format(elapsed * 1e6))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [game.Game(name="bench", decks=[d]) for i in range(100)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print("{0:.1f}KiB/game".format(used / len(games) / 1024))
+
+
+def bench_rng():
+    """Draw every builtin white card with each RNG strategy."""
+    rows = deck.get_deck(load_builtin()).whiteindices
+
+    def draw(r):
+        p = pile.DrawPile(rows, r)
+        while p:
+            p.pop()
+
+    for name in sorted(rng.strategies):
+        r = rng.get_rng(name)
+        elapsed = timed(lambda: draw(r))
+        print("{0}: {1:.2f}us/card".format(name, elapsed * 1e6 / len(rows)))
+
+    import random
+    elapsed = timed(lambda: draw(random.Random()))
+    print("(mersenne: {0:.2f}us/card)".format(elapsed * 1e6 / len(rows)))
+
+
+def bench_round():
+    """Play rounds of a 20 player game."""
+    d = deck.get_deck(load_builtin())
+    g = game.Game(name="bench", decks=[d], maxrounds=None, maxap=10 ** 9,
+                  players=range(20), rng="seeded", seed=0)
+
+    def play(rounds=200):
+        for i in range(rounds):
+            g.round_start()
+            count = g.blackcard.playcount
+            for player in g.players:
+                if player != g.tsar:
+                    g.player_play(player, g.playercards[player][0:count])
+
+            g.round_end(g.players[0] if g.tsar != g.players[0] else
+                        g.players[1])
+
+    elapsed = timed(play)
+    print("{0:.1f}us/round".format(elapsed * 1e6 / 200))
+
+
+def bench_orderedset():
+    """Time the OrderedSet operations games use, on 1000 keys."""
+    n = 1000
+    s = OrderedSet(range(n))
+
+    def churn():
+        t = OrderedSet(range(n))
+        for i in range(0, n, 2):
+            t.remove(i)
+
+        t[0]
+
+    # (name, operation, number of operations per call)
+    ops = [
+        ("build", lambda: OrderedSet(range(n)), n),
+        ("s[i]", lambda: s[n // 2], 1),
+        ("s.index(k)", lambda: s.index(n // 2), 1),
+        ("s[i:i+10]", lambda: s[100:110], 1),
+        ("build+remove", churn, n // 2),
+    ]
+    for name, func, per in ops:
+        elapsed = timed(lambda: [func() for i in range(100)])
+        print("{0}: {1:.2f}us".format(name, elapsed * 1e4 / per))
+
+
+def bench_roster():
+    """Join and leave a 200 seat game, rotating the tsar."""
+    d = deck.get_deck(load_builtin())
+    g = game.Game(name="bench", decks=[d], maxcards=5, maxrounds=None,
+                  maxap=10 ** 9, players=range(200))
+
+    def churn():
+        leaving = list(g.players)[0:150:3]
+        for player in leaving:
+            g.player_remove(player)
+            g.player_add(None)
+            g.game_new_tsar()
+
+    elapsed = timed(churn)
+    print("one at a time: {0:.1f}us/player".format(elapsed * 1e6 / 50))
+
+    def bulk():
+        g.players_remove(list(g.players)[0:150:3])
+        g.players_add(range(50))
+
+    if hasattr(g, "players_add"):
+        elapsed = timed(bulk)
+        print("bulk: {0:.1f}us/player".format(elapsed * 1e6 / 50))
+
+
+def bench_scoreboard():
+    """Change AP and poll the leaders of a 200 player scoreboard."""
+    import collections
+    import random
+
+    from inhumane.scoreboard import Scoreboard
+
+    r = random.Random(0)
+    changes = [r.randrange(200) for i in range(1000)]
+
+    for cls in (collections.Counter, Scoreboard):
+        board = cls(range(200))
+
+        def poll():
+            for player in changes:
+                board[player] += 1
+                board.most_common(10)
+                board.most_common(1)[0][1]
+
+        elapsed = timed(poll)
+        print("{0}: {1:.1f}us/change".format(cls.__name__,
+                                             elapsed * 1e6 / len(changes)))
+
+
+def bench_audience():
+    """Cast 100000 audience votes for 20 candidates, and tally them."""
+    from inhumane.audience import AudienceVote
+
+    candidates = list(range(20))
+    vote = AudienceVote(candidates)
+
+    def cast():
+        for voter in range(100000):
+            vote.vote(voter, voter % 20)
+
+    elapsed = timed(cast, 1)
+    print("vote: {0:.2f}us".format(elapsed * 1e6 / 100000))
+    print("tally: {0:.1f}us".format(timed(vote.tally) * 1e6))
+
+
+def bench_hand():
+    """Deal to and list the hands of a 20 player game."""
+    d = deck.get_deck(load_builtin())
+    g = game.Game(name="bench", decks=[d], players=range(20))
+
+    def deal():
+        for i in range(20):
+            for player in g.players:
+                g.player_discard(player, g.playercards[player][0:2])
+
+            g.player_all_deal()
+
+    def poll():
+        for player in g.players:
+            g.player_cards(player)
+
+    elapsed = timed(deal)
+    print("deal: {0:.1f}us/hand".format(elapsed * 1e6 / 400))
+
+    elapsed = timed(poll)
+    print("list: {0:.1f}us/hand".format(elapsed * 1e6 / 20))
+
+
+def bench_sort():
+    """Sort every builtin white card for display."""
+    from operator import attrgetter
+
+    d = deck.get_deck(load_builtin())
+    cards = list(d.whitecards)
+    rows = d.whiteindices
+
+    for name, func in [
+            ("by text", lambda: sorted(cards, key=attrgetter("text"))),
+            ("by card", lambda: sorted(cards)),
+            ("by sortkey", lambda: card.sort_cards(cards)),
+            ("rows by rank", lambda: d.sort(rows))]:
+        elapsed = timed(func)
+        print("{0} cards {1}: {2:.2f}ms".format(len(cards), name,
+                                                elapsed * 1000))
+
+
+def bench_actions():
+    """Play a round of a 20 player game one call at a time, and in a
+    batch."""
+    from inhumane.actions import Play
+
+    d = deck.get_deck(load_builtin())
+    g = game.Game(name="bench", decks=[d], maxrounds=None, maxap=10 ** 9,
+                  players=range(20), rng="seeded", seed=0)
+
+    def plays():
+        count = g.blackcard.playcount
+        return [Play(player, g.playercards[player][0:count]) for player in
+                g.players if player != g.tsar]
+
+    def one_at_a_time(actions):
+        for action in actions:
+            g.player_play(*action)
+
+    def batch(actions):
+        g.apply_actions(actions)
+
+    for name, func in [("one at a time", one_at_a_time), ("batch", batch)]:
+        best = None
+        for i in range(20):
+            g.round_start()
+            actions = plays()
+            elapsed = timed(lambda: func(actions), 1)
+            best = elapsed if best is None else min(best, elapsed)
+            g.round_end(actions[0].player)
+
+        print("{0}: {1:.1f}us/action".format(name, best * 1e6 / 19))
+
+
+def bench_journal():
+    """Play rounds of a 20 player game with and without a journal, and
+    replay the journal."""
+    from inhumane.actions import Play
+    from inhumane.journal import replay
+
+    d = deck.get_deck(load_builtin())
+
+    def play(g):
+        best = None
+        for i in range(20):
+            g.round_start()
+            count = g.blackcard.playcount
+            actions = [Play(player, g.playercards[player][0:count]) for
+                       player in g.players if player != g.tsar]
+            elapsed = timed(lambda: [g.player_play(*action) for action in
+                                     actions], 1)
+            best = elapsed if best is None else min(best, elapsed)
+            g.round_end(actions[0].player)
+
+        return best * 1e6 / 19
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal")
+        for journal in (None, path):
+            g = game.Game(name="bench", decks=[d], maxrounds=None,
+                          maxap=10 ** 9, players=range(20), rng="seeded",
+                          seed=0, journal=journal)
+            print("{0}: {1:.1f}us/action".format(
+                "journaled" if journal else "plain", play(g)))
+
+        flush = timed(g.journal.flush, 1)
+        print("flush:  {0:.0f}us for {1} bytes".format(
+            flush * 1e6, os.path.getsize(path)))
+        print("replay: {0:.1f}ms".format(timed(lambda: replay(path)) * 1000))
+
+
+def bench_pool():
+    """Hibernate 1000 idle 5 player games, and wake them back up."""
+    from inhumane.pool import GamePool, SqliteStore
+
+    d = deck.get_deck(load_builtin())
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = GamePool(SqliteStore(os.path.join(tmp, "games.db")))
+
+        tracemalloc.start()
+        handles = [pool.add(game.Game(name="bench", decks=[d],
+                                      players=range(5))) for i in
+                   range(1000)]
+        resident = tracemalloc.get_traced_memory()[0]
+        pool.hibernate_all()
+        hibernated = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print("resident:    {0:.1f}KiB/game".format(resident / 1024000))
+        print("hibernated:  {0:.1f}KiB/game".format(hibernated / 1024000))
+
+        for handle in handles:
+            handle.rounds
+
+        info = pool.info()
+        print("rehydration: {0:.0f}us mean, {1:.0f}us max".format(
+            info.latency * 1e6, info.maxlatency * 1e6))
+        print("hibernation: {0:.0f}us/game".format(
+            timed(pool.hibernate_all, 1) * 1000))
+        pool.store.close()
+
+
+def bench_snapshot():
+    """Snapshot and restore a 20 player game mid-round, against pickling
+    it."""
+    import pickle
+
+    d = deck.get_deck(load_builtin())
+    g = game.Game(name="bench", decks=[d], players=range(20), rng="seeded",
+                  seed=0)
+    g.round_start()
+    count = g.blackcard.playcount
+    for player in list(g.players)[1:]:
+        if player != g.tsar:
+            g.player_play(player, g.playercards[player][0:count])
+
+    data = g.snapshot()
+    pickled = pickle.dumps(g)
+    print("snapshot: {0} bytes, {1:.0f}us, restore {2:.0f}us".format(
+        len(data), timed(g.snapshot, 20) * 1e6,
+        timed(lambda: game.Game.restore(data), 20) * 1e6))
+    print("pickle:   {0} bytes, {1:.0f}us, restore {2:.0f}us".format(
+        len(pickled), timed(lambda: pickle.dumps(g), 20) * 1e6,
+        timed(lambda: pickle.loads(pickled), 20) * 1e6))
+
+
+benchmarks = {
+    "actions": bench_actions,
+    "audience": bench_audience,
+    "cards": bench_cards,
+    "deck": bench_deck,
+    "game": bench_game,
+    "hand": bench_hand,
+    "journal": bench_journal,
+    "orderedset": bench_orderedset,
+    "packs": bench_packs,
+    "pool": bench_pool,
+    "roster": bench_roster,
+    "rng": bench_rng,
+    "round": bench_round,
+    "scoreboard": bench_scoreboard,
+    "snapshot": bench_snapshot,
+    "sort": bench_sort,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or sorted(benchmarks):
+        print("==", name)
+        benchmarks[name]()